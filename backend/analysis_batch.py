@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+from analyzer import DrawingAnalyzer
+from nesting import summarize
+
+logger = logging.getLogger(__name__)
+
+# Drawings being OCRed / interpreted at once, across every batch
+OCR_CONCURRENCY = int(os.getenv("ANALYSIS_OCR_CONCURRENCY", "8"))
+LLM_CONCURRENCY = int(os.getenv("ANALYSIS_LLM_CONCURRENCY", "4"))
+MAX_BATCH_DRAWINGS = 100
+# Finished batches are forgotten, oldest first, beyond this many
+MAX_BATCHES = 200
+# Batches still being analysed at once; more are refused until one finishes
+MAX_ACTIVE_BATCHES = int(os.getenv("ANALYSIS_MAX_ACTIVE_BATCHES", "10"))
+
+
+class QueueFull(Exception):
+    """Raised by BatchQueue.submit when max_active batches are already running"""
+
+
+class BatchItem:
+    """One drawing of a batch and, once analysed, its cutting list.
+
+    The analyzer, and the drawing it holds, is let go once the item
+    finishes; what the status needs is copied onto the item first.
+    """
+
+    def __init__(self, index, filename, analyzer):
+        self.index = index
+        self.filename = filename
+        self.analyzer = analyzer
+        self.status = None      # set once analysis is over; until then the analyzer's stage
+        self.error = None
+        self.results = None
+        self.sheets = None
+        self.dxf_content = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self, dxf=False):
+        item = {'index': self.index, 'filename': self.filename, 'status': self.status or self.analyzer.stage}
+        if self.status == 'failed':
+            item['error'] = self.error
+        elif self.status == 'done':
+            item['summary'] = DrawingAnalyzer.summarize(self.results)
+            item['results'] = self.results
+            item['sheets'] = self.sheets
+            if dxf:
+                item['dxf_content'] = self.dxf_content
+        return item
+
+
+class AnalysisBatch:
+    def __init__(self, batch_id, configuration, items):
+        self.id = batch_id
+        self.configuration = configuration
+        self.items = items
+        self.created_at = datetime.now().isoformat()
+        self.finished_at = None
+        self.tasks = set()
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def to_dict(self, dxf=False):
+        """Progress and finished cutting lists; their DXF layouts only if asked for, as they are large"""
+        items = [item.to_dict(dxf) for item in self.items]
+        return {
+            'batch_id': self.id,
+            'status': 'done' if self.finished else 'running',
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'configuration': self.configuration,
+            'total': len(items),
+            'completed': sum(item['status'] in ('done', 'failed') for item in items),
+            'progress': dict(Counter(item['status'] for item in items)),
+            'items': items,
+        }
+
+
+class BatchQueue:
+    """Analyses many drawings in the background as a two-stage pipeline.
+
+    Every drawing of a batch starts at once, but at most ocr_concurrency
+    of them (across all batches) are with the OCR API and llm_concurrency
+    with the LLM at any moment; a drawing moves on to the LLM stage as soon
+    as its text is read, so one drawing is being interpreted while the next
+    ones are read. Results are kept per drawing as they finish, so a
+    batch's progress and partial results can be polled. Use from the event
+    loop the batches run on.
+    """
+
+    def __init__(self, http, ocr_concurrency=OCR_CONCURRENCY, llm_concurrency=LLM_CONCURRENCY,
+                 max_batches=MAX_BATCHES, max_active=MAX_ACTIVE_BATCHES):
+        self.http = http
+        self.max_batches = max_batches
+        self.max_active = max_active
+        self._ocr_slots = asyncio.Semaphore(ocr_concurrency)
+        self._llm_slots = asyncio.Semaphore(llm_concurrency)
+        self._batches = OrderedDict()
+
+    def full(self):
+        """True while max_active batches are still being analysed"""
+        return sum(not batch.finished for batch in self._batches.values()) >= self.max_active
+
+    def submit(self, drawings, configuration):
+        """Start analysing [(filename, image bytes)] with set_offsets(**configuration); returns the batch
+
+        Raises QueueFull if max_active batches are already running.
+        """
+        if self.full():
+            raise QueueFull(f"{self.max_active} batches are already being analysed")
+        items = []
+        for index, (filename, _) in enumerate(drawings):
+            analyzer = DrawingAnalyzer(self.http, ocr_slots=self._ocr_slots, llm_slots=self._llm_slots)
+            analyzer.set_offsets(**configuration)
+            items.append(BatchItem(index, filename, analyzer))
+        batch = AnalysisBatch(uuid.uuid4().hex, configuration, items)
+        self._batches[batch.id] = batch
+        self._forget_finished()
+        for item, (_, image_bytes) in zip(items, drawings):
+            task = asyncio.ensure_future(self._analyze(batch, item, image_bytes))
+            batch.tasks.add(task)
+            task.add_done_callback(batch.tasks.discard)
+        return batch
+
+    def get(self, batch_id):
+        return self._batches.get(batch_id)
+
+    async def _analyze(self, batch, item, image_bytes):
+        analyzer = item.analyzer
+        try:
+            item.results = await analyzer.analyze_technical_drawing(image_bytes)
+            if analyzer.error:
+                item.error = analyzer.error
+                item.status = 'failed'
+            else:
+                item.status = 'dxf'
+                # Building the DXF is CPU work, so keep it off the event loop
+                item.dxf_content = await asyncio.to_thread(analyzer.generate_dxf)
+                item.sheets = summarize(analyzer.sheet_layout())
+                item.status = 'done'
+        except Exception as e:
+            logger.exception('Batch %s drawing %s failed', batch.id, item.index)
+            item.error = str(e)
+            item.status = 'failed'
+        finally:
+            if not item.finished:   # cancelled
+                item.error, item.status = 'analysis cancelled', 'failed'
+            item.analyzer = None
+            if all(other.finished for other in batch.items):
+                batch.finished_at = datetime.now().isoformat()
+
+    def _forget_finished(self):
+        excess = len(self._batches) - self.max_batches
+        for batch_id in [batch.id for batch in self._batches.values() if batch.finished][:max(excess, 0)]:
+            del self._batches[batch_id]
+
+    async def close(self):
+        """Cancel the analyses still running"""
+        tasks = [task for batch in self._batches.values() for task in batch.tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(*parts):
+    """sha256 hex digest over parts (bytes or str), each length-prefixed so they can't run together"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        digest.update(len(part).to_bytes(8, 'little'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Results of slow, paid API calls, keyed by a digest of their inputs.
+
+    Lookups go to an in-memory LRU of up to max_entries results, then, if
+    directory is set, to one JSON file per key on disk, which survives
+    restarts and is shared by worker processes. Concurrent get_or_compute()
+    calls for a key that is still being computed wait for that one call
+    instead of starting their own. The computation runs as its own task,
+    so a caller that goes away (a client disconnecting) doesn't cancel it
+    for the others. Only results are cached: an exception is passed to
+    every waiting caller and the next call tries again. Values must be
+    JSON-serializable, and are shared between callers, so treat them as
+    read-only. Use from one event loop.
+    """
+
+    def __init__(self, name, directory=None, max_entries=256):
+        self.name = name
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pending = {}   # key -> task computing it
+        self.hits = self.disk_hits = self.misses = self.coalesced = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning('Ignoring unreadable %s cache entry %s: %s', self.name, key, e)
+            return None
+
+    def _write(self, key, value):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written aside and renamed, so readers never see half a file
+            fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'value': value}, f)
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning('Could not write %s cache entry %s: %s', self.name, key, e)
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(self, key, compute):
+        """Return the cached result for key, or await compute() once and cache it"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        task = self._pending.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = self._pending[key] = asyncio.ensure_future(self._load(key, compute))
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        del self._pending[key]
+        if not task.cancelled():
+            task.exception()  # its callers have it; don't warn if they have all gone
+
+    async def _load(self, key, compute):
+        if self.directory:
+            stored = await asyncio.to_thread(self._read, key)
+            if stored is not None:
+                self.disk_hits += 1
+                self._remember(key, stored['value'])
+                return stored['value']
+        self.misses += 1
+        value = await compute()
+        self._remember(key, value)
+        if self.directory:
+            await asyncio.to_thread(self._write, key, value)
+        return value
+
+    def clear(self):
+        """Forget the in-memory entries; files on disk are kept"""
+        self._entries.clear()
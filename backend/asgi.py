@@ -0,0 +1,247 @@
+"""One ASGI app serving the CRM routes and drawing analysis together.
+
+    uvicorn asgi:app --port 8000
+
+POST /analyze runs on the event loop and awaits its calls to the OCR and
+LLM APIs, so a slow analysis holds no worker; DXF drawings are read
+locally from their dimension entities instead, without either API.
+POST /analyze/batch takes a job's drawings at once, answers with a batch
+id straight away and analyses them in the background;
+GET /analyze/batch/<batch_id> reports progress and the cutting lists
+finished so far. The CRM's streaming routes (GET /events, GET /export and
+POST /import) are served here natively, replaying other workers' writes
+first as Flask's before_request hook does; every other path goes to the
+Flask CRM app unchanged, its handlers short enough to run in the
+threadpool.
+"""
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import httpx  # noqa: E402
+from anyio import from_thread  # noqa: E402
+
+from fastapi import FastAPI, File, Form, Request, UploadFile  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
+from fastapi.middleware.wsgi import WSGIMiddleware  # noqa: E402
+from fastapi.responses import JSONResponse, Response, StreamingResponse  # noqa: E402
+from starlette.concurrency import run_in_threadpool  # noqa: E402
+
+from analysis_batch import MAX_BATCH_DRAWINGS, BatchQueue, QueueFull  # noqa: E402
+from analyzer import REQUEST_TIMEOUT, DrawingAnalyzer  # noqa: E402
+from crm_backend import CONFLICT_CHECKS, CORS_EXPOSE_HEADERS, allow_conflicts, collections, events  # noqa: E402
+from crm_backend import database, sync_with_database  # noqa: E402
+from crm_backend import app as crm_app  # noqa: E402
+from crm_backend import metrics  # noqa: E402
+from ndjson import export_lines, import_lines  # noqa: E402
+from records import BUILDERS  # noqa: E402
+
+
+@asynccontextmanager
+async def lifespan(app):
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as http:
+        app.state.http = http
+        app.state.batches = BatchQueue(http)
+        yield
+        await app.state.batches.close()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'],
+                   expose_headers=CORS_EXPOSE_HEADERS)
+
+
+@app.post('/analyze')
+async def analyze(file: UploadFile = File(...),
+                  back_width_offset: int = Form(36),
+                  top_depth_offset: int = Form(30),
+                  shelf_depth_offset: int = Form(70),
+                  thickness: int = Form(18),
+                  leg_height_deduction: int = Form(100),
+                  countertop_deduction: int = Form(25)):
+    """Extract a cutting list from a cabinet drawing, with its board layout (and in DXF)"""
+    configuration = offsets(back_width_offset, top_depth_offset, shelf_depth_offset,
+                            thickness, leg_height_deduction, countertop_deduction)
+    return await observed('POST', '/analyze', lambda: run_analysis(file, configuration))
+
+
+@app.post('/analyze/batch')
+async def analyze_batch(files: List[UploadFile] = File(...),
+                        back_width_offset: int = Form(36),
+                        top_depth_offset: int = Form(30),
+                        shelf_depth_offset: int = Form(70),
+                        thickness: int = Form(18),
+                        leg_height_deduction: int = Form(100),
+                        countertop_deduction: int = Form(25)):
+    """Queue a job's drawings for analysis; returns the batch id to poll"""
+    configuration = offsets(back_width_offset, top_depth_offset, shelf_depth_offset,
+                            thickness, leg_height_deduction, countertop_deduction)
+    return await observed('POST', '/analyze/batch', lambda: start_batch(files, configuration))
+
+
+@app.get('/analyze/batch/{batch_id}')
+async def analyze_batch_status(batch_id: str, dxf: bool = False):
+    """Progress of a batch and the cutting lists finished so far; ?dxf=1 adds their DXF layouts"""
+    async def status():
+        batch = app.state.batches.get(batch_id)
+        if batch is None:
+            return JSONResponse({'success': False, 'message': 'Batch not found'}, status_code=404)
+        return JSONResponse({'success': True, **batch.to_dict(dxf)})
+    return await observed('GET', '/analyze/batch/<batch_id>', status)
+
+
+async def observed(method, route, handler):
+    """Await handler() for a response and record it in the metrics"""
+    # Recorded alongside the CRM routes, which the Flask app instruments itself
+    start = time.perf_counter()
+    metrics.add('crm_requests_in_flight', 1)
+    response = None
+    try:
+        response = await handler()
+        return response
+    finally:
+        metrics.add('crm_requests_in_flight', -1)
+        # Streamed bodies have no length up front
+        size = len(response.body) if response is not None and hasattr(response, 'body') else None
+        metrics.observe_request(method, route, response.status_code if response else 500,
+                                time.perf_counter() - start, size)
+
+
+def offsets(back_width_offset, top_depth_offset, shelf_depth_offset,
+            thickness, leg_height_deduction, countertop_deduction):
+    return {
+        'back_width_offset': back_width_offset,
+        'top_depth_offset': top_depth_offset,
+        'shelf_depth_offset': shelf_depth_offset,
+        'thickness': thickness,
+        'leg_height_deduction': leg_height_deduction,
+        'countertop_deduction': countertop_deduction,
+    }
+
+
+async def start_batch(files, configuration):
+    if len(files) > MAX_BATCH_DRAWINGS:
+        return JSONResponse({'success': False, 'message': f"At most {MAX_BATCH_DRAWINGS} drawings per batch"},
+                            status_code=400)
+    # Checked before reading the drawings, and again by submit()
+    if app.state.batches.full():
+        return batch_queue_full()
+    drawings = [(file.filename, await file.read()) for file in files]
+    try:
+        batch = app.state.batches.submit(drawings, configuration)
+    except QueueFull:
+        return batch_queue_full()
+    return JSONResponse({'success': True, 'batch_id': batch.id, 'total': len(drawings),
+                         'status_url': f"/analyze/batch/{batch.id}"}, status_code=202)
+
+
+def batch_queue_full():
+    return JSONResponse({'success': False, 'message': 'Too many batches are being analysed; try again later'},
+                        status_code=503, headers={'Retry-After': '30'})
+
+
+async def run_analysis(file, configuration):
+    image_bytes = await file.read()
+    analyzer = DrawingAnalyzer(app.state.http)
+    analyzer.set_offsets(**configuration)
+    results = await analyzer.analyze_technical_drawing(image_bytes)
+    if analyzer.error:
+        return JSONResponse({'success': False, 'message': analyzer.error}, status_code=422)
+
+    # Building the DXF is CPU work, so keep it off the event loop
+    dxf_content = await run_in_threadpool(analyzer.generate_dxf)
+    return JSONResponse({
+        'success': True,
+        'filename': file.filename,
+        'timestamp': datetime.now().isoformat(),
+        'configuration': configuration,
+        'summary': DrawingAnalyzer.summarize(results),
+        'results': results,
+        # Nested while building the DXF, so this is already worked out
+        'sheets': analyzer.sheet_layout(),
+        'dxf_content': dxf_content,
+    })
+
+
+# The CRM's streaming routes, served here rather than through the WSGI
+# adapter, which buffers whole bodies and would hold a threadpool thread
+# for as long as an event stream stays open
+
+@app.get('/events')
+async def event_stream(request: Request):
+    """Server-sent events for customer, job and assignment changes; see crm_backend.event_stream"""
+    async def stream():
+        last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+        names = request.query_params.get('collections')
+        names = set(names.split(',')) if names else None
+        await replay_elsewhere()
+        return StreamingResponse(events.astream(last_event_id, names, sync=replay_elsewhere if database else None),
+                                 media_type='text/event-stream',
+                                 headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    return await observed('GET', '/events', stream)
+
+
+@app.get('/export/{name}')
+async def export_collection(name: str):
+    """Stream a collection as newline-delimited JSON"""
+    async def export():
+        if name not in collections:
+            return Response(status_code=404)
+        await replay_elsewhere()
+        # A sync iterator; each chunk is read from the store on the threadpool
+        return StreamingResponse(export_lines(collections[name]), media_type='application/x-ndjson',
+                                 headers={'Content-Disposition': f'attachment; filename={name}.ndjson'})
+    return await observed('GET', '/export/<name>', export)
+
+
+@app.post('/import/{name}')
+async def import_collection(name: str, request: Request):
+    """Load newline-delimited JSON records into a collection as the body arrives"""
+    async def load():
+        if name not in collections:
+            return Response(status_code=404)
+        await replay_elsewhere()
+        summary = await run_in_threadpool(import_lines, collections[name], BUILDERS[name], body_lines(request),
+                                          conflicts=CONFLICT_CHECKS.get(name),
+                                          allow_conflicts=allow_conflicts(request.query_params))
+        return JSONResponse(summary, status_code=200 if not summary['failed'] else 207)
+    return await observed('POST', '/import/<name>', load)
+
+
+async def replay_elsewhere():
+    """crm_backend.sync_with_database, off the event loop since it may wait for the writer lock"""
+    if database is not None:
+        await run_in_threadpool(sync_with_database)
+
+
+def body_lines(request):
+    """Yield the lines of a request body as it arrives; iterate from a worker thread"""
+    chunks = request.stream()
+
+    async def next_chunk():
+        return await chunks.__anext__()
+
+    pending = b''
+    while True:
+        try:
+            chunk = from_thread.run(next_chunk)
+        except StopAsyncIteration:
+            break
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+# Everything else is the CRM; mounted last so the routes above are matched first
+app.mount('/', WSGIMiddleware(crm_app))
@@ -0,0 +1,6 @@
+"""Benchmarks for the CRM backend.
+
+The package (python -m benchmarks) is the reproducible endpoint suite; the
+bench_*.py and stress_*.py files alongside it are standalone scripts for
+individual components.
+"""
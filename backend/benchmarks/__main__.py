@@ -0,0 +1,128 @@
+"""Benchmark suite for the CRM API.
+
+    python -m benchmarks run --sizes 1000 10000 100000 --drivers client http
+    python -m benchmarks compare results-abc123.json results-def456.json
+
+`run` seeds synthetic customers, jobs, assignments and staff at each size,
+drives every endpoint through the Flask test client and/or a local HTTP
+server, and writes throughput, p50/p99 latency and peak memory to a JSON
+file named after the current commit. `compare` lines two such files up.
+Run from the backend directory.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BACKEND,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(dirty)
+
+
+def run(args):
+    commit, dirty = git_revision()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'store': args.store,
+        'settings': {'requests': args.requests, 'concurrency': args.concurrency,
+                     'jobs_ratio': args.jobs_ratio, 'assignments_ratio': args.assignments_ratio},
+        'runs': [],
+    }
+    for size in args.sizes:
+        for driver in args.drivers:
+            command = [sys.executable, '-m', 'benchmarks.suite', '--size', str(size), '--driver', driver,
+                       '--requests', str(args.requests), '--concurrency', str(args.concurrency),
+                       '--jobs-ratio', str(args.jobs_ratio), '--assignments-ratio', str(args.assignments_ratio)]
+            if args.endpoints:
+                command += ['--endpoints', *args.endpoints]
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ)
+                env.pop('CRM_DATABASE', None)
+                if args.store == 'sqlite':
+                    env['CRM_DATABASE'] = os.path.join(tmp, 'crm.db')
+                print(f"size {size}, {driver} driver...", file=sys.stderr, flush=True)
+                output = subprocess.run(command, cwd=BACKEND, env=env, capture_output=True, text=True)
+            if output.returncode != 0:
+                sys.stderr.write(output.stderr)
+                raise SystemExit(f'size {size} with the {driver} driver failed')
+            result = json.loads(output.stdout)
+            report['runs'].append(result)
+            print_run(result)
+
+    path = args.output or f"results-{commit or 'nogit'}{'-dirty' if dirty else ''}-{args.store}.json"
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {path}")
+
+
+def print_run(run):
+    seed = run['seed']
+    print(f"\nsize {run['size']}, {run['driver']} driver: seeded in {seed['seconds']:.1f}s, "
+          f"peak {seed['peak_rss_mb'] or 0:.0f} MB")
+    print(f"{'endpoint':<24} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'bytes':>10} {'peak MB':>8} errors")
+    for r in run['results']:
+        print(f"{r['endpoint']:<24} {r['throughput']:>9.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['bytes_per_request']:>10} {r['peak_rss_mb'] or 0:>8.0f} {r['errors']}")
+
+
+def compare(args):
+    """Print throughput and p99 ratios of `new` against `old` for shared runs"""
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    def index(report):
+        return {(run['size'], run['driver'], r['endpoint']): r for run in report['runs'] for r in run['results']}
+
+    before, after = index(old), index(new)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    print(f"{'size':>8} {'driver':<7} {'endpoint':<24} {'req/s':>9} {'change':>8} {'p99 ms':>8} {'change':>8}")
+    for key in sorted(set(before) & set(after)):
+        b, a = before[key], after[key]
+        size, driver, endpoint = key
+        print(f"{size:>8} {driver:<7} {endpoint:<24} {a['throughput']:>9.0f} "
+              f"{a['throughput'] / b['throughput'] - 1:>+8.1%} {a['p99_ms']:>8.2f} "
+              f"{a['p99_ms'] / b['p99_ms'] - 1:>+8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the suite and write a results file')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='customers per run (1k to 1M); jobs and assignments scale with it')
+    run_parser.add_argument('--drivers', nargs='+', choices=['client', 'http'], default=['client', 'http'])
+    run_parser.add_argument('--store', choices=['memory', 'sqlite'], default='memory')
+    run_parser.add_argument('--requests', type=int, default=1000, help='per endpoint')
+    run_parser.add_argument('--concurrency', type=int, default=8, help='client threads (http driver)')
+    run_parser.add_argument('--endpoints', nargs='*', help='names to run (default all)')
+    run_parser.add_argument('--jobs-ratio', type=float, default=1.0)
+    run_parser.add_argument('--assignments-ratio', type=float, default=1.0)
+    run_parser.add_argument('--output', help='results file (default named after the commit)')
+    compare_parser = commands.add_parser('compare', help='compare two results files')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    args = parser.parse_args()
+    run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""A job's worth of drawings analysed one after another versus through the
+batch queue's OCR -> LLM pipeline.
+
+The Vision and OpenAI APIs are replaced by local stand-ins that answer
+after --ocr-delay and --llm-delay seconds and track how many calls are in
+flight, so the run shows the speedup and that neither stage goes over its
+concurrency limit. Each run gets its own random drawings, so the result
+caches never hit.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_analysis_batch --drawings 20 --ocr-delay 1 --llm-delay 3
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.stand_ins import StandIn  # first: it sets the API keys analyzer reads on import
+from analysis_batch import BatchQueue
+from analyzer import DrawingAnalyzer
+
+
+async def sequential(http, drawings):
+    for _, image_bytes in drawings:
+        drawing = DrawingAnalyzer(http)
+        await drawing.analyze_technical_drawing(image_bytes)
+        assert not drawing.error, drawing.error
+        await asyncio.to_thread(drawing.generate_dxf)
+
+
+async def batched(http, drawings, args):
+    queue = BatchQueue(http, args.ocr_concurrency, args.llm_concurrency)
+    batch = queue.submit(drawings, {})
+    first = None
+    while not batch.finished:
+        await asyncio.sleep(0.05)
+        status = batch.to_dict()
+        if first is None and status['completed']:
+            first = time.perf_counter()
+    status = batch.to_dict()
+    assert status['progress'] == {'done': len(drawings)}, status['progress']
+    return first
+
+
+async def main(args):
+    def drawings():
+        return [(f"cabinet-{i}.jpg", os.urandom(args.image_bytes)) for i in range(args.drawings)]
+
+    upstream = StandIn(args.ocr_delay, args.llm_delay)
+    peak = upstream.peak
+    async with upstream.client() as http:
+        print(f"{args.drawings} drawings, OCR {args.ocr_delay}s, LLM {args.llm_delay}s per call")
+        start = time.perf_counter()
+        await sequential(http, drawings())
+        one_by_one = time.perf_counter() - start
+        print(f"{'sequential':<12} {one_by_one:>8.2f}s")
+
+        peak.clear()
+        start = time.perf_counter()
+        first = await batched(http, drawings(), args)
+        pipelined = time.perf_counter() - start
+        print(f"{'batch':<12} {pipelined:>8.2f}s  ({one_by_one / pipelined:.1f}x faster, first result after "
+              f"{first - start:.2f}s, peak in flight: OCR {peak['vision']}/{args.ocr_concurrency}, "
+              f"LLM {peak['openai']}/{args.llm_concurrency})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--drawings', type=int, default=20)
+    parser.add_argument('--ocr-delay', type=float, default=1.0)
+    parser.add_argument('--llm-delay', type=float, default=3.0)
+    parser.add_argument('--ocr-concurrency', type=int, default=8)
+    parser.add_argument('--llm-concurrency', type=int, default=4)
+    parser.add_argument('--image-bytes', type=int, default=512 * 1024)
+    asyncio.run(main(parser.parse_args()))
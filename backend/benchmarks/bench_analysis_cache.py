@@ -0,0 +1,73 @@
+"""Drawing analysis with the OCR and LLM result caches: cold, warm, after a
+restart, with changed offsets, and under a burst of identical uploads.
+
+The Vision and OpenAI APIs are replaced by local stand-ins that answer
+after --upstream-delay seconds and count their calls, so each scenario
+reports how many upstream calls it made as well as how long it took.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_analysis_cache --upstream-delay 1 --burst 20
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.stand_ins import StandIn  # first: it sets the API keys analyzer reads on import
+from analysis_cache import ResultCache
+from analyzer import DrawingAnalyzer
+
+
+def caches(directory):
+    return {'ocr_cache': ResultCache('ocr', os.path.join(directory, 'ocr')),
+            'llm_cache': ResultCache('llm', os.path.join(directory, 'llm'))}
+
+
+async def scenario(label, http, calls, cache, images, **offsets):
+    calls.clear()
+    start = time.perf_counter()
+
+    async def one(image):
+        analyzer = DrawingAnalyzer(http, **cache)
+        analyzer.set_offsets(**offsets)
+        results = await analyzer.analyze_technical_drawing(image)
+        assert not analyzer.error, analyzer.error
+        return results
+
+    await asyncio.gather(*(one(image) for image in images))
+    print(f"{label:<34} {len(images):>9} {time.perf_counter() - start:>9.2f}s"
+          f" {calls['vision']:>7} {calls['openai']:>7}")
+
+
+async def main(args):
+    directory = tempfile.mkdtemp(prefix='crm-analysis-cache-')
+    upstream = StandIn(args.upstream_delay, args.upstream_delay)
+    calls = upstream.calls
+    image = os.urandom(args.image_bytes)
+    try:
+        async with upstream.client() as http:
+            print(f"{'scenario':<34} {'analyses':>9} {'time':>10} {'vision':>7} {'openai':>7}")
+            cache = caches(directory)
+            await scenario('cold', http, calls, cache, [image])
+            await scenario('same drawing again', http, calls, cache, [image])
+            await scenario('other offsets', http, calls, cache, [image], back_width_offset=40)
+            await scenario('after restart (from disk)', http, calls, caches(directory), [image])
+            burst = os.urandom(args.image_bytes)
+            await scenario('burst of one new drawing', http, calls, cache, [burst] * args.burst)
+            await scenario('burst, no cache', http, calls,
+                           {'ocr_cache': ResultCache('ocr', max_entries=0),
+                            'llm_cache': ResultCache('llm', max_entries=0)},
+                           [os.urandom(args.image_bytes) for _ in range(args.burst)])
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--upstream-delay', type=float, default=1.0, help='seconds each stand-in API call takes')
+    parser.add_argument('--burst', type=int, default=20, help='concurrent uploads in the burst scenarios')
+    parser.add_argument('--image-bytes', type=int, default=2 * 1024 * 1024)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,129 @@
+"""Mixed CRM and /analyze load: one ASGI app versus the split Flask + analyzer setup.
+
+The OCR and LLM APIs are replaced by a local upstream that answers after
+--upstream-delay seconds, so analysis requests are slow the way real ones
+are. CRM clients meanwhile page through customers and read the pipeline.
+
+Run from the backend directory (needs uvicorn and httpx):
+
+    python -m benchmarks.bench_asgi --seconds 10 --analyze-clients 16
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.stand_ins import serve_upstream
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+UPSTREAM_PORT, CRM_PORT, ANALYZE_PORT = 5200, 5201, 5202
+
+
+def start(command):
+    env = {**os.environ,
+           'OPENAI_API_KEY': 'bench', 'OPENAI_API_URL': f'http://127.0.0.1:{UPSTREAM_PORT}/openai',
+           'GOOGLE_VISION_API_KEY': 'bench', 'VISION_API_URL': f'http://127.0.0.1:{UPSTREAM_PORT}/vision'}
+    return subprocess.Popen([sys.executable, *command], cwd=BACKEND, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def start_servers(setup):
+    """Start a setup's servers; returns (processes, CRM base URL, analyze base URL)"""
+    uvicorn = ['-m', 'uvicorn', 'asgi:app', '--log-level', 'warning', '--port']
+    if setup == 'asgi':
+        servers = [start(uvicorn + [str(ANALYZE_PORT)])]
+        crm = analyze = f'http://127.0.0.1:{ANALYZE_PORT}'
+    else:
+        flask = ['-c', 'from werkzeug.serving import run_simple; from crm_backend import app; '
+                       f'run_simple("127.0.0.1", {CRM_PORT}, app, threaded=True)']
+        servers = [start(flask), start(uvicorn + [str(ANALYZE_PORT)])]
+        crm, analyze = f'http://127.0.0.1:{CRM_PORT}', f'http://127.0.0.1:{ANALYZE_PORT}'
+    for url in {crm, analyze}:
+        for _ in range(100):
+            try:
+                httpx.get(f'{url}/health')
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        else:
+            raise SystemExit(f'{setup}: server at {url} did not start')
+    return servers, crm, analyze
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float('nan')
+
+
+async def load(crm, analyze, args):
+    latencies = {'crm': [], 'analyze': []}
+    errors = []
+    deadline = time.perf_counter() + args.seconds
+    limits = httpx.Limits(max_connections=args.crm_clients + args.analyze_clients)
+
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        await client.post(f'{crm}/customers/bulk', json={'operations': [
+            {'op': 'create', 'data': {'name': f'Customer {i}', 'stage': 'Lead'}} for i in range(args.records)]})
+
+        async def timed(kind, request):
+            start = time.perf_counter()
+            response = await request
+            if response.status_code >= 400:
+                errors.append(f'{kind}: {response.status_code}')
+            latencies[kind].append(time.perf_counter() - start)
+
+        async def crm_client(n):
+            paths = ['/customers?limit=50', '/pipeline', '/jobs/available']
+            i = n
+            while time.perf_counter() < deadline:
+                await timed('crm', client.get(crm + paths[i % len(paths)]))
+                i += 1
+
+        async def analyze_client():
+            while time.perf_counter() < deadline:
+                await timed('analyze', client.post(f'{analyze}/analyze',
+                                                   files={'file': ('drawing.jpg', b'\xff\xd8' + b'0' * 20000)}))
+
+        await asyncio.gather(*[crm_client(n) for n in range(args.crm_clients)],
+                             *[analyze_client() for _ in range(args.analyze_clients)])
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--crm-clients', type=int, default=8)
+    parser.add_argument('--analyze-clients', type=int, default=16)
+    parser.add_argument('--upstream-delay', type=float, default=0.5, help='seconds per OCR/LLM call')
+    parser.add_argument('--records', type=int, default=500)
+    parser.add_argument('--setups', default='split,asgi')
+    args = parser.parse_args()
+
+    upstream = serve_upstream(UPSTREAM_PORT, args.upstream_delay)
+    print(f"{args.crm_clients} CRM clients, {args.analyze_clients} analyze clients, "
+          f"{args.upstream_delay:g}s upstream delay, {args.seconds:g}s per setup")
+    print(f"{'setup':<7} {'crm req/s':>10} {'crm p50':>9} {'crm p99':>9} {'analyze/s':>10} {'analyze p50':>12} errors")
+    try:
+        for setup in args.setups.split(','):
+            servers, crm, analyze = start_servers(setup)
+            try:
+                latencies, errors = asyncio.run(load(crm, analyze, args))
+            finally:
+                for server in servers:
+                    server.terminate()
+                    server.wait()
+            crm_times, analyze_times = latencies['crm'], latencies['analyze']
+            print(f"{setup:<7} {len(crm_times) / args.seconds:>10.0f} "
+                  f"{percentile(crm_times, 0.5) * 1000:>7.1f}ms {percentile(crm_times, 0.99) * 1000:>7.1f}ms "
+                  f"{len(analyze_times) / args.seconds:>10.1f} {percentile(analyze_times, 0.5) * 1000:>10.0f}ms "
+                  f"{len(errors)}")
+    finally:
+        upstream.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Compare single-record POST/PUT with the /<collection>/bulk endpoints.
+
+Run from the backend directory; set CRM_DATABASE to measure the SQLite store:
+
+    python -m benchmarks.bench_bulk --count 5000
+"""
+import argparse
+import os
+import time
+
+from crm_backend import app
+
+
+def rate(count, fn):
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=1000, help='operations per bulk request')
+    args = parser.parse_args()
+    client = app.test_client()
+    rows = [{'name': f'Customer {i}', 'email': f'c{i}@example.com'} for i in range(args.count)]
+
+    ids = []
+
+    def single_create():
+        for row in rows:
+            ids.append(client.post('/customers', json=row).json['id'])
+
+    def single_update():
+        for record_id in ids:
+            client.put(f'/customers/{record_id}', json={'stage': 'Quoted'})
+
+    def bulk(operations):
+        def run():
+            for i in range(0, len(operations), args.batch):
+                response = client.post('/customers/bulk', json={'operations': operations[i:i + args.batch]})
+                assert response.status_code == 200
+        return run
+
+    results = [('single create', rate(args.count, single_create)),
+               ('single update', rate(args.count, single_update))]
+    create_ops = [{'op': 'create', 'data': row} for row in rows]
+    results.append(('bulk create', rate(args.count, bulk(create_ops))))
+    update_ops = [{'op': 'update', 'id': record_id, 'data': {'stage': 'Accepted'}} for record_id in ids]
+    results.append(('bulk update', rate(args.count, bulk(update_ops))))
+
+    store = os.getenv('CRM_DATABASE') and 'sqlite' or 'memory'
+    print(f"{args.count} operations, {store} store, bulk batches of {args.batch}")
+    for name, ops in results:
+        print(f"{name:<14} {ops:>10.0f} ops/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Analysis of a CAD drawing uploaded as DXF against the same drawing as an image.
+
+A cabinet drawing is generated with ezdxf: a front elevation with a chain
+of unit widths and the overall width and height dimensioned, and a side
+elevation with the depth, plus --clutter extra dimensioned and annotated
+details to make the file as dense as a real one. The DXF goes through
+DrawingAnalyzer's local path; the image route goes through stand-ins for
+the Vision and OpenAI APIs that answer after --ocr-delay and --llm-delay
+seconds. The run checks that the DXF path makes no API calls and that its
+cutting list has the drawing's exact sizes.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_dxf_import --units 500 700 --height 870 --depth 560
+"""
+import argparse
+import asyncio
+import os
+import time
+from io import StringIO
+
+import ezdxf
+
+from benchmarks.stand_ins import StandIn, openai_response  # first: it sets the API keys analyzer reads on import
+from analysis_cache import ResultCache
+from analyzer import DrawingAnalyzer
+
+
+def cabinet_dxf(units, height, depth, clutter):
+    doc = ezdxf.new('R2010', setup=True)
+    doc.units = ezdxf.units.MM
+    msp = doc.modelspace()
+    width = sum(units)
+
+    # Front elevation: carcass, unit divisions, a chain of unit widths, the overall width and the height
+    msp.add_lwpolyline([(0, 0), (width, 0), (width, height), (0, height)], close=True)
+    x = 0
+    for unit in units:
+        msp.add_line((x, 0), (x, height))
+        msp.add_linear_dim(base=(0, -100), p1=(x, 0), p2=(x + unit, 0), dimstyle='Standard').render()
+        x += unit
+    msp.add_linear_dim(base=(0, -200), p1=(0, 0), p2=(width, 0), dimstyle='Standard').render()
+    msp.add_linear_dim(base=(-100, 0), p1=(0, 0), p2=(0, height), angle=90, dimstyle='Standard').render()
+
+    # Side elevation to the right
+    left = width + 400
+    msp.add_lwpolyline([(left, 0), (left + depth, 0), (left + depth, height), (left, height)], close=True)
+    msp.add_linear_dim(base=(0, -100), p1=(left, 0), p2=(left + depth, 0), dimstyle='Standard').render()
+    msp.add_text('KITCHEN BASE UNIT - FRONT AND SIDE ELEVATION', dxfattribs={'height': 40}).set_placement((0, -400))
+
+    # Hardware, handles and notes elsewhere on the sheet, small enough not to pass for the cabinet
+    for i in range(clutter):
+        x, y = (i % 40) * 150, -800 - (i // 40) * 150
+        msp.add_circle((x, y), 10)
+        msp.add_linear_dim(base=(x, y - 30), p1=(x, y), p2=(x + 32 + i % 96, y), dimstyle='Standard').render()
+        msp.add_text(f"HINGE {i} 35MM", dxfattribs={'height': 8}).set_placement((x, y + 20))
+
+    stream = StringIO()
+    doc.write(stream)
+    return stream.getvalue().encode()
+
+
+def analyzer(http):
+    return DrawingAnalyzer(http, ocr_cache=ResultCache('ocr'), llm_cache=ResultCache('llm'))
+
+
+async def main(args):
+    width, height, depth = sum(args.units), args.height, args.depth
+    dxf_bytes = cabinet_dxf(args.units, height, depth, args.clutter)
+    image_answer = {'cabinet_width': width, 'cabinet_working_height': height - 125, 'cabinet_depth': depth,
+                    'components': {'gables': {}, 'tb_panels': {}, 'sh_hardware': {}, 'back': {}}}
+    upstream = StandIn(args.ocr_delay, args.llm_delay, openai=openai_response(image_answer))
+    calls = upstream.calls
+    async with upstream.client() as http:
+        drawing = analyzer(http)
+        start = time.perf_counter()
+        from_image = await drawing.analyze_technical_drawing(os.urandom(64 * 1024))
+        image_seconds = time.perf_counter() - start
+        assert not drawing.error, drawing.error
+
+        calls.clear()
+        timings = []
+        for _ in range(args.repeat):
+            drawing = analyzer(http)
+            start = time.perf_counter()
+            from_dxf = await drawing.analyze_technical_drawing(dxf_bytes)
+            timings.append(time.perf_counter() - start)
+            assert not drawing.error, drawing.error
+    assert not calls, f"the DXF path called {dict(calls)}"
+
+    print(f"{' + '.join(map(str, args.units))} = {width} wide, {height} high, {depth} deep;"
+          f" DXF {len(dxf_bytes) / 1024:.0f}KB with {args.clutter} other details")
+    print(f"{'image (OCR + LLM stand-ins)':<30} {image_seconds * 1000:>9.1f}ms")
+    print(f"{'DXF, read locally':<30} {min(timings) * 1000:>9.1f}ms  (median {sorted(timings)[len(timings) // 2] * 1000:.1f}ms,"
+          f" no API calls)")
+    for category, summary in from_dxf.items():
+        sizes = ', '.join(f"{item['dimensions']} x{item['quantity']}" for item in summary['items'])
+        same = 'same as' if summary == from_image[category] else 'DIFFERS from'
+        print(f"  {category:<18} {sizes:<24} {same} the image route")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--units', type=int, nargs='+', default=[600, 600], help='unit widths along the front')
+    parser.add_argument('--height', type=int, default=870)
+    parser.add_argument('--depth', type=int, default=560)
+    parser.add_argument('--clutter', type=int, default=200)
+    parser.add_argument('--ocr-delay', type=float, default=1.0)
+    parser.add_argument('--llm-delay', type=float, default=3.0)
+    parser.add_argument('--repeat', type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
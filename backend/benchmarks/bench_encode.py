@@ -0,0 +1,84 @@
+"""Time spent encoding list responses: jsonify per read versus cached fragments.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_encode --count 10000
+"""
+import argparse
+import json
+import random
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_cache
+from json_cache import RecordCache
+from records import new_customer
+from store import RecordStore
+
+STAGES = ['Lead', 'Quoted', 'Accepted', 'Production', 'Installed']
+
+
+def make_customers(n, seed=0):
+    rng = random.Random(seed)
+    return [new_customer({
+        'name': f'Customer {i}',
+        'email': f'customer{i}@example.com',
+        'phone': f'07{rng.randrange(10**9):09d}',
+        'address': f'{rng.randrange(1, 200)} High Street, Town {i % 50}',
+        'postcode': f'AB{rng.randrange(1, 99)} {rng.randrange(1, 9)}CD',
+        'stage': rng.choice(STAGES),
+        'notes': 'Kitchen refit, wants a quote for fitted wardrobes as well',
+    }) for i in range(n)]
+
+
+def best_of(runs, fn):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    store = RecordStore(make_customers(args.count))
+    records = store.all()
+    flask_json = DefaultJSONProvider(Flask(__name__))
+
+    # Big enough for the whole store, so the timed reads all hit
+    cache = RecordCache(store, max_records=args.count)
+    start = time.perf_counter()
+    cache.encode_list(records)
+    warm = time.perf_counter() - start
+
+    # The store holds compact records; the uncached encoders get the plain
+    # dicts they stand for, as they did before the store compacted them
+    dicts = [r.to_dict() for r in records]
+    cases = [
+        ('jsonify (sorted keys)', lambda: flask_json.dumps(dicts, separators=(',', ':')).encode()),
+        ('json.dumps compact', lambda: json.dumps(dicts, separators=(',', ':')).encode()),
+    ]
+    if json_cache.orjson is not None:
+        cases.append(('orjson', lambda: json_cache.orjson.dumps(dicts)))
+    cases.append(('compact, uncached', lambda: json_cache.dumps(records)))
+    cases.append(('cached fragments', lambda: cache.encode_list(records)))
+    # Records read back from SQLite are equal dicts, not the cached records
+    cases.append(('cached, equal copies', lambda: cache.encode_list(dicts)))
+
+    per = 10000 / args.count
+    print(f"{args.count} customers, best of {args.runs}, ms per 10k records "
+          f"(orjson {'on' if json_cache.orjson else 'off'})")
+    for name, fn in cases:
+        print(f"{name:<22} {best_of(args.runs, fn) * 1000 * per:>8.1f}")
+    print(f"{'first read (fills)':<22} {warm * 1000 * per:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Journal write cost, snapshot size and restart time for the in-memory stores.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_journal --count 1000000 --tail 100000
+
+Loads count customers through a journaled RecordStore, snapshots it,
+applies tail updates on top, then restores a fresh store from the snapshot
+plus the journal tail the way crm_backend does at startup. The fsync
+comparison writes a smaller batch in each mode.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from benchmarks.seed import make_customers
+from journal import Journal
+from store import RecordStore
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def journaled_store(path, fsync):
+    stores = {'customers': RecordStore(lock=threading.RLock())}
+    journal = Journal(path, stores, fsync=fsync, snapshot_min_bytes=1 << 40)
+    journal.restore()
+    return stores['customers'], journal
+
+
+def write_cost(root, records, fsync):
+    path = os.path.join(root, f'fsync-{fsync}')
+    store, journal = journaled_store(path, fsync)
+    start = time.perf_counter()
+    for record in records:
+        store.add(record)
+    journal.close()
+    return (time.perf_counter() - start) / len(records) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--tail', type=int, default=100000, help='updates journaled after the snapshot')
+    parser.add_argument('--fsync-count', type=int, default=2000, help='records per fsync mode')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    root = tempfile.mkdtemp(prefix='crm-journal-')
+    try:
+        print(f"per write, {args.fsync_count} records")
+        plain = RecordStore()
+        sample = make_customers(args.fsync_count, rng)
+        start = time.perf_counter()
+        for record in sample:
+            plain.add(record)
+        print(f"{'no journal':<14} {(time.perf_counter() - start) / len(sample) * 1e6:>8.1f} us")
+        for fsync in ('off', 0.1, 'always'):
+            print(f"{'fsync ' + str(fsync):<14} {write_cost(root, sample, fsync):>8.1f} us")
+
+        path = os.path.join(root, 'restart')
+        store, journal = journaled_store(path, 0.1)
+        records = make_customers(args.count, rng)
+        start = time.perf_counter()
+        for i in range(0, len(records), 10000):
+            with store.transaction():
+                for record in records[i:i + 10000]:
+                    store.add(record)
+        loaded = time.perf_counter() - start
+        journal_bytes = directory_bytes(path)
+        print(f"\n{args.count} customers journaled in {loaded:.1f}s ({journal_bytes / 2**20:.0f} MB)")
+
+        start = time.perf_counter()
+        journal.snapshot(wait=True)
+        snapshot_bytes = directory_bytes(path)
+        print(f"snapshot in {time.perf_counter() - start:.1f}s ({snapshot_bytes / 2**20:.0f} MB on disk after)")
+
+        ids = [r['id'] for r in records]
+        del records
+        for i in range(args.tail):
+            store.update(ids[rng.randrange(len(ids))], {'stage': 'Quoted', 'notes': f'call back {i}'})
+        journal.close()
+        tail_bytes = directory_bytes(path) - snapshot_bytes
+        print(f"{args.tail} updates journaled ({tail_bytes / 2**20:.0f} MB)")
+        print(f"bytes written per byte journaled: {(journal_bytes + snapshot_bytes + tail_bytes) / (journal_bytes + tail_bytes):.2f}")
+        del store, journal
+
+        restored = {'customers': RecordStore()}
+        summary = Journal(path, restored, fsync='off').restore()
+        print(f"\nrestart: {summary['snapshot_records']} records from the snapshot and "
+              f"{summary['replayed']} journal entries in {summary['seconds']:.1f}s")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Bytes per record for customers, jobs and assignments: plain dicts versus
+records.CompactRecord, and what RecordStore and the JSON cache add on top.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_memory --count 1000000
+
+Each measurement runs in its own process and reports the growth in
+resident memory while building count records, divided by count. Records
+are parsed from JSON in batches, as request bodies are, so the dicts don't
+share value strings the way literals in a script would.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+from datetime import date
+
+from benchmarks.seed import make_assignments, make_customers, make_jobs, make_staff
+from json_cache import RecordCache
+from records import compact
+from store import RecordStore
+
+BATCH = 10000
+LAYOUTS = ['dict', 'compact', 'store', 'store+cache']
+
+
+def resident_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def batches(collection, count, rng):
+    """Yield lists of freshly parsed records, BATCH at a time"""
+    staff = make_staff(max(5, count // 200))
+    for start in range(0, count, BATCH):
+        n = min(BATCH, count - start)
+        customers = make_customers(n, rng)
+        if collection == 'customers':
+            records = customers
+        else:
+            jobs = make_jobs(n, customers, rng)
+            records = jobs if collection == 'jobs' else make_assignments(n, jobs, staff, date(2030, 1, 7), rng)
+        yield json.loads(json.dumps(records))
+
+
+def measure(collection, layout, count):
+    rng = random.Random(0)
+    gc.collect()
+    before = resident_bytes()
+    if layout == 'dict':
+        kept = [record for batch in batches(collection, count, rng) for record in batch]
+    elif layout == 'compact':
+        kept = [compact(record) for batch in batches(collection, count, rng) for record in batch]
+    else:
+        kept = RecordStore()
+        for batch in batches(collection, count, rng):
+            for record in batch:
+                kept.add(record)
+        if layout == 'store+cache':
+            # Read every record once, a page at a time as ?limit= lists do;
+            # the cache keeps at most RECORD_CACHE_SIZE of them
+            cache = RecordCache(kept)
+            after = None
+            while True:
+                page, after = kept.page(after, 1000)
+                cache.encode_list(page)
+                if after is None:
+                    break
+    gc.collect()
+    return (resident_bytes() - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--collections', nargs='+', default=['customers', 'jobs', 'assignments'])
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(measure(*args.child, args.count))
+        return
+
+    print(f"{args.count} records, bytes per record (resident memory growth)")
+    print(f"{'collection':<12}" + ''.join(f"{layout:>13}" for layout in LAYOUTS) + f"{'saved':>9}")
+    for collection in args.collections:
+        sizes = []
+        for layout in LAYOUTS:
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_memory', '--count', str(args.count),
+                                     '--child', collection, layout],
+                                    capture_output=True, text=True, check=True).stdout
+            sizes.append(float(output))
+        saved = 1 - sizes[1] / sizes[0]
+        print(f"{collection:<12}" + ''.join(f"{size:>13.0f}" for size in sizes) + f"{saved:>9.0%}")
+
+
+if __name__ == '__main__':
+    main()
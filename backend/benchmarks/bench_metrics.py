@@ -0,0 +1,53 @@
+"""Per-request cost of the metrics instrumentation.
+
+Drives a few cheap routes through the Flask test client with metrics
+recording on and off, alternating rounds so drift affects both equally.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_metrics --requests 20000
+"""
+import argparse
+import time
+
+from crm_backend import app, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    client = app.test_client()
+    customer = client.post('/customers', json={'name': 'Customer', 'stage': 'Quoted'}).json
+    client.post('/jobs', json={'customer_id': customer['id'], 'stage': 'Quoted'})
+    paths = [f"/customers/{customer['id']}", '/customers?limit=10', '/pipeline', '/health']
+
+    def run():
+        start = time.perf_counter()
+        for i in range(args.requests):
+            client.get(paths[i % len(paths)])
+        return (time.perf_counter() - start) / args.requests
+
+    best = {True: float('inf'), False: float('inf')}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            metrics.enabled = enabled
+            best[enabled] = min(best[enabled], run())
+    metrics.enabled = True
+
+    start = time.perf_counter()
+    for _ in range(100):
+        metrics.render()
+    render = (time.perf_counter() - start) / 100
+
+    overhead = best[True] - best[False]
+    print(f"{args.requests} requests x {args.rounds} rounds over {len(paths)} routes (best round)")
+    print(f"metrics off   {best[False] * 1e6:8.1f} us/request")
+    print(f"metrics on    {best[True] * 1e6:8.1f} us/request")
+    print(f"overhead      {overhead * 1e6:8.1f} us/request ({overhead / best[False]:.1%})")
+    print(f"/metrics body {render * 1e3:8.2f} ms to render")
+
+
+if __name__ == '__main__':
+    main()
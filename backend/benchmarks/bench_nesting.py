@@ -0,0 +1,94 @@
+"""Sheet nesting of a whole-house cutting list: boards needed, yield and time.
+
+The cutting list is built the way analyses build it, one cabinet after
+another through DrawingAnalyzer.process_analysis_result, for --cabinets
+base and wall units of random standard widths. Each material is nested
+with nesting.nest and, for comparison, with simple shelf packing (parts in
+rows across the board, a new row when one is full), the usual hand
+layout. The lower bound is the parts' area (with kerf) over a board's
+usable area. The layout is then written to DXF.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_nesting --cabinets 80
+"""
+import argparse
+import math
+import random
+import time
+
+from analyzer import DrawingAnalyzer
+from nesting import BOARDS, EDGE_TRIM, KERF, _pieces, nest
+
+WIDTHS = [300, 400, 450, 500, 600, 800, 900, 1000, 1200]
+CABINETS = [  # (working height, depth): base units, tall units, wall units
+    (745, 560), (745, 580), (2000, 560), (720, 320), (900, 320),
+]
+
+
+def whole_house(rng, cabinets):
+    analyzer = DrawingAnalyzer(http=object())
+    for _ in range(cabinets):
+        height, depth = rng.choice(CABINETS)
+        analyzer.process_analysis_result({
+            'cabinet_width': rng.choice(WIDTHS), 'cabinet_working_height': height, 'cabinet_depth': depth,
+            'components': {'gables': {}, 'tb_panels': {}, 'sh_hardware': {}, 'back': {}},
+        })
+    return analyzer
+
+
+def shelf_packed(pieces, board):
+    """Boards needed laying parts in rows, tallest first, each row as deep as its first part"""
+    length, width = board['length'] - 2 * EDGE_TRIM + KERF, board['width'] - 2 * EDGE_TRIM + KERF
+    sheets, x, y, row = 0, length, 0, 0
+    for piece in sorted(pieces, key=lambda p: -p['width']):
+        dx, dy = piece['height'] + KERF, piece['width'] + KERF
+        if x + dx > length:
+            x, y, row = 0, y + row, dy
+        if y + dy > width:
+            sheets, x, y, row = sheets + 1, 0, 0, dy
+        x += dx
+    return sheets
+
+
+def main(args):
+    analyzer = whole_house(random.Random(args.seed), args.cabinets)
+    pieces = _pieces(analyzer.components)
+    print(f"{args.cabinets} cabinets, {sum(len(p) for p in pieces.values())} pieces;"
+          f" kerf {KERF:g}mm, edge trim {EDGE_TRIM:g}mm")
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        layout = nest(analyzer.components)
+        timings.append(time.perf_counter() - start)
+    print(f"nested in {min(timings) * 1000:.0f}ms (median {sorted(timings)[len(timings) // 2] * 1000:.0f}ms)")
+
+    print(f"{'material':<10} {'pieces':>7} {'boards':>7} {'yield':>7} {'bound':>6} {'shelf packing':>14}")
+    for material, nested in layout['materials'].items():
+        board = BOARDS[material]
+        usable = (board['length'] - 2 * EDGE_TRIM + KERF) * (board['width'] - 2 * EDGE_TRIM + KERF)
+        bound = math.ceil(sum((p['height'] + KERF) * (p['width'] + KERF) for p in pieces[material]) / usable)
+        shelf = shelf_packed(pieces[material], board)
+        shelf_yield = nested['yield'] * nested['sheet_count'] / shelf
+        grain = ', grain kept' if board['grain'] else ''
+        print(f"{material:<10} {len(pieces[material]):>7} {nested['sheet_count']:>7} {nested['yield']:>7.1%}"
+              f" {bound:>6} {shelf:>8} ({shelf_yield:.1%}){grain}")
+    if layout['unplaced']:
+        print(f"not nested: {len(layout['unplaced'])} pieces ({', '.join(sorted({p['reason'] for p in layout['unplaced']}))})")
+
+    start = time.perf_counter()
+    dxf = analyzer.generate_dxf()
+    print(f"DXF of the layout: {len(dxf) / 1024:.0f}KB in {(time.perf_counter() - start) * 1000:.0f}ms")
+    if args.dxf:
+        with open(args.dxf, 'w') as f:
+            f.write(dxf)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cabinets', type=int, default=80)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--dxf', help='also write the layout to this file')
+    main(parser.parse_args())
@@ -0,0 +1,132 @@
+"""Upload size and analysis latency with and without preprocess.prepare_drawing.
+
+Two synthetic drawings are generated: a 12 MP phone photo (noisy, unevenly
+lit, on a desk, stored sideways with an EXIF rotation) and an A4 300 dpi
+PNG scan. Each is analysed end to end against local stand-ins for the
+Vision and OpenAI APIs that take --uplink Mbit/s to receive the request
+body, as uploads from the workshop's connection would.
+
+With --live and real credentials in the environment (GOOGLE_VISION_API_KEY
+or service account), the original and prepared images are also sent to
+Google Vision and the dimension numbers it reads are compared.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_preprocess --uplink 20
+"""
+import argparse
+import asyncio
+import time
+from io import BytesIO
+
+import httpx
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from benchmarks.stand_ins import StandIn, vision_response  # first: it sets the API keys analyzer reads on import
+from analysis_cache import ResultCache
+from analyzer import DrawingAnalyzer
+from preprocess import MAX_SIDE, prepare_drawing
+
+DIMENSIONS = [600, 600, 1200, 870, 560, 745, 1164, 490]
+
+
+def draw_cabinet(size, paper, ink, text_px):
+    """A front elevation with dimension figures, on plain paper"""
+    image = Image.new('RGB', size, paper)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=text_px)
+    w, h = size
+    x0, y0, x1, y1 = int(w * 0.2), int(h * 0.2), int(w * 0.8), int(h * 0.75)
+    line = max(2, text_px // 12)
+    draw.rectangle((x0, y0, x1, y1), outline=ink, width=line)
+    draw.line(((x0 + x1) // 2, y0, (x0 + x1) // 2, y1), fill=ink, width=line)
+    for i, number in enumerate(DIMENSIONS):
+        x = x0 + (x1 - x0) * (i % 4) // 4
+        y = y1 + text_px * (1 + 2 * (i // 4))
+        draw.text((x, y), str(number), fill=ink, font=font)
+    return image
+
+
+def phone_photo():
+    width, height = 4032, 3024
+    photo = Image.new('RGB', (width, height), (92, 70, 52))   # the desk
+    sheet = draw_cabinet((int(width * 0.8), int(height * 0.85)), (214, 210, 200), (40, 40, 48), 70)
+    photo.paste(sheet, (int(width * 0.1), int(height * 0.07)))
+    # Uneven lighting and sensor noise, which is what makes photos large
+    light = Image.linear_gradient('L').resize((width, height)).point(lambda v: 200 + v // 5)
+    photo = Image.composite(photo, Image.new('RGB', photo.size, 0), light)
+    noise = Image.merge('RGB', [Image.effect_noise((width, height), 40) for _ in range(3)])
+    photo = Image.blend(photo.filter(ImageFilter.GaussianBlur(0.6)), noise, 0.16)
+    # Stored sideways, as a phone held in portrait saves it
+    photo = photo.transpose(Image.ROTATE_90)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    encoded = BytesIO()
+    photo.save(encoded, 'JPEG', quality=96, exif=exif)
+    return encoded.getvalue(), 70, max(width, height)
+
+
+def scan():
+    page = draw_cabinet((2480, 3508), (250, 250, 248), (20, 20, 20), 50)
+    # Scanners add a little grain, enough to defeat PNG's compression of flat areas
+    noise = Image.merge('RGB', [Image.effect_noise(page.size, 10) for _ in range(3)])
+    page = Image.blend(page, noise, 0.03)
+    encoded = BytesIO()
+    page.save(encoded, 'PNG')
+    return encoded.getvalue(), 50, 3508
+
+
+class Unprepared(DrawingAnalyzer):
+    """Uploads the drawing as it came, as before preprocessing"""
+
+    async def prepared_image(self, image_bytes):
+        return image_bytes, 'image/jpeg'
+
+
+async def analysis_seconds(analyzer_class, http, image_bytes):
+    analyzer = analyzer_class(http, ocr_cache=ResultCache('ocr'), llm_cache=ResultCache('llm'))
+    start = time.perf_counter()
+    await analyzer.analyze_technical_drawing(image_bytes)
+    assert not analyzer.error, analyzer.error
+    return time.perf_counter() - start
+
+
+async def live_numbers(image_bytes):
+    analyzer = DrawingAnalyzer(httpx.AsyncClient(timeout=60), ocr_cache=ResultCache('ocr'),
+                               llm_cache=ResultCache('llm'))
+    text = await analyzer.detect_text(image_bytes)
+    return set(analyzer.analyze_numbers(text)['all_numbers'])
+
+
+async def main(args):
+    samples = {'phone photo': phone_photo(), 'A4 scan (PNG)': scan()}
+    bytes_per_second = args.uplink * 1e6 / 8
+    upstream = StandIn(bytes_per_second=bytes_per_second, vision=vision_response(' '.join(map(str, DIMENSIONS))))
+    async with upstream.client() as http:
+        print(f"uplink {args.uplink} Mbit/s, max side {MAX_SIDE}")
+        print(f"{'drawing':<15} {'original':>10} {'prepared':>10} {'prep':>8} {'text px':>8}"
+              f" {'analysis before':>16} {'after':>8}")
+        for label, (image_bytes, text_px, long_side) in samples.items():
+            start = time.perf_counter()
+            prepared, mime_type = prepare_drawing(image_bytes)
+            prep = time.perf_counter() - start
+            size = Image.open(BytesIO(prepared)).size
+            before = await analysis_seconds(Unprepared, http, image_bytes)
+            after = await analysis_seconds(DrawingAnalyzer, http, image_bytes)
+            # Cropping only enlarges the figures, so this is a lower bound
+            scaled_text = text_px * min(1, MAX_SIDE / long_side)
+            print(f"{label:<15} {len(image_bytes) / 2**20:>8.1f}MB {len(prepared) / 2**20:>8.2f}MB"
+                  f" {prep * 1000:>6.0f}ms {scaled_text:>8.0f} {before:>15.2f}s {after:>7.2f}s"
+                  f"   {mime_type} {size[0]}x{size[1]}")
+            if args.live:
+                original, upload = await live_numbers(image_bytes), await live_numbers(prepared)
+                expected = set(DIMENSIONS)
+                print(f"{'':<15} Vision found {len(original & expected)}/{len(expected)} dimensions in the original,"
+                      f" {len(upload & expected)}/{len(expected)} in the prepared image")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uplink', type=float, default=20, help='Mbit/s the stand-in APIs receive at')
+    parser.add_argument('--live', action='store_true', help='also compare what Google Vision reads')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,62 @@
+"""Time the auto scheduler on synthetic workloads.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_scheduler --jobs 1000 3000 5000 --staff 20
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from scheduler import PRIORITY_WEIGHTS, STAGE_ROLES, plan_jobs
+
+ROLES = ['Installer', 'Measuring', 'Delivery']
+
+
+def make_workload(job_count, staff_count, days, seed=0):
+    rng = random.Random(seed)
+    staff = [{'id': i + 1, 'name': f'Staff {i + 1}', 'role': ROLES[i % len(ROLES)]} for i in range(staff_count)]
+    jobs = [{
+        'id': f'job-{i}',
+        'stage': rng.choice(list(STAGE_ROLES)),
+        'priority': rng.choice(list(PRIORITY_WEIGHTS)),
+        'estimated_hours': rng.choice([1, 2, 2, 3, 4, 6, 8, 16]),
+        'created_at': f'2024-01-01T00:00:{i % 60:02d}',
+    } for i in range(job_count)]
+    # A fifth of staff-days already carry a morning booking
+    bookings = {(str(s['id']), d): [(480, 720, 'existing')]
+                for s in staff for d in days if rng.random() < 0.2}
+    return jobs, staff, lambda staff_id, day: bookings.get((staff_id, day), [])
+
+
+def best_of(runs, fn):
+    times, result = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1000, 3000, 5000])
+    parser.add_argument('--staff', type=int, default=20)
+    parser.add_argument('--days', type=int, default=60)
+    args = parser.parse_args()
+    start = date(2024, 1, 1)
+    days = [(start + timedelta(days=i)).isoformat() for i in range(args.days)]
+
+    print(f"{'jobs':>6} {'staff':>6} {'days':>5} {'greedy ms':>10} {'total ms':>9} {'placed':>7} {'unplaced':>9}")
+    for count in args.jobs:
+        jobs, staff, busy = make_workload(count, args.staff, days)
+        greedy, _ = best_of(3, lambda: plan_jobs(jobs, staff, days, busy, max_moves=0))
+        total, (plans, unscheduled) = best_of(3, lambda: plan_jobs(jobs, staff, days, busy))
+        placed = len({p['job']['id'] for p in plans})
+        print(f"{count:>6} {args.staff:>6} {args.days:>5} {greedy * 1000:>10.1f} {total * 1000:>9.1f} "
+              f"{placed:>7} {len(unscheduled):>9}")
+
+
+if __name__ == '__main__':
+    main()
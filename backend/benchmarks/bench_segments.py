@@ -0,0 +1,78 @@
+"""Segmented width inference: segments.segmented_widths against the pair loop it replaced.
+
+Synthetic OCR output is generated the way a dense drawing reads: runs of
+2-6 standard unit widths printed one after another followed by their
+total, mixed with stray figures (heights, depths, offsets, part numbers).
+For each size the run reports how long each takes and how many of the
+planted runs each finds among its suggestions.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_segments --numbers 100 500 1000
+"""
+import argparse
+import random
+import time
+
+from segments import segmented_widths
+
+UNIT_WIDTHS = [300, 400, 450, 500, 600, 800, 900, 1000]
+
+
+def pair_loop(numbers):
+    """The previous search: two alike 400-800mm numbers adding up to 900-1800mm"""
+    segments = [n for n in numbers if 400 <= n <= 800]
+    potential_widths = []
+    for i, seg1 in enumerate(segments):
+        for seg2 in segments[i + 1:]:
+            if abs(seg1 - seg2) <= 50:
+                total_width = seg1 + seg2
+                if 900 <= total_width <= 1800:
+                    potential_widths.append({'segments': [seg1, seg2], 'total': total_width})
+    return potential_widths
+
+
+def drawing_numbers(rng, count, runs):
+    def stray():
+        return rng.choice([rng.randint(10, 3000), rng.choice([18, 19, 100, 560, 720, 745, 870]),
+                           rng.randint(2000, 5000)])
+
+    blocks, planted = [[stray()] for _ in range(count)], []
+    for _ in range(runs):
+        run = [rng.choice(UNIT_WIDTHS) for _ in range(rng.randint(2, 6))]
+        blocks.insert(rng.randrange(len(blocks) + 1), run + [sum(run)])
+        planted.append((sum(run), tuple(sorted(run))))
+    return [n for block in blocks for n in block], planted
+
+
+def found(results, planted):
+    suggested = {(result['total'], tuple(sorted(result['segments']))) for result in results}
+    return sum(run in suggested for run in planted)
+
+
+def timed(function, numbers, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = function(numbers)
+    return (time.perf_counter() - start) / repeat, results
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    print(f"{'numbers':>8} {'pair loop':>10} {'found':>6} {'segmented':>10} {'found':>6}")
+    for count in args.numbers:
+        numbers, planted = drawing_numbers(rng, count, args.runs)
+        old, old_results = timed(pair_loop, numbers, args.repeat)
+        new, new_results = timed(segmented_widths, numbers, args.repeat)
+        print(f"{count:>8} {old * 1000:>8.1f}ms {found(old_results, planted):>3}/{len(planted)}"
+              f" {new * 1000:>8.1f}ms {found(new_results, planted):>3}/{len(planted)}"
+              f"   ({len(old_results)} pair suggestions, top: {new_results[0]['description']})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--numbers', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--runs', type=int, default=5, help='runs of units planted in each drawing')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    main(parser.parse_args())
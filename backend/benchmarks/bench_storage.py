@@ -0,0 +1,103 @@
+"""Compare the old list storage with RecordStore and SQLiteStore.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_storage --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from sqlite_store import Database, SQLiteStore
+from store import RecordStore
+
+STAGES = ['Lead', 'Quoted', 'Accepted', 'Production', 'Installed']
+
+
+def make_jobs(n):
+    return [{
+        'id': str(uuid.uuid4()),
+        'customer_id': str(uuid.uuid4()),
+        'stage': random.choice(STAGES),
+        'job_type': 'Kitchen',
+        'created_at': '2024-01-01T09:00:00',
+        'updated_at': '2024-01-01T09:00:00',
+    } for _ in range(n)]
+
+
+class ListStore:
+    """The original module-level list handling, for comparison"""
+
+    def __init__(self):
+        self.records = []
+
+    def add(self, record):
+        self.records.append(record)
+
+    def get(self, record_id):
+        return next((r for r in self.records if r['id'] == record_id), None)
+
+    def update(self, record_id, data):
+        record = self.get(record_id)
+        record.update(data)
+
+    def delete(self, record_id):
+        self.records = [r for r in self.records if r['id'] != record_id]
+
+    def find(self, stage):
+        return [r for r in self.records if r.get('stage') == stage]
+
+
+def timed(fn, count):
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def bench(name, store, records, ops, load=None):
+    start = time.perf_counter()
+    if load:
+        load(store, records)
+    else:
+        for record in records:
+            store.add(record)
+    load_s = time.perf_counter() - start
+    sample = random.sample(records, ops * 2)
+    get_us = timed(lambda i: store.get(sample[i]['id']), ops)
+    update_us = timed(lambda i: store.update(sample[i]['id'], {'stage': 'Quoted'}), ops)
+    find_us = timed(lambda i: store.find(stage='Lead'), 3)
+    delete_us = timed(lambda i: store.delete(sample[ops + i]['id']), ops)
+    print(f"{name:<8} {len(records):>9} {load_s:>9.2f}s {get_us:>11.1f} {update_us:>11.1f} "
+          f"{find_us / 1000:>10.1f} {delete_us:>11.1f}")
+
+
+def load_sqlite(store, records):
+    with store.db.transaction():
+        for record in records:
+            store.add(record)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--ops', type=int, default=50, help='lookups/updates/deletes per size')
+    args = parser.parse_args()
+
+    print(f"{'store':<8} {'rows':>9} {'load':>10} {'get us':>11} {'update us':>11} "
+          f"{'find ms':>10} {'delete us':>11}")
+    for size in args.sizes:
+        records = make_jobs(size)
+        bench('list', ListStore(), records, args.ops)
+        bench('memory', RecordStore(), records, args.ops)
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, 'bench.db'))
+            bench('sqlite', SQLiteStore(db, 'jobs'), records, args.ops, load=load_sqlite)
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
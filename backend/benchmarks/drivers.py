@@ -0,0 +1,126 @@
+"""Ways of sending requests to the app, and timing a batch of them."""
+import http.client
+import json
+import os
+import resource
+import threading
+import time
+
+
+class ClientDriver:
+    """Requests through Flask's test client, in this process"""
+
+    name = 'client'
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code, len(response.get_data())
+
+
+class HTTPDriver:
+    """Requests over keep-alive HTTP connections, one per thread"""
+
+    name = 'http'
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        return conn
+
+    def request(self, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                return response.status, len(response.read())
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle connection; reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt == 2:
+                    raise
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def measure(driver, endpoint, ids, requests, concurrency=1):
+    """Send endpoint's first `requests` requests; returns a result dict"""
+    latencies, statuses, sizes = [], {}, 0
+    lock = threading.Lock()
+
+    def run(indexes):
+        nonlocal sizes
+        local, local_statuses, local_bytes = [], {}, 0
+        for i in indexes:
+            path, body = endpoint.build(i, ids)
+            start = time.perf_counter()
+            try:
+                status, size = driver.request(endpoint.method, path, body)
+            except Exception:
+                status, size = 'error', 0
+            local.append(time.perf_counter() - start)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+            local_bytes += size
+        with lock:
+            latencies.extend(local)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+            sizes += local_bytes
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        run(range(requests))
+    else:
+        threads = [threading.Thread(target=run, args=(range(n, requests, concurrency),))
+                   for n in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status == 'error' or status >= 500)
+    return {
+        'endpoint': endpoint.name,
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'statuses': {str(status): count for status, count in statuses.items()},
+        'throughput': requests / elapsed if elapsed else None,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'bytes_per_request': sizes // max(1, requests),
+    }
+
+
+def peak_rss_mb(pid=None):
+    """Peak resident memory of a process (this one by default), or None if unknown"""
+    try:
+        with open(f"/proc/{pid or os.getpid()}/status") as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid is None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024 if os.uname().sysname == 'Darwin' else 1024)
+    return None
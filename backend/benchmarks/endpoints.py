@@ -0,0 +1,62 @@
+"""The requests each benchmark round sends, one entry per endpoint.
+
+Each endpoint builds its i-th request from the seeded ids. Whole-collection
+reads are skipped above max_size, where a single response runs to
+hundreds of megabytes. Writes come after the reads, and deletes last, so
+every read sees the seeded data.
+"""
+from datetime import timedelta
+from urllib.parse import quote
+
+
+class Endpoint:
+    def __init__(self, name, method, build, max_size=None):
+        self.name = name
+        self.method = method
+        self.build = build  # (i, ids) -> (path, json body or None)
+        self.max_size = max_size
+
+    def runs_at(self, size):
+        return self.max_size is None or size <= self.max_size
+
+
+def _pick(values, i):
+    # Spread requests over the ids without a random generator per driver
+    return values[(i * 7919) % len(values)]
+
+
+def _staff_week(i, ids):
+    day = ids['start'] + timedelta(days=(i * 7) % 84)
+    staff_id = _pick(ids['staff_ids'], i)
+    return f"/assignments?staff_id={staff_id}&from={day}&to={day + timedelta(days=6)}", None
+
+
+def _search(i, ids):
+    # Alternate a name, a misspelt name and an email prefix of a seeded customer
+    n = (i * 7919) % len(ids['customer_ids'])
+    query = [f"customer {n}", f"custmoer {n}", f"customer{n}@exa"][i % 3]
+    return f"/customers/search?q={quote(query)}", None
+
+
+ENDPOINTS = [
+    Endpoint('customers.list', 'GET', lambda i, ids: ('/customers', None), max_size=100000),
+    Endpoint('customers.page', 'GET', lambda i, ids: ('/customers?limit=100', None)),
+    Endpoint('customers.active', 'GET', lambda i, ids: ('/customers/active?limit=100', None)),
+    Endpoint('customers.get', 'GET', lambda i, ids: (f"/customers/{_pick(ids['customer_ids'], i)}", None)),
+    Endpoint('customers.search', 'GET', _search),
+    Endpoint('jobs.available', 'GET', lambda i, ids: ('/jobs/available?limit=100', None)),
+    Endpoint('jobs.get', 'GET', lambda i, ids: (f"/jobs/{_pick(ids['job_ids'], i)}", None)),
+    Endpoint('assignments.staff_week', 'GET', _staff_week),
+    Endpoint('staff.availability', 'GET',
+             lambda i, ids: (f"/staff/{_pick(ids['staff_ids'], i)}/availability?date={ids['start']}", None)),
+    Endpoint('stats', 'GET', lambda i, ids: ('/stats', None)),
+    Endpoint('stats.week', 'GET', lambda i, ids: (
+        f"/stats?from={ids['start']}&to={ids['start'] + timedelta(days=6)}", None)),
+    Endpoint('pipeline', 'GET', lambda i, ids: ('/pipeline', None), max_size=100000),
+    Endpoint('pipeline.stage', 'GET', lambda i, ids: ('/pipeline?stage=Production', None), max_size=100000),
+    Endpoint('customers.create', 'POST', lambda i, ids: ('/customers', {'name': f'New {i}', 'stage': 'Lead'})),
+    Endpoint('customers.update', 'PUT',
+             lambda i, ids: (f"/customers/{_pick(ids['customer_ids'], i)}", {'stage': 'Quoted', 'notes': f'n{i}'})),
+    # Each request deletes a different seeded customer
+    Endpoint('customers.delete', 'DELETE', lambda i, ids: (f"/customers/{ids['customer_ids'][-1 - i]}", None)),
+]
@@ -0,0 +1,93 @@
+"""Synthetic CRM data at a given size, loaded straight into the app's stores."""
+import random
+import uuid
+from datetime import date, timedelta
+
+from records import new_assignment, new_customer, new_job
+
+STAGES = ['Lead', 'Quoted', 'Accepted', 'Production', 'ready', 'Installed']
+ROLES = ['Installer', 'Installer', 'Measuring', 'Delivery']
+PRIORITIES = ['Low', 'Medium', 'Medium', 'High', 'Urgent']
+HORIZON_DAYS = 90
+SLOTS = [('08:00', '10:00'), ('10:00', '12:00'), ('13:00', '15:00'), ('15:00', '17:00')]
+
+
+def make_staff(count):
+    return [{'id': i + 1, 'name': f'Staff {i + 1}', 'role': ROLES[i % len(ROLES)], 'user_id': None}
+            for i in range(count)]
+
+
+def make_customers(count, rng):
+    return [new_customer({
+        'id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'name': f'Customer {i}',
+        'email': f'customer{i}@example.com',
+        'phone': f'07{rng.randrange(10**9):09d}',
+        'address': f'{rng.randrange(1, 200)} High Street, Town {i % 50}',
+        'stage': rng.choice(STAGES),
+        'status': 'active' if rng.random() < 0.8 else 'inactive',
+    }) for i in range(count)]
+
+
+def make_jobs(count, customers, rng):
+    return [new_job({
+        'id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'customer_id': rng.choice(customers)['id'],
+        'job_reference': f'JOB-{i:07d}',
+        'stage': rng.choice(STAGES),
+        'priority': rng.choice(PRIORITIES),
+        'estimated_hours': rng.choice([1, 2, 4, 8]),
+    }) for i in range(count)]
+
+
+def make_assignments(count, jobs, staff, start, rng):
+    """Assignments spread over staff and days, one per slot so none overlap"""
+    slots_per_day = len(staff) * len(SLOTS)
+    assignments = []
+    for i in range(count):
+        member = staff[i % len(staff)]
+        slot = SLOTS[(i // len(staff)) % len(SLOTS)]
+        day = start + timedelta(days=(i // slots_per_day) % HORIZON_DAYS)
+        job = rng.choice(jobs) if jobs else {}
+        assignments.append(new_assignment({
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'staff_id': member['id'],
+            'date': day.isoformat(),
+            'start_time': slot[0],
+            'end_time': slot[1],
+            'estimated_hours': 2,
+            'title': f"{job.get('job_reference', 'Visit')}",
+            'job_id': job.get('id'),
+            'customer_id': job.get('customer_id'),
+        }))
+    return assignments
+
+
+def seed(app_module, size, jobs_ratio=1.0, assignments_ratio=1.0, seed=0):
+    """Fill crm_backend's stores with size customers and proportional jobs,
+    assignments and staff (one member per 200 customers, at least 5).
+
+    Returns the ids generated, for drivers to pick from; the records
+    themselves are left to the stores.
+    """
+    rng = random.Random(seed)
+    staff = make_staff(max(5, size // 200))
+    customers = make_customers(size, rng)
+    jobs = make_jobs(int(size * jobs_ratio), customers, rng)
+    start = date(2030, 1, 7)
+    assignments = make_assignments(int(size * assignments_ratio), jobs, staff, start, rng)
+
+    app_module.staff_members[:] = staff
+    for name, records in (('customers', customers), ('jobs', jobs), ('assignments', assignments)):
+        store = app_module.collections[name]
+        for i in range(0, len(records), 10000):
+            with store.transaction():
+                for record in records[i:i + 10000]:
+                    store.add(record)
+    return {
+        'staff_ids': [s['id'] for s in staff],
+        'customer_ids': [c['id'] for c in customers],
+        'job_ids': [j['id'] for j in jobs],
+        'assignment_ids': [a['id'] for a in assignments],
+        'start': start,
+    }
@@ -0,0 +1,38 @@
+"""Seed the CRM app and serve it over HTTP for the benchmark suite.
+
+    python -m benchmarks.serve --size 10000 --port 5300 --ids-file /tmp/ids.json
+
+Writes the seeded ids to --ids-file, then prints 'ready' and serves until
+killed. Set CRM_DATABASE beforehand to serve the SQLite store.
+"""
+import argparse
+import json
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from benchmarks.seed import seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, required=True)
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--ids-file', required=True)
+    parser.add_argument('--jobs-ratio', type=float, default=1.0)
+    parser.add_argument('--assignments-ratio', type=float, default=1.0)
+    args = parser.parse_args()
+
+    import crm_backend
+    ids = seed(crm_backend, args.size, args.jobs_ratio, args.assignments_ratio)
+    with open(args.ids_file, 'w') as f:
+        json.dump({**ids, 'start': ids['start'].isoformat()}, f)
+
+    # Keep-alive, so the drivers measure requests rather than TCP handshakes
+    WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+    server = make_server('127.0.0.1', args.port, crm_backend.app, threaded=True)
+    print('ready', flush=True)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
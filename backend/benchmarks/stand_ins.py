@@ -0,0 +1,107 @@
+"""Local stand-ins for the Google Vision and OpenAI APIs.
+
+Benchmarks and tests of the drawing analysis use these instead of the
+real services: StandIn answers through an httpx MockTransport inside the
+process, serve_upstream from a local HTTP server for analyzers running in
+another process. Import this module before analyzer, since the API keys
+the analyzer reads at import only have to be set, not valid.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+os.environ.setdefault('OPENAI_API_KEY', 'stand-in')
+os.environ.setdefault('GOOGLE_VISION_API_KEY', 'stand-in')
+
+ANALYSIS = {
+    'cabinet_width': 1200, 'cabinet_working_height': 745, 'cabinet_depth': 560,
+    'components': {'gables': {}, 'tb_panels': {}, 'sh_hardware': {}, 'back': {}},
+}
+
+
+def vision_response(text):
+    return {'responses': [{'textAnnotations': [{'description': text}]}]}
+
+
+def openai_response(analysis):
+    return {'choices': [{'message': {'content': json.dumps(analysis)}}]}
+
+
+VISION_RESPONSE = vision_response('600 600 1200 870 560')
+OPENAI_RESPONSE = openai_response(ANALYSIS)
+
+
+def service(url):
+    """'vision' or 'openai', whichever API a request URL is for"""
+    return 'vision' if 'vision' in str(url) else 'openai'
+
+
+class StandIn:
+    """Both APIs, answering after a delay per call.
+
+    ocr_delay and llm_delay are seconds per Vision and OpenAI call, plus
+    the time to receive the request body at bytes_per_second if given.
+    calls, in_flight and peak count calls per service; fail(service,
+    request) returning true makes that call answer 500.
+    """
+
+    def __init__(self, ocr_delay=0, llm_delay=0, bytes_per_second=None,
+                 vision=VISION_RESPONSE, openai=OPENAI_RESPONSE, fail=None):
+        self.delays = {'vision': ocr_delay, 'openai': llm_delay}
+        self.bytes_per_second = bytes_per_second
+        self.responses = {'vision': vision, 'openai': openai}
+        self.fail = fail
+        self.calls, self.in_flight, self.peak = Counter(), Counter(), Counter()
+
+    def clear(self):
+        self.calls.clear()
+        self.peak.clear()
+
+    async def handle(self, request):
+        name = service(request.url)
+        self.calls[name] += 1
+        self.in_flight[name] += 1
+        self.peak[name] = max(self.peak[name], self.in_flight[name])
+        try:
+            delay = self.delays[name]
+            if self.bytes_per_second:
+                delay += len(request.content) / self.bytes_per_second
+            await asyncio.sleep(delay)
+        finally:
+            self.in_flight[name] -= 1
+        if self.fail and self.fail(name, request):
+            return httpx.Response(500, json={'error': {'message': 'stand-in failure'}})
+        return httpx.Response(200, json=self.responses[name])
+
+    def client(self):
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+
+
+def serve_upstream(port, delay):
+    """Serve both APIs on 127.0.0.1:port, answering after delay seconds.
+
+    Point OPENAI_API_URL at /openai and VISION_API_URL at /vision on it.
+    """
+    class Upstream(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            time.sleep(delay)
+            body = json.dumps(VISION_RESPONSE if service(self.path) == 'vision' else OPENAI_RESPONSE).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
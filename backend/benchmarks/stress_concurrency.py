@@ -0,0 +1,217 @@
+"""Hammer a threaded CRM server with concurrent writes and check the results.
+
+Starts the app on local ports (one threaded server per process) and runs
+client threads doing PUTs of per-thread fields on shared customers,
+create/delete churn, paged GETs and racing bookings of the same assignment
+slots, then checks that no write was lost, no request failed, every slot
+was booked once and the derived views agree with the stores.
+
+Run from the backend directory; several processes need CRM_DATABASE:
+
+    python -m benchmarks.stress_concurrency --threads 16 --seconds 10
+    CRM_DATABASE=/tmp/stress.db python -m benchmarks.stress_concurrency --processes 4
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BASE_PORT = 5100
+
+
+def serve(port):
+    from werkzeug.serving import make_server
+
+    from crm_backend import app
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def start_servers(processes):
+    ports = [BASE_PORT + i for i in range(processes)]
+    servers = [subprocess.Popen([sys.executable, '-m', 'benchmarks.stress_concurrency', '--serve', str(port)],
+                                stderr=subprocess.DEVNULL) for port in ports]
+    for port in ports:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/health')
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise SystemExit(f'server on port {port} did not start')
+    return ports, servers
+
+
+class Client:
+    def __init__(self, ports):
+        self.ports = ports
+        self.errors = []
+
+    def call(self, method, path, body=None):
+        """Return (status, parsed body) from a random server"""
+        status, data, _ = self.request(method, path, body)
+        return status, data
+
+    def request(self, method, path, body=None):
+        url = f'http://127.0.0.1:{random.choice(self.ports)}{path}'
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(url, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request) as response:
+                status, headers, raw = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, headers, raw = e.code, e.headers, e.read()
+        if status >= 500:
+            self.errors.append(f'{method} {path}: {status}')
+        return status, json.loads(raw) if raw else None, headers
+
+
+def writer(client, n, shared, deadline, last_written, live):
+    """PUT this thread's own field on shared customers; create and delete others"""
+    field, count = f'f{n}', 0
+    mine = []
+    while time.time() < deadline:
+        count += 1
+        record_id = random.choice(shared)
+        status, _ = client.call('PUT', f'/customers/{record_id}', {field: count})
+        if status == 200:
+            last_written[(record_id, field)] = count
+        status, customer = client.call('POST', '/customers', {'name': f'churn {n}-{count}'})
+        if status == 201:
+            mine.append(customer['id'])
+            client.call('POST', '/jobs', {'customer_id': customer['id'], 'stage': 'Quoted'})
+        if len(mine) > 5:
+            record_id = mine.pop(random.randrange(len(mine)))
+            if client.call('DELETE', f'/customers/{record_id}')[0] != 204:
+                mine.append(record_id)
+    live.update(mine)
+
+
+def reader(client, deadline, problems):
+    """Page through customers and read the pipeline while writes go on"""
+    while time.time() < deadline:
+        seen, cursor = set(), ''
+        while cursor is not None:
+            status, page, headers = client.request('GET', f'/customers?limit=50&after={cursor}')
+            if status != 200:
+                break
+            ids = [c['id'] for c in page]
+            if seen.intersection(ids):
+                problems.append('paging returned a record twice')
+            seen.update(ids)
+            cursor = headers.get('X-Next-Cursor')
+        client.call('GET', '/pipeline')
+        client.call('GET', '/assignments?staff_id=1')
+
+
+def book_slots(client, threads, slots, problems):
+    """Race threads to book the same slots; exactly one booking each should win"""
+    wins = {slot: 0 for slot in range(slots)}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def run():
+        barrier.wait()
+        for slot in range(slots):
+            status, _ = client.call('POST', '/assignments', {
+                'staff_id': 1, 'date': '2030-01-01', 'title': f'slot {slot}',
+                'start_time': f'{8 + slot:02d}:00', 'end_time': f'{9 + slot:02d}:00'})
+            if status == 201:
+                with lock:
+                    wins[slot] += 1
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    for slot, count in wins.items():
+        if count != 1:
+            problems.append(f'slot {slot} booked {count} times')
+
+
+def check_views(client, port, problems):
+    """Compare the pipeline, schedule index and stats on one server with the stores"""
+    client = Client([port])
+    _, customers = client.call('GET', '/customers')
+    _, jobs = client.call('GET', '/jobs')
+    _, pipeline = client.call('GET', '/pipeline')
+    by_id = {c['id']: c for c in customers}
+    with_jobs = {j['customer_id'] for j in jobs if j.get('customer_id') in by_id}
+    expected = {f"job-{j['id']}" for j in jobs if j.get('customer_id') in by_id}
+    expected |= {f"customer-{c['id']}" for c in customers if c['id'] not in with_jobs}
+    if {item['id'] for item in pipeline} != expected:
+        problems.append(f'pipeline on port {port} does not match customers and jobs')
+    _, indexed = client.call('GET', '/assignments?staff_id=1')
+    _, scanned = client.call('GET', '/assignments?staff_id=1&limit=1000')
+    if sorted(a['id'] for a in indexed) != sorted(a['id'] for a in scanned):
+        problems.append(f'schedule index on port {port} does not match assignments')
+    _, stats = client.call('GET', '/stats')
+    if (stats['customers']['total'], stats['jobs']['total']) != (len(customers), len(jobs)):
+        problems.append(f'stats on port {port} do not match customers and jobs')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--shared', type=int, default=20, help='customers every writer updates')
+    parser.add_argument('--slots', type=int, default=8, help='assignment slots to race for')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args.serve)
+    if args.processes > 1 and not os.getenv('CRM_DATABASE'):
+        raise SystemExit('several processes need CRM_DATABASE to share records')
+
+    ports, servers = start_servers(args.processes)
+    try:
+        client = Client(ports)
+        shared = [client.call('POST', '/customers', {'name': f'shared {i}'})[1]['id'] for i in range(args.shared)]
+        problems, last_written, live = [], {}, set()
+        deadline = time.time() + args.seconds
+        threads = [threading.Thread(target=writer, args=(client, n, shared, deadline, last_written, live))
+                   for n in range(args.threads)]
+        threads += [threading.Thread(target=reader, args=(client, deadline, problems))
+                    for _ in range(max(1, args.threads // 4))]
+        for t in threads:
+            t.start()
+        book_slots(client, args.threads, args.slots, problems)
+        for t in threads:
+            t.join()
+
+        for record_id in shared:
+            _, customer = client.call('GET', f'/customers/{record_id}')
+            for (written_id, field), value in last_written.items():
+                if written_id == record_id and customer.get(field) != value:
+                    problems.append(f'lost update: {record_id} {field}={customer.get(field)}, wrote {value}')
+        _, customers = client.call('GET', '/customers')
+        ids = {c['id'] for c in customers}
+        if not live.union(shared) <= ids:
+            problems.append(f'{len(live.union(shared) - ids)} created customers missing')
+        for port in ports:
+            check_views(client, port, problems)
+    finally:
+        for server in servers:
+            server.terminate()
+
+    store = os.getenv('CRM_DATABASE') and 'sqlite' or 'memory'
+    print(f"{args.threads} writers, {args.processes} process(es), {store} store, {args.seconds:g}s")
+    print(f"{len(last_written)} fields updated, {len(ids)} customers, {len(client.errors)} server errors")
+    for problem in (client.errors + problems)[:20]:
+        print('  ' + problem)
+    if client.errors or problems:
+        raise SystemExit(1)
+    print('consistent')
+
+
+if __name__ == '__main__':
+    main()
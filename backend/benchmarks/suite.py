@@ -0,0 +1,82 @@
+"""Run every endpoint at one data size with one driver, in a fresh process.
+
+    python -m benchmarks.suite --size 10000 --driver http
+
+Prints one JSON object with the results. `python -m benchmarks run` calls
+this once per size and driver, so each run starts from empty stores.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+from benchmarks.drivers import ClientDriver, HTTPDriver, measure, peak_rss_mb
+from benchmarks.endpoints import ENDPOINTS
+
+PORT = 5300
+
+
+def run_client(args, endpoints):
+    import crm_backend
+    from benchmarks.seed import seed
+
+    start = time.perf_counter()
+    ids = seed(crm_backend, args.size, args.jobs_ratio, args.assignments_ratio)
+    seeded = {'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+    driver = ClientDriver(crm_backend.app)
+    results = []
+    for endpoint in endpoints:
+        results.append({**measure(driver, endpoint, ids, args.requests), 'peak_rss_mb': peak_rss_mb()})
+    return seeded, results
+
+
+def run_http(args, endpoints):
+    with tempfile.TemporaryDirectory() as tmp:
+        ids_file = os.path.join(tmp, 'ids.json')
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.serve', '--size', str(args.size), '--port', str(PORT),
+             '--ids-file', ids_file, '--jobs-ratio', str(args.jobs_ratio),
+             '--assignments-ratio', str(args.assignments_ratio)],
+            stdout=subprocess.PIPE, text=True)
+        try:
+            if server.stdout.readline().strip() != 'ready':
+                raise SystemExit('benchmark server failed to start')
+            with open(ids_file) as f:
+                ids = json.load(f)
+            ids['start'] = date.fromisoformat(ids['start'])
+            seeded = {'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb(server.pid)}
+            driver = HTTPDriver('127.0.0.1', PORT)
+            results = []
+            for endpoint in endpoints:
+                result = measure(driver, endpoint, ids, args.requests, args.concurrency)
+                results.append({**result, 'peak_rss_mb': peak_rss_mb(server.pid)})
+        finally:
+            server.terminate()
+            server.wait()
+    return seeded, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, required=True)
+    parser.add_argument('--driver', choices=['client', 'http'], default='client')
+    parser.add_argument('--requests', type=int, default=1000, help='per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads (http driver)')
+    parser.add_argument('--endpoints', nargs='*', help='names to run (default all)')
+    parser.add_argument('--jobs-ratio', type=float, default=1.0)
+    parser.add_argument('--assignments-ratio', type=float, default=1.0)
+    args = parser.parse_args()
+
+    endpoints = [e for e in ENDPOINTS if e.runs_at(args.size) and (not args.endpoints or e.name in args.endpoints)]
+    run = run_client if args.driver == 'client' else run_http
+    seeded, results = run(args, endpoints)
+    json.dump({'size': args.size, 'driver': args.driver, 'seed': seeded, 'results': results}, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
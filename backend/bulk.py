@@ -0,0 +1,118 @@
+from records import invalid_fields, valid_id
+
+OPERATIONS = ('create', 'update', 'delete')
+
+
+def check_operation(store, op, exists):
+    """Return an error result for an operation that can't be applied, else None.
+
+    exists maps ids created or deleted earlier in the batch to whether they
+    exist afterwards, so later operations see those effects. A create may
+    choose its record's id, but not one that is already taken.
+    """
+    if not isinstance(op, dict) or op.get('op') not in OPERATIONS:
+        return {'status': 422, 'error': f"op must be one of {', '.join(OPERATIONS)}"}
+    if op['op'] in ('create', 'update'):
+        if not isinstance(op.get('data'), dict):
+            return {'status': 422, 'error': 'data must be an object'}
+        fields = invalid_fields(op['data'])
+        if fields:
+            return {'status': 422, 'error': f"{', '.join(fields)} must be a string, number or boolean"}
+    record_id = op['data'].get('id') if op['op'] == 'create' else op.get('id')
+    if op['op'] == 'create' and 'id' not in op['data']:
+        return None
+    if not valid_id(record_id):
+        return {'status': 422, 'error': 'id must be a non-empty string'}
+    found = exists[record_id] if record_id in exists else record_id in store
+    if op['op'] == 'create' and found:
+        return {'status': 409, 'error': 'id already exists'}
+    if op['op'] != 'create' and not found:
+        return {'status': 404, 'error': 'not found'}
+    return None
+
+
+def planned_record(store, build, op, pending):
+    """The record a create or update would write; pending holds records
+    planned earlier in an atomic batch, by id, that aren't stored yet"""
+    if op['op'] == 'create':
+        return build(op['data'])
+    current = pending[op['id']] if op['id'] in pending else store.get(op['id'])
+    return {**current, **op['data'], 'id': op['id']}
+
+
+def check_conflicts(conflicts, record, pending, allow):
+    """(error result or None, clashing ids) for a record about to be written"""
+    clashes = conflicts(record, pending) if conflicts else []
+    if clashes and not allow:
+        return {'status': 409, 'error': 'conflicts with existing records', 'conflicts': clashes}, clashes
+    return None, clashes
+
+
+def apply_operation(store, op, record, clashes=()):
+    if op['op'] == 'create':
+        result = {'status': 201, 'record': store.add(record)}
+    elif op['op'] == 'update':
+        result = {'status': 200, 'record': store.update(op['id'], op['data'])}
+    else:
+        store.delete(op['id'])
+        return {'status': 204, 'id': op['id']}
+    if clashes:
+        result['conflicts'] = clashes
+    return result
+
+
+def apply_operations(store, build, operations, atomic=False, conflicts=None, allow_conflicts=False):
+    """Apply a batch of create/update/delete operations in one pass.
+
+    Returns (results, applied) with one result per operation. Invalid
+    operations get a 4xx result; in atomic mode every operation is checked
+    first and nothing is written unless all of them can be applied. Writes
+    run inside one store transaction, so SQLite commits once per batch.
+
+    conflicts, if given, is called as conflicts(record, pending) for the
+    record each create or update would write, and returns the ids of
+    records it clashes with; pending maps ids written earlier in the batch
+    to their new record (None once deleted), as the views the check reads
+    may only hear of them on commit. A clashing operation fails with 409
+    unless allow_conflicts is set, when the ids are listed in its result
+    instead.
+    """
+    results = []
+    with store.transaction():
+        # Checked inside the transaction, so no other writer can change
+        # what the checks saw before the batch is applied
+        if atomic:
+            exists, pending, errors, planned = {}, {}, [], []
+            for op in operations:
+                error = check_operation(store, op, exists)
+                record, clashes = None, []
+                if error is None and op['op'] != 'delete':
+                    record = planned_record(store, build, op, pending)
+                    error, clashes = check_conflicts(conflicts, record, pending, allow_conflicts)
+                errors.append(error)
+                planned.append((record, clashes))
+                if error is None and op['op'] == 'delete':
+                    exists[op['id']] = False
+                    pending[op['id']] = None
+                elif error is None:
+                    exists[record['id']] = True
+                    pending[record['id']] = record
+            if any(errors):
+                return [error or {'status': 424, 'error': 'not applied'} for error in errors], False
+            for op, (record, clashes) in zip(operations, planned):
+                results.append(apply_operation(store, op, record, clashes))
+            return results, True
+
+        written = {}
+        for op in operations:
+            error, record, clashes = check_operation(store, op, {}), None, []
+            if error is None and op['op'] != 'delete':
+                record = planned_record(store, build, op, {})
+                error, clashes = check_conflicts(conflicts, record, written, allow_conflicts)
+            if error:
+                results.append(error)
+                continue
+            result = apply_operation(store, op, record, clashes)
+            written[op['id'] if op['op'] != 'create' else record['id']] = result.get('record')
+            results.append(result)
+    return results, True
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Delete tombstones kept per collection; a client whose sequence predates
+# the oldest one dropped is told to resync
+TOMBSTONE_RETENTION = int(os.getenv('CRM_TOMBSTONE_RETENTION', '10000'))
+
+
+class ChangeLog:
+    """A monotonic change sequence over the CRM collections.
+
+    Every write to a tracked store takes the next sequence number. For each
+    collection the log keeps the latest change per record id, ordered by
+    sequence, so since() walks only the changes newer than the caller's
+    sequence. Deletes stay behind as tombstones so clients can drop them,
+    up to max_tombstones per collection; older ones are pruned, and since()
+    raises StaleSequence for a sequence from before the newest one pruned.
+
+    Sequences start from the clock at startup, which keeps them increasing
+    across restarts; a caller whose sequence predates this process is told
+    to resync (since() raises StaleSequence) rather than missing changes.
+    reset() does the same when the stores changed behind the log's back,
+    e.g. another process writing to a shared database.
+
+    Changes are recorded with the tracked stores' writer lock held; pass
+    that lock in so readers walk the log under it too.
+    """
+
+    def __init__(self, lock=None, max_tombstones=TOMBSTONE_RETENTION):
+        self.start = self.seq = time.time_ns() // 1000
+        self.max_tombstones = max_tombstones
+        self._changes = {}  # collection -> OrderedDict(id -> (seq, deleted))
+        self._deletes = {}  # collection -> deque([(seq, id)]) of deletes, oldest first
+        self._pruned = {}   # collection -> seq of the newest tombstone pruned
+        self._listeners = []
+        self._lock = lock or threading.RLock()
+
+    def subscribe(self, listener):
+        """Call listener(collection, seq, action, old, new) after each change.
+
+        After a reset() the listener is called once with collection None
+        and action 'reset'.
+        """
+        self._listeners.append(listener)
+
+    def track(self, name, store):
+        self._changes[name] = OrderedDict()
+        self._deletes[name] = deque()
+        store.subscribe(lambda action, old, new: self._record(name, action, old, new))
+
+    def _record(self, name, action, old, new):
+        with self._lock:
+            self.seq += 1
+            record_id = (new or old)['id']
+            changes = self._changes[name]
+            changes[record_id] = (self.seq, action == 'delete')
+            changes.move_to_end(record_id)
+            if action == 'delete':
+                self._prune(name, record_id)
+            for listener in self._listeners:
+                listener(name, self.seq, action, old, new)
+
+    def _prune(self, name, record_id):
+        changes, deletes = self._changes[name], self._deletes[name]
+        deletes.append((self.seq, record_id))
+        while len(deletes) > self.max_tombstones:
+            seq, old_id = deletes.popleft()
+            # Unless the id has changed again since, its tombstone goes
+            if changes.get(old_id) == (seq, True):
+                del changes[old_id]
+                self._pruned[name] = seq
+
+    def reset(self):
+        """Forget all changes; callers holding older sequences must resync"""
+        with self._lock:
+            self.seq += 1
+            self.start = self.seq
+            for changes in self._changes.values():
+                changes.clear()
+            for deletes in self._deletes.values():
+                deletes.clear()
+            self._pruned.clear()
+            for listener in self._listeners:
+                listener(None, self.seq, 'reset', None, None)
+
+    def version(self, *names):
+        """Sequence of the latest change to any of the named collections"""
+        versions = [self.start]
+        with self._lock:
+            for name in names:
+                changes = self._changes[name]
+                if changes:
+                    versions.append(changes[next(reversed(changes))][0])
+        return max(versions)
+
+    def since(self, name, seq):
+        """Return (changed ids, deleted ids) for changes after seq"""
+        changed, deleted = [], []
+        with self._lock:
+            if seq < max(self.start, self._pruned.get(name, 0)):
+                raise StaleSequence(seq)
+            changes = self._changes[name]
+            for record_id in reversed(changes):
+                change_seq, is_deleted = changes[record_id]
+                if change_seq <= seq:
+                    break
+                (deleted if is_deleted else changed).append(record_id)
+        changed.reverse()
+        deleted.reverse()
+        return changed, deleted
+
+
+class StaleSequence(Exception):
+    """The requested sequence is older than the change log"""
@@ -1,15 +1,54 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-import uuid
-from datetime import datetime
+import hashlib
+import os
+import threading
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+
+from bulk import apply_operations
+from changes import ChangeLog, StaleSequence
+from events import EventBroker
+from journal import Journal, parse_fsync
+from json_cache import FastJSONProvider, RecordCache, dumps
+from metrics import Metrics, instrument
+from ndjson import export_lines, import_lines
+from pipeline import PipelineView
+from records import BUILDERS, invalid_fields, new_assignment, new_customer, new_job, valid_id
+from schedule_index import StaffScheduleIndex, date_range
+from scheduler import plan_jobs
+from search import CustomerSearchIndex
+from sqlite_store import Database, SQLiteStore
+from stats import StatsView
+from store import Range, RecordStore, filter_records
+
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Next-Cursor', 'X-Change-Seq']
 
 app = Flask(__name__)
-CORS(app)
+app.json = FastJSONProvider(app)
+metrics = Metrics()
+instrument(app, metrics)
+metrics.describe('crm_store_seconds', 'histogram', 'Time spent fetching records, by collection and operation')
+metrics.describe('crm_serialize_seconds', 'histogram', 'Time spent encoding response bodies, by collection')
+metrics.describe('crm_records', 'gauge', 'Records per collection')
+CORS(app, expose_headers=CORS_EXPOSE_HEADERS)
+
+# Records are kept in memory unless CRM_DATABASE names a SQLite file, which
+# is also what lets several worker processes share them
+DATABASE_PATH = os.getenv('CRM_DATABASE')
+database = Database(DATABASE_PATH) if DATABASE_PATH else None
+
+# One writer lock for every store, so a write and the derived views it
+# updates (pipeline, schedule index, change log) move together; reads don't
+# take it except to copy a derived view
+write_lock = threading.RLock()
+
+def make_store(table):
+    return SQLiteStore(database, table, write_lock) if database else RecordStore(lock=write_lock)
 
-# Temporary in-memory storage - replace with database later
-customers = []
-jobs = []
-assignments = []
+customers = make_store('customers')
+jobs = make_store('jobs')
+assignments = make_store('assignments')
 staff_members = [
     {"id": 1, "name": "John Smith", "role": "Installer", "user_id": "staff-001"},
     {"id": 2, "name": "Mike Johnson", "role": "Installer", "user_id": None},
@@ -17,122 +56,324 @@ staff_members = [
     {"id": 4, "name": "Tom Brown", "role": "Installer", "user_id": None},
     {"id": 5, "name": "Lisa Davis", "role": "Delivery", "user_id": None},
 ]
+collections = {'customers': customers, 'jobs': jobs, 'assignments': assignments}
+
+# In-memory records survive restarts if CRM_JOURNAL names a directory for the
+# journal and snapshots; they are restored before the views below are built
+JOURNAL_PATH = os.getenv('CRM_JOURNAL')
+journal = None
+if JOURNAL_PATH and database is None:
+    journal = Journal(JOURNAL_PATH, collections, fsync=parse_fsync(os.getenv('CRM_JOURNAL_FSYNC')))
+    journal.restore()
+
+# Built from one snapshot of a shared database, so writes other workers
+# make meanwhile are replayed onto the views rather than counted twice
+with database.snapshot() if database else nullcontext():
+    pipeline = PipelineView(customers, jobs)
+    schedule = StaffScheduleIndex(assignments)
+    customer_search = CustomerSearchIndex(customers)
+    stats = StatsView(customers, jobs, assignments)
+changes = ChangeLog(write_lock)
+for name, store in collections.items():
+    changes.track(name, store)
+events = EventBroker(changes)
+record_caches = {name: RecordCache(store) for name, store in collections.items()}
+
+def rebuild_views():
+    """Rebuild the in-process views from the stores"""
+    pipeline.rebuild()
+    schedule.rebuild()
+    customer_search.rebuild()
+    stats.rebuild()
+    for cache in record_caches.values():
+        cache.rebuild()
+    changes.reset()
+
+if database:
+    database.on_reset(rebuild_views)
+
+@app.before_request
+def sync_with_database():
+    """Apply other workers' writes to the in-process views.
+
+    Runs before every request, and while an event stream is idle, and only
+    takes the writer lock when the database has changes this process hasn't
+    replayed; checks that must see other workers' writes run in a store
+    transaction, which replays them with the database locked.
+    """
+    if database is None or not database.changed_elsewhere():
+        return
+    with write_lock:
+        database.replay()
+
+MAX_PAGE_SIZE = 1000
+MAX_SEARCH_RESULTS = 100
+MAX_STATS_DAYS = 366
+AVAILABLE_STAGES = ['Quoted', 'Accepted', 'Production', 'ready']
+
+def query_values(value):
+    """Turn a comma separated query value into criteria values.
+
+    Numeric values also match integers, since ids like staff_id arrive from
+    the frontend as either.
+    """
+    values = []
+    for v in value.split(','):
+        values.append(v)
+        if v.isdigit():
+            values.append(int(v))
+    return values
+
+def not_modified(*names):
+    """Return a 304 if the client's ETag still matches, else the ETag to send.
+
+    The ETag combines the latest change to the named collections with the
+    query string, so it changes whenever the response body could.
+    """
+    query = hashlib.sha1(request.query_string).hexdigest()[:12]
+    etag = f"{changes.version(*names)}-{query}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response, etag
+    return None, etag
+
+def with_etag(response, etag, seq):
+    """Tag a response; seq (read before the body was built) is where ?since= polling can start"""
+    response.set_etag(etag)
+    response.headers['X-Change-Seq'] = str(seq)
+    return response
+
+def json_response(body, status=200):
+    """Response for an already encoded JSON body"""
+    return app.response_class(body, status=status, mimetype='application/json')
+
+def record_response(name, record):
+    """A single record from its cached JSON, or 404"""
+    if not record:
+        return ('', 404)
+    with metrics.timer('crm_serialize_seconds', collection=name):
+        return json_response(record_caches[name].encode(record))
+
+def invalid_body(data):
+    """400 for a record body that isn't an object, or has an unusable id or
+    a non-scalar enum field, else None"""
+    if not isinstance(data, dict):
+        return jsonify({'error': 'body must be a JSON object'}), 400
+    if 'id' in data and not valid_id(data['id']):
+        return jsonify({'error': 'id must be a non-empty string'}), 400
+    fields = invalid_fields(data)
+    if fields:
+        return jsonify({'error': f"{', '.join(fields)} must be a string, number or boolean"}), 400
+    return None
+
+def get_record(name, record_id):
+    with metrics.timer('crm_store_seconds', collection=name, op='get'):
+        return collections[name].get(record_id)
+
+def changes_response(name):
+    """Serve ?since=<seq>: records changed after seq and ids deleted since"""
+    try:
+        since = int(request.args['since'] or 0)
+    except ValueError:
+        return jsonify({'error': 'since must be a sequence number'}), 400
+    try:
+        changed, deleted = changes.since(name, since)
+    except StaleSequence:
+        return jsonify({'error': 'since is older than the change log; refetch the collection'}), 410
+    store = collections[name]
+    records = [r for r in (store.get(record_id) for record_id in changed) if r]
+    return json_response(b'{"seq":%d,"changes":%b,"deleted":%b}'
+                         % (changes.seq, record_caches[name].encode_list(records), dumps(deleted)))
+
+def list_response(name, filters, date_field, source=None, **criteria):
+    """Serve a collection, honouring the list query parameters.
+
+    ?limit=&after= page through the records by keyset cursor (the next
+    cursor is sent in the X-Next-Cursor header), each name in filters can be
+    given as ?name=a,b, ?from=&to= bound date_field, and ?fields=a,b limits
+    the keys returned for each record. Responses carry an ETag and answer
+    If-None-Match with 304.
+
+    source, if given, is called to fetch candidate records from an index
+    instead of scanning the store; paging isn't available then.
+    """
+    seq = changes.seq
+    cached, etag = not_modified(name)
+    if cached:
+        return cached
+    store = collections[name]
+    args = request.args
+    criteria = {
+        **{f: query_values(args[f]) for f in filters if args.get(f)},
+        **criteria
+    }
+    if args.get('from') or args.get('to'):
+        criteria[date_field] = Range(args.get('from') or None, args.get('to') or None)
+    limit = args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = args.get('after', type=int)
+
+    if source is not None:
+        op = 'index'
+    elif limit is None and after is None:
+        op = 'find' if criteria else 'all'
+    else:
+        op = 'page'
+    with metrics.timer('crm_store_seconds', collection=name, op=op):
+        if source is not None:
+            records, cursor = filter_records(source(), criteria), None
+        elif limit is None and after is None:
+            records, cursor = (store.find(**criteria) if criteria else store.all()), None
+        else:
+            records, cursor = store.page(after, limit, **criteria)
+
+    if args.get('fields'):
+        fields = ['id'] + [f for f in args['fields'].split(',') if f != 'id']
+        response = jsonify([{f: r[f] for f in fields if f in r} for r in records])
+    else:
+        with metrics.timer('crm_serialize_seconds', collection=name):
+            response = json_response(record_caches[name].encode_list(records))
+    if cursor is not None:
+        response.headers['X-Next-Cursor'] = str(cursor)
+    return with_etag(response, etag, seq)
 
 @app.route('/customers', methods=['GET', 'POST'])
 def handle_customers():
     if request.method == 'GET':
-        return jsonify(customers)
+        if 'since' in request.args:
+            return changes_response('customers')
+        return list_response('customers', ['stage', 'status'], 'created_at')
     
-    data = request.json
-    customer = {
-        'id': str(uuid.uuid4()),
-        'created_at': datetime.now().isoformat(),
-        'updated_at': datetime.now().isoformat(),
-        'stage': data.get('stage', 'Lead'),
-        'contact_made': data.get('contact_made', 'Unknown'),
-        'marketing_opt_in': data.get('marketing_opt_in', False),
-        'status': data.get('status', 'active'),
-        **data
-    }
-    customers.append(customer)
+    error = invalid_body(request.json)
+    if error:
+        return error
+    customer = new_customer(request.json)
+    customers.add(customer)
     return jsonify(customer), 201
 
 @app.route('/customers/<customer_id>', methods=['GET', 'PUT', 'DELETE'])
 def handle_customer(customer_id):
-    global customers
-    customer = next((c for c in customers if c['id'] == customer_id), None)
+    customer = get_record('customers', customer_id)
     
     if request.method == 'GET':
-        return jsonify(customer) if customer else ('', 404)
+        return record_response('customers', customer)
     
     elif request.method == 'PUT':
-        if customer:
-            data = request.json
-            customer.update(data)
-            customer['updated_at'] = datetime.now().isoformat()
-            return jsonify(customer)
-        return ('', 404)
+        error = invalid_body(request.json)
+        if error:
+            return error
+        customer = customers.update(customer_id, request.json)
+        return jsonify(customer) if customer else ('', 404)
     
     elif request.method == 'DELETE':
-        customers = [c for c in customers if c['id'] != customer_id]
+        customers.delete(customer_id)
         return '', 204
 
 @app.route('/customers/active', methods=['GET'])
 def get_active_customers():
     """Return active customers"""
-    active = [c for c in customers if c.get('status') == 'active']
-    return jsonify(active)
+    return list_response('customers', ['stage'], 'created_at', status='active')
+
+@app.route('/customers/search', methods=['GET'])
+def search_customers():
+    """Rank customers against ?q= by name, email, phone, postcode and address.
+
+    Terms match as prefixes and tolerate one typo; ?stage= and ?status=
+    filter the matches and ?limit= caps them (default 20).
+    """
+    args = request.args
+    limit = max(1, min(args.get('limit', 20, type=int), MAX_SEARCH_RESULTS))
+    criteria = {f: query_values(args[f]) for f in ('stage', 'status') if args.get(f)}
+    accept = (lambda record: bool(filter_records([record], criteria))) if criteria else None
+    with metrics.timer('crm_store_seconds', collection='customers', op='search'):
+        records = customer_search.search(args.get('q', ''), limit, accept)
+    with metrics.timer('crm_serialize_seconds', collection='customers'):
+        return json_response(record_caches['customers'].encode_list(records))
 
 @app.route('/jobs', methods=['GET', 'POST'])
 def handle_jobs():
     if request.method == 'GET':
-        return jsonify(jobs)
+        if 'since' in request.args:
+            return changes_response('jobs')
+        return list_response('jobs', ['stage', 'job_type', 'customer_id'], 'created_at')
     
-    data = request.json
-    job = {
-        'id': str(uuid.uuid4()),
-        'created_at': datetime.now().isoformat(),
-        'updated_at': datetime.now().isoformat(),
-        'stage': data.get('stage', 'Lead'),
-        'job_type': data.get('job_type', 'Kitchen'),
-        **data
-    }
-    jobs.append(job)
+    error = invalid_body(request.json)
+    if error:
+        return error
+    job = new_job(request.json)
+    jobs.add(job)
     return jsonify(job), 201
 
 @app.route('/jobs/<job_id>', methods=['GET', 'PUT', 'DELETE'])
 def handle_job(job_id):
-    global jobs
-    job = next((j for j in jobs if j['id'] == job_id), None)
+    job = get_record('jobs', job_id)
     
     if request.method == 'GET':
-        return jsonify(job) if job else ('', 404)
+        return record_response('jobs', job)
     
     elif request.method == 'PUT':
-        if job:
-            data = request.json
-            job.update(data)
-            job['updated_at'] = datetime.now().isoformat()
-            return jsonify(job)
-        return ('', 404)
+        error = invalid_body(request.json)
+        if error:
+            return error
+        job = jobs.update(job_id, request.json)
+        return jsonify(job) if job else ('', 404)
     
     elif request.method == 'DELETE':
-        jobs = [j for j in jobs if j['id'] != job_id]
+        jobs.delete(job_id)
         return '', 204
 
 @app.route('/jobs/available', methods=['GET'])
 def get_available_jobs():
     """Return jobs that are available for scheduling"""
     # Return jobs that are in certain stages ready for scheduling
-    available = [j for j in jobs if j.get('stage') in ['Quoted', 'Accepted', 'Production', 'ready']]
-    return jsonify(available)
+    return list_response('jobs', ['job_type', 'customer_id'], 'created_at', stage=AVAILABLE_STAGES)
 
 @app.route('/assignments', methods=['GET', 'POST'])
 def handle_assignments():
     if request.method == 'GET':
-        return jsonify(assignments)
+        args = request.args
+        if 'since' in args:
+            return changes_response('assignments')
+        source = None
+        staff_id = args.get('staff_id')
+        if staff_id and ',' not in staff_id and not args.get('limit') and not args.get('after'):
+            source = lambda: schedule.find(staff_id, args.get('from'), args.get('to'))
+        return list_response('assignments', ['staff_id', 'status', 'type', 'job_id', 'customer_id'], 'date',
+                             source=source)
     
-    data = request.json
-    assignment = {
-        'id': str(uuid.uuid4()),
-        'created_at': datetime.now().isoformat(),
-        'updated_at': datetime.now().isoformat(),
-        'type': data.get('type', 'job'),
-        'staff_id': data.get('staff_id'),
-        'date': data.get('date'),
-        'start_time': data.get('start_time'),
-        'end_time': data.get('end_time'),
-        'estimated_hours': data.get('estimated_hours', 0),
-        'priority': data.get('priority', 'Medium'),
-        'status': data.get('status', 'Scheduled'),
-        'title': data.get('title', ''),
-        'notes': data.get('notes', ''),
-        'job_id': data.get('job_id'),
-        'customer_id': data.get('customer_id'),
-        **data
-    }
-    assignments.append(assignment)
-    return jsonify({'assignment': assignment}), 201
+    error = invalid_body(request.json)
+    if error:
+        return error
+    assignment = new_assignment(request.json)
+    # Check and insert in one transaction so two overlapping requests can't
+    # both pass the check
+    with assignments.transaction():
+        conflicts = schedule.conflicts(assignment)
+        if conflicts and not allow_conflicts():
+            return conflict_response(conflicts)
+        assignments.add(assignment)
+    return jsonify({'assignment': assignment, **({'conflicts': conflicts} if conflicts else {})}), 201
+
+def allow_conflicts(args=None):
+    """Whether ?allow_conflicts is set, in args or else the Flask request's"""
+    args = request.args if args is None else args
+    return args.get('allow_conflicts', '').lower() in ('1', 'true', 'yes')
+
+def assignment_conflicts(assignment, pending):
+    return schedule.conflicts(assignment, ignore_id=assignment['id'], pending=pending)
+
+# Checks run on records written in bulk or imported, as the single-record
+# endpoints do
+CONFLICT_CHECKS = {'assignments': assignment_conflicts}
+
+def conflict_response(conflicts):
+    """409 listing the assignments that overlap the requested time slot"""
+    return jsonify({
+        'error': 'Assignment overlaps existing assignments for this staff member',
+        'conflicts': [assignments.get(i) for i in conflicts]
+    }), 409
 
 # Add this route with your other routes
 @app.route('/staff', methods=['GET'])
@@ -140,52 +381,231 @@ def get_staff():
     """Return all staff members"""
     return jsonify(staff_members)
 
+@app.route('/staff/<staff_id>/availability', methods=['GET'])
+def get_staff_availability(staff_id):
+    """Return booked and free slots per day, for ?date= or ?from=&to= (default today)"""
+    args = request.args
+    today = datetime.now().date().isoformat()
+    date_from = args.get('from') or args.get('date') or today
+    date_to = args.get('to') or args.get('date') or date_from
+    try:
+        days = list(date_range(date_from, date_to))
+    except ValueError:
+        return jsonify({'error': 'dates must be YYYY-MM-DD'}), 400
+    if len(days) > 62:
+        return jsonify({'error': 'at most 62 days per request'}), 400
+    return jsonify({
+        'staff_id': staff_id,
+        'days': [schedule.availability(staff_id, day) for day in days]
+    })
+
+@app.route('/schedule/auto', methods=['POST'])
+def auto_schedule():
+    """Plan available, unassigned jobs into assignments over a date horizon.
+
+    Body (all optional): {"start": "YYYY-MM-DD", "days": 14, "daily_hours": 8,
+    "weekdays_only": true, "job_ids": [...], "dry_run": false}
+    """
+    data = request.json or {}
+    try:
+        start = datetime.fromisoformat(data['start']).date() if data.get('start') else datetime.now().date()
+        horizon = min(int(data.get('days', 14)), 366)
+        daily_hours = float(data.get('daily_hours', 8))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'start must be YYYY-MM-DD, days and daily_hours numbers'}), 400
+    # plan_jobs splits jobs into chunks of whole minutes of daily_hours
+    if horizon < 1 or not 1 / 60 <= daily_hours <= 24:
+        return jsonify({'error': 'days must be at least 1 and daily_hours between a minute and 24'}), 400
+    days = [start + timedelta(days=i) for i in range(horizon)]
+    if data.get('weekdays_only', True):
+        days = [d for d in days if d.weekday() < 5]
+    days = [d.isoformat() for d in days]
+
+    # Plan and book in one transaction, so concurrent runs don't pick the
+    # same jobs or slots
+    dry_run = bool(data.get('dry_run'))
+    with assignments.transaction():
+        planned = {a.get('job_id') for a in assignments.all() if a.get('job_id') and a.get('status') != 'Cancelled'}
+        candidates = [j for j in jobs.find(stage=AVAILABLE_STAGES) if j['id'] not in planned]
+        if data.get('job_ids'):
+            wanted = set(data['job_ids'])
+            candidates = [j for j in candidates if j['id'] in wanted]
+
+        plans, unscheduled = plan_jobs(candidates, staff_members, days, schedule.busy, daily_hours)
+        created = []
+        for plan in plans:
+            job = plan['job']
+            customer = customers.get(job.get('customer_id')) or {}
+            customer_name = job.get('customer_name') or customer.get('name', '')
+            created.append(new_assignment({
+                'type': 'job',
+                'staff_id': plan['staff_id'],
+                'date': plan['date'],
+                'start_time': plan['start_time'],
+                'end_time': plan['end_time'],
+                'estimated_hours': plan['hours'],
+                'priority': job.get('priority', 'Medium'),
+                'title': f"{job.get('job_reference') or 'Job'} - {customer_name}",
+                'notes': 'Auto-scheduled',
+                'job_id': job['id'],
+                'customer_id': job.get('customer_id'),
+            }))
+
+        if not dry_run:
+            for assignment in created:
+                assignments.add(assignment)
+    return jsonify({
+        'dry_run': dry_run,
+        'assignments': created,
+        'unscheduled': [{'job_id': job['id'], 'reason': reason} for job, reason in unscheduled]
+    }), 200 if dry_run else 201
+
 @app.route('/assignments/<assignment_id>', methods=['GET', 'PUT', 'DELETE'])
 def handle_assignment(assignment_id):
-    global assignments
-    assignment = next((a for a in assignments if a['id'] == assignment_id), None)
+    assignment = get_record('assignments', assignment_id)
     
     if request.method == 'GET':
-        return jsonify(assignment) if assignment else ('', 404)
+        return record_response('assignments', assignment)
     
     elif request.method == 'PUT':
-        if assignment:
-            data = request.json
-            assignment.update(data)
-            assignment['updated_at'] = datetime.now().isoformat()
-            return jsonify({'assignment': assignment})
-        return ('', 404)
+        data = request.json
+        error = invalid_body(data)
+        if error:
+            return error
+        with assignments.transaction():
+            assignment = assignments.get(assignment_id)
+            if not assignment:
+                return ('', 404)
+            conflicts = schedule.conflicts({**assignment, **data}, ignore_id=assignment_id)
+            if conflicts and not allow_conflicts():
+                return conflict_response(conflicts)
+            assignment = assignments.update(assignment_id, data)
+        return jsonify({'assignment': assignment, **({'conflicts': conflicts} if conflicts else {})})
     
     elif request.method == 'DELETE':
-        assignments = [a for a in assignments if a['id'] != assignment_id]
+        assignments.delete(assignment_id)
         return '', 204
 
 @app.route('/pipeline', methods=['GET'])
 def get_pipeline():
-    pipeline_items = []
-    
-    # Add customers without jobs
-    for customer in customers:
-        has_job = any(j.get('customer_id') == customer['id'] for j in jobs)
-        if not has_job:
-            pipeline_items.append({
-                'id': f"customer-{customer['id']}",
-                'type': 'customer',
-                'customer': customer
-            })
-    
-    # Add jobs with their customers
-    for job in jobs:
-        customer = next((c for c in customers if c['id'] == job.get('customer_id')), None)
-        if customer:
-            pipeline_items.append({
-                'id': f"job-{job['id']}",
-                'type': 'job',
-                'customer': customer,
-                'job': job
-            })
-    
-    return jsonify(pipeline_items)
+    """Return pipeline items, optionally filtered with ?stage=A,B"""
+    seq = changes.seq
+    cached, etag = not_modified('customers', 'jobs')
+    if cached:
+        return cached
+    stages = request.args.get('stage')
+    stages = set(stages.split(',')) if stages else None
+    with metrics.timer('crm_store_seconds', collection='pipeline', op='items'):
+        items = pipeline.items(stages)
+    with metrics.timer('crm_serialize_seconds', collection='pipeline'):
+        body = pipeline_json(items)
+    return with_etag(json_response(body), etag, seq)
+
+def pipeline_json(items):
+    """Encode pipeline items around the cached customer and job JSON"""
+    encode_customer, encode_job = record_caches['customers'].encode, record_caches['jobs'].encode
+    fragments = []
+    for item in items:
+        if item['type'] == 'job':
+            fragments.append(b'{"id":%b,"type":"job","customer":%b,"job":%b}'
+                             % (dumps(item['id']), encode_customer(item['customer']), encode_job(item['job'])))
+        else:
+            fragments.append(b'{"id":%b,"type":"customer","customer":%b}'
+                             % (dumps(item['id']), encode_customer(item['customer'])))
+    return b'[' + b','.join(fragments) + b']'
+
+@app.route('/customers/bulk', methods=['POST'], defaults={'name': 'customers'})
+@app.route('/jobs/bulk', methods=['POST'], defaults={'name': 'jobs'})
+@app.route('/assignments/bulk', methods=['POST'], defaults={'name': 'assignments'})
+def handle_bulk(name):
+    """Apply a list of create/update/delete operations to one collection.
+
+    Body: {"operations": [{"op": "create", "data": {...}},
+                          {"op": "update", "id": "...", "data": {...}},
+                          {"op": "delete", "id": "..."}],
+           "atomic": false}
+    With atomic set, nothing is written unless every operation is valid.
+    Assignments overlapping another for the same staff member fail with
+    409 unless ?allow_conflicts is given.
+    """
+    data = request.json
+    operations = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(operations, list):
+        return jsonify({'error': 'operations must be a list'}), 400
+    atomic = isinstance(data, dict) and bool(data.get('atomic'))
+    results, applied = apply_operations(collections[name], BUILDERS[name], operations, atomic,
+                                        CONFLICT_CHECKS.get(name), allow_conflicts())
+    return jsonify({'applied': applied, 'results': results}), 200 if applied else 409
+
+@app.route('/export/<name>', methods=['GET'])
+def export_collection(name):
+    """Stream a collection as newline-delimited JSON"""
+    if name not in collections:
+        return ('', 404)
+    return Response(export_lines(collections[name]), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename={name}.ndjson'})
+
+@app.route('/import/<name>', methods=['POST'])
+def import_collection(name):
+    """Load newline-delimited JSON records into a collection, streaming the body
+
+    Overlapping assignments are skipped as failed lines unless
+    ?allow_conflicts is given.
+    """
+    if name not in collections:
+        return ('', 404)
+    summary = import_lines(collections[name], BUILDERS[name], request.stream,
+                           conflicts=CONFLICT_CHECKS.get(name), allow_conflicts=allow_conflicts())
+    return jsonify(summary), 200 if not summary['failed'] else 207
+
+@app.route('/events', methods=['GET'])
+def event_stream():
+    """Server-sent events for customer, job and assignment changes.
+
+    Events are named <collection>.<action> and carry the record (or just
+    the id for deletes); ?collections=a,b limits which are sent, and
+    Last-Event-ID resumes after a reconnect.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    names = request.args.get('collections')
+    names = set(names.split(',')) if names else None
+    stream = events.stream(last_event_id, names, sync=sync_with_database if database else None)
+    return Response(stream_with_context(stream),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Customer, job and assignment counts by stage, status and type, and
+    job hours per staff member by day and ISO week.
+
+    Read from counters kept up to date on every write; ?from=&to= limit the
+    days and weeks the hours cover.
+    """
+    date_from, date_to = request.args.get('from') or None, request.args.get('to') or None
+    try:
+        first, last = (date.fromisoformat(d) if d else None for d in (date_from, date_to))
+    except ValueError:
+        return jsonify({'error': 'dates must be YYYY-MM-DD'}), 400
+    # Each day in the range is looked up with the writer lock held
+    if first and last and (last - first).days >= MAX_STATS_DAYS:
+        return jsonify({'error': f'at most {MAX_STATS_DAYS} days per request'}), 400
+    seq = changes.seq
+    cached, etag = not_modified('customers', 'jobs', 'assignments')
+    if cached:
+        return cached
+    return with_etag(jsonify(stats.snapshot(date_from, date_to)), etag, seq)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, store and serialization metrics in Prometheus text format"""
+    for name, store in collections.items():
+        metrics.set('crm_records', len(store), collection=name)
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -198,4 +618,4 @@ def health_check():
     })
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000, threaded=True)
\ No newline at end of file
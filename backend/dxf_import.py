@@ -0,0 +1,333 @@
+import math
+import re
+import struct
+
+from ezdxf import units
+from ezdxf.lldxf.const import DXFError
+from ezdxf.lldxf.tagger import binary_tags_loader
+from ezdxf.tools.text import plain_mtext
+
+from segments import SUM_TOLERANCE, segmented_widths
+
+# Sizes (mm) a measurement can be to count as the cabinet's width, height or depth
+WIDTH_RANGE = (300, 2400)
+HEIGHT_RANGE = (300, 2400)
+DEPTH_RANGE = (250, 800)
+# Block references are followed this deep for the dimensions and text inside them
+MAX_BLOCK_DEPTH = 4
+BINARY_SENTINEL = b'AutoCAD Binary DXF'
+
+NUMBER = re.compile(r'\d+(?:\.\d+)?')
+# "W=1200", "DEPTH: 560", "H 870" written next to the drawing
+LABELLED = re.compile(r'\b(W|WIDTH|H|HEIGHT|D|DEPTH)\b\s*[=:]?\s*(\d+(?:\.\d+)?)', re.IGNORECASE)
+LABELS = {'W': 'width', 'WIDTH': 'width', 'H': 'height', 'HEIGHT': 'height', 'D': 'depth', 'DEPTH': 'depth'}
+
+LINEAR, ALIGNED = 0, 1   # DIMENSION dimtype, low bits
+DIMLFAC = 144            # group code of the measurement scale in DIMSTYLE entries and overrides
+READ = ('DIMENSION', 'TEXT', 'MTEXT', 'ATTRIB', 'INSERT')
+
+
+def is_dxf(data):
+    """Whether an upload is a DXF file (ASCII or binary) rather than an image"""
+    if data.startswith(BINARY_SENTINEL):
+        return True
+    lines = data[:1024].decode('latin-1').splitlines()
+    # Tags are a group code line then a value line; 999 is a comment
+    for code, value in zip(lines[::2], lines[1::2]):
+        if code.strip() != '999':
+            return code.strip() == '0' and value.strip() == 'SECTION'
+    return False
+
+
+def _text(data):
+    """An uploaded DXF file as ASCII DXF text"""
+    if data.startswith(BINARY_SENTINEL):
+        # Rare enough to go through ezdxf's tag reader, which is slower, and back out as ASCII
+        try:
+            return ''.join(f"{tag.code}\n{tag.value}\n" for tag in binary_tags_loader(data))
+        except (DXFError, ValueError, IndexError, struct.error) as e:
+            raise ValueError(f"Could not read DXF: {str(e)}")
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        # Files before AutoCAD 2007 are in the drawing's code page, in practice mostly this one
+        return data.decode('cp1252', errors='replace')
+
+
+def _markers(text, kind, start=0):
+    """Offsets in ASCII DXF text of the 0 tags whose value is kind"""
+    while True:
+        i = text.find('\n' + kind, start)
+        if i == -1:
+            return
+        start = i + 1
+        end = text.find('\n', start)
+        tag = text.rfind('\n', 0, i) + 1
+        if text[start:end if end != -1 else len(text)].strip() == kind and text[tag:i].strip() == '0':
+            yield tag
+
+
+def _sections(text):
+    """{name: text} of the sections of an ASCII DXF file"""
+    sections = {}
+    for start in _markers(text, 'SECTION'):
+        # 0 SECTION, then 2 and the section's name
+        lines = text[start:start + 256].split('\n', 4)
+        if len(lines) < 5 or lines[2].strip() != '2':
+            continue
+        body = start + sum(len(line) + 1 for line in lines[:4])
+        end = next(_markers(text, 'ENDSEC', body), len(text))
+        sections[lines[3].strip()] = text[body:end]
+    return sections
+
+
+class DxfTags:
+    """The group code / value pairs of a section of an ASCII DXF file, for picking out a few entity types.
+
+    Loading a whole document with ezdxf builds every entity, including
+    the lines and arrows of each dimension's graphics block, which takes
+    most of a second on a busy drawing. Only dimensions, text and block
+    references are wanted here, so just the sections holding them are
+    split into lines, and those entities are found with list.index, which
+    skips everything else at C speed.
+    """
+
+    def __init__(self, text):
+        lines = text.splitlines()
+        self.codes = lines[0::2]
+        self.values = lines[1::2]
+
+    def markers(self, kind, start=0, end=None):
+        """Indexes of the tags starting a kind of entity (or section or table entry), in order"""
+        values, codes = self.values, self.codes
+        end = len(values) if end is None else end
+        i = start
+        while True:
+            try:
+                i = values.index(kind, i, end)
+            except ValueError:
+                return
+            if codes[i].strip() == '0':
+                yield i
+            i += 1
+
+    def entity(self, start):
+        """[(code, value)] of the entity whose type tag is at start"""
+        codes = self.codes
+        # It ends at the next 0 tag, written the same way as its own by any one writer
+        try:
+            end = codes.index(codes[start], start + 1, len(self.values))
+        except ValueError:
+            end = len(self.values)
+        return list(zip(map(int, codes[start + 1:end]), self.values[start + 1:end]))
+
+    def entities(self, kinds, start=0, end=None):
+        """(kind, tags) of the entities of the given kinds, in file order"""
+        found = sorted(i for kind in kinds for i in self.markers(kind, start, end))
+        return [(self.values[i].strip(), self.entity(i)) for i in found]
+
+    def variable(self, name, default=None):
+        """A header variable's value"""
+        try:
+            return self.values[self.values.index(name) + 1].strip()
+        except ValueError:
+            return default
+
+
+def _first(tags):
+    """The entity's own tags by code, first one winning, leaving out extended data"""
+    by_code = {}
+    for code, value in tags:
+        if code < 1000:
+            by_code.setdefault(code, value.strip())
+    return by_code
+
+
+def _dimlfac_override(tags):
+    # Per-dimension style overrides are extended data: 1070 144, then 1040 <factor>
+    for (code, value), (next_code, next_value) in zip(tags, tags[1:]):
+        if code == 1070 and int(value) == DIMLFAC and next_code == 1040:
+            return float(next_value)
+    return None
+
+
+def _point(tag, x, y):
+    return float(tag.get(x, 0)), float(tag.get(y, 0))
+
+
+def _transform(outer, base, insert, scale, rotation):
+    """Where a point in a block ends up, given where the block's own points end up under outer"""
+    cos, sin = math.cos(math.radians(rotation)), math.sin(math.radians(rotation))
+
+    def place(point):
+        x, y = (point[0] - base[0]) * scale[0], (point[1] - base[1]) * scale[1]
+        return outer((insert[0] + x * cos - y * sin, insert[1] + x * sin + y * cos))
+    return place
+
+
+def _measurement(tags, dimlfacs, place):
+    """(value, direction, position) of a linear or aligned dimension as its text reads, or None"""
+    tag = _first(tags)
+    kind = int(tag.get(70, 0)) & 0x0F
+    if kind not in (LINEAR, ALIGNED):
+        return None
+    start, end = place(_point(tag, 13, 23)), place(_point(tag, 14, 24))
+    if kind == LINEAR:
+        angle = math.radians(float(tag.get(50, 0)))
+        origin = place((0, 0))
+        tip = place((math.cos(angle), math.sin(angle)))
+        direction = (tip[0] - origin[0], tip[1] - origin[1])
+    else:
+        direction = (end[0] - start[0], end[1] - start[1])
+    length = math.hypot(*direction)
+    if not length:
+        return None
+    ux, uy = direction[0] / length, direction[1] / length
+
+    text = tag.get(1, '')
+    # Text typed over the measurement is what the draughtsman meant, e.g. when not drawn to scale
+    match = NUMBER.search(text.replace(',', '.')) if text and '<>' not in text else None
+    if match:
+        value = float(match.group())
+    else:
+        dimlfac = _dimlfac_override(tags) or dimlfacs.get(tag.get(3, 'Standard').upper(), 1)
+        value = abs((end[0] - start[0]) * ux + (end[1] - start[1]) * uy) * dimlfac
+
+    angle = math.degrees(math.atan2(uy, ux)) % 180
+    if min(angle, 180 - angle) < 1:
+        direction = 'horizontal'
+    elif abs(angle - 90) < 1:
+        direction = 'vertical'
+    else:
+        direction = 'aligned'
+    return value, direction, place(_point(tag, 10, 20))
+
+
+def read_dimensions(data):
+    """The dimensions and text of a DXF drawing, in millimetres.
+
+    Returns {'horizontal': [...], 'vertical': [...], 'aligned': [...],
+    'texts': [...], 'labels': {...}}. Measurements are worked out from the
+    DIMENSION entities' definition points, so they are exact; horizontal
+    ones are in reading order (by dimension line, then left to right), as
+    chains of unit widths are drawn. Raises ValueError if the file can't
+    be read as DXF.
+    """
+    sections = _sections(_text(data))
+    if 'ENTITIES' not in sections:
+        raise ValueError("Could not read DXF: it has no ENTITIES section")
+    try:
+        insunits = int(DxfTags(sections.get('HEADER', '')).variable('$INSUNITS', 0))
+        # Unitless drawings are taken to be in mm
+        scale = units.conversion_factor(insunits, units.MM) if insunits else 1
+        dimlfacs = {}
+        for _, entry in DxfTags(sections.get('TABLES', '')).entities(['DIMSTYLE']):
+            entry = _first(entry)
+            dimlfacs[entry.get(2, '').upper()] = float(entry.get(DIMLFAC, 1))
+        entities = DxfTags(sections['ENTITIES']).entities(READ)
+    except (ValueError, IndexError) as e:
+        raise ValueError(f"Could not read DXF: {str(e)}")
+
+    blocks = None
+
+    def block(name):
+        """(tags, start, end, base point) of a block definition, indexed when a block is first inserted"""
+        nonlocal blocks
+        if blocks is None:
+            blocks = {}
+            tags = DxfTags(sections.get('BLOCKS', ''))
+            for begin in tags.markers('BLOCK'):
+                header = _first(tags.entity(begin))
+                blocks[header.get(2)] = (tags, begin + 1, next(tags.markers('ENDBLK', begin), len(tags.values)),
+                                         _point(header, 10, 20))
+        return blocks.get(name)
+
+    placed = {'horizontal': [], 'vertical': [], 'aligned': []}
+    texts = []
+
+    def read(entities, place, depth):
+        for kind, entity in entities:
+            try:
+                if kind == 'DIMENSION':
+                    measured = _measurement(entity, dimlfacs, place)
+                    if measured:
+                        value, direction, line = measured
+                        # Ordered dimension line by dimension line, then along it
+                        order = (round(-line[1]), line[0]) if direction == 'horizontal' else (round(line[0]), -line[1])
+                        placed[direction].append((order, value * scale))
+                elif kind in ('TEXT', 'ATTRIB'):
+                    texts.append(_first(entity).get(1, ''))
+                elif kind == 'MTEXT':
+                    texts.append(plain_mtext(''.join(value for code, value in entity if code in (3, 1))))
+                elif kind == 'INSERT' and depth < MAX_BLOCK_DEPTH:
+                    tag = _first(entity)
+                    definition = block(tag.get(2))
+                    if definition is None:
+                        continue
+                    tags, start, end, base = definition
+                    inner = _transform(place, base, _point(tag, 10, 20),
+                                       (float(tag.get(41, 1)), float(tag.get(42, 1))), float(tag.get(50, 0)))
+                    read(tags.entities(READ, start, end), inner, depth + 1)
+            except (ValueError, TypeError):
+                continue    # an incomplete entity; the rest still count
+
+    read(entities, lambda point: point, 0)
+
+    labels = {}
+    for text in texts:
+        for label, value in LABELLED.findall(text):
+            labels.setdefault(LABELS[label.upper()], _exact(float(value) * scale))
+    found = {direction: [_exact(value) for _, value in sorted(values)] for direction, values in placed.items()}
+    found['texts'] = texts
+    found['labels'] = labels
+    return found
+
+
+def _exact(value):
+    """Whole millimetres as ints, so sizes read 1200 rather than 1200.0"""
+    value = round(value, 2)
+    return int(value) if value.is_integer() else value
+
+
+def _largest(values, value_range):
+    values = [v for v in values if value_range[0] <= v <= value_range[1]]
+    return max(values) if values else None
+
+
+def cabinet_dimensions(found, working_height_deduction):
+    """The analysis DrawingAnalyzer.process_analysis_result() takes, from read_dimensions() of a drawing.
+
+    Values written as W=/H=/D= labels win. Otherwise the width is the
+    widest horizontal dimension, the height the tallest vertical one, and
+    the depth the widest horizontal one left once the width and the unit
+    widths adding up to it (the front elevation) are set aside, which is
+    the side elevation's. Raises ValueError when one can't be found.
+    """
+    labels = found['labels']
+    horizontal = found['horizontal']
+
+    width = labels.get('width') or _largest(horizontal, WIDTH_RANGE)
+    height = labels.get('height') or _largest(found['vertical'], HEIGHT_RANGE)
+    depth = labels.get('depth')
+    if depth is None and width is not None:
+        front = [width]
+        chains = [c for c in segmented_widths(horizontal)
+                  if c['consecutive'] and abs(c['total'] - width) <= SUM_TOLERANCE]
+        if chains:
+            front += chains[0]['segments']
+        side = list(horizontal)
+        for value in front:
+            if value in side:
+                side.remove(value)
+        depth = _largest([v for v in side if v < width], DEPTH_RANGE) or _largest(found['aligned'], DEPTH_RANGE)
+
+    missing = [name for name, value in (('width', width), ('height', height), ('depth', depth)) if value is None]
+    if missing:
+        raise ValueError(f"No cabinet {' or '.join(missing)} found among the DXF's dimensions")
+    return {
+        'cabinet_width': width,
+        'cabinet_total_height': height,
+        'cabinet_working_height': height - working_height_deduction,
+        'cabinet_depth': depth,
+        'components': {'gables': {}, 'tb_panels': {}, 'sh_hardware': {}, 'back': {}},
+    }
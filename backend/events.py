@@ -0,0 +1,152 @@
+import asyncio
+import json
+import threading
+from collections import deque
+
+from records import plain
+
+BUFFER_SIZE = 5000
+HEARTBEAT_SECONDS = 15
+# How often an idle stream given sync() calls it
+SYNC_SECONDS = 1
+
+
+class EventBroker:
+    """Fans change events out to server-sent event streams.
+
+    Each change from the ChangeLog is encoded once into an SSE frame, with
+    the change sequence as its id, and appended to a bounded buffer.
+    Streams block on a shared condition (async streams on an asyncio.Event)
+    until something newer than their cursor arrives, so idle subscribers
+    cost no CPU, and a reconnecting client resumes from Last-Event-ID as
+    long as the buffer still reaches back that far. A reset of the change
+    log clears the buffer and sends every stream a 'reset' event. Changes
+    other processes make only reach the change log once they are replayed
+    here, so a stream can be given a sync() to call while it is idle.
+    """
+
+    def __init__(self, changes, buffer_size=BUFFER_SIZE):
+        self._events = deque(maxlen=buffer_size)  # (seq, collection, frame)
+        self._cond = threading.Condition()
+        self._waiters = set()   # (event loop, asyncio.Event) of astream() subscribers
+        self.latest = changes.seq
+        changes.subscribe(self._publish)
+
+    def _publish(self, name, seq, action, old, new):
+        if action == 'reset':
+            frame = f"id: {seq}\nevent: reset\ndata: {{}}\n\n"
+        else:
+            data = new if new is not None else {'id': old['id']}
+            frame = f"id: {seq}\nevent: {name}.{action}\ndata: {json.dumps(data, default=plain)}\n\n"
+        with self._cond:
+            if action == 'reset':
+                self._events.clear()
+            self._events.append((seq, name, frame))
+            self.latest = seq
+            self._cond.notify_all()
+            waiters = list(self._waiters)
+        # Writes happen on worker threads; wake async streams on their own loop
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:  # loop closed
+                pass
+
+    def _after(self, cursor):
+        newer = []
+        for event in reversed(self._events):
+            if event[0] <= cursor:
+                break
+            newer.append(event)
+        newer.reverse()
+        return newer
+
+    def _start(self, last_event_id):
+        """(cursor, opening frames) for a stream resuming after last_event_id"""
+        with self._cond:
+            cursor = self.latest
+            oldest = self._events[0][0] if self._events else self.latest + 1
+        frames = []
+        if last_event_id is not None:
+            if last_event_id + 1 >= oldest or last_event_id >= cursor:
+                cursor = min(last_event_id, cursor)
+            else:
+                frames.append(f"id: {cursor}\nevent: reset\ndata: {{}}\n\n")
+        frames.append('retry: 3000\n\n')
+        return cursor, frames
+
+    @staticmethod
+    def _frames(events, names):
+        return ''.join(frame for _, name, frame in events if name is None or names is None or name in names)
+
+    def stream(self, last_event_id=None, names=None, heartbeat=HEARTBEAT_SECONDS, sync=None):
+        """Yield SSE frames for changes after last_event_id, forever.
+
+        Without last_event_id the stream starts from now. If the buffer no
+        longer reaches back to last_event_id, a 'reset' event tells the
+        client to refetch before following the stream. sync(), if given, is
+        called every SYNC_SECONDS the stream has nothing to send.
+        """
+        cursor, frames = self._start(last_event_id)
+        yield from frames
+
+        wait = heartbeat if sync is None else min(heartbeat, SYNC_SECONDS)
+        idle = 0
+        while True:
+            with self._cond:
+                events = self._after(cursor)
+                if not events:
+                    self._cond.wait(wait)
+                    events = self._after(cursor)
+            if not events:
+                if sync is not None:
+                    sync()
+                idle += wait
+                if idle >= heartbeat:
+                    idle = 0
+                    yield ': keep-alive\n\n'
+                continue
+            idle = 0
+            cursor = events[-1][0]
+            frames = self._frames(events, names)
+            if frames:
+                yield frames
+
+    async def astream(self, last_event_id=None, names=None, heartbeat=HEARTBEAT_SECONDS, sync=None):
+        """stream() for an event loop: waits on an asyncio.Event rather than
+        holding a thread for as long as the client stays connected; sync is
+        awaited"""
+        cursor, frames = self._start(last_event_id)
+        for frame in frames:
+            yield frame
+
+        wait = heartbeat if sync is None else min(heartbeat, SYNC_SECONDS)
+        idle = 0
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            self._waiters.add(waiter)
+        try:
+            while True:
+                # Cleared before looking, so a change published meanwhile still wakes us
+                waiter[1].clear()
+                with self._cond:
+                    events = self._after(cursor)
+                if not events:
+                    try:
+                        await asyncio.wait_for(waiter[1].wait(), wait)
+                    except asyncio.TimeoutError:
+                        if sync is not None:
+                            await sync()
+                        idle += wait
+                        if idle >= heartbeat:
+                            idle = 0
+                            yield ': keep-alive\n\n'
+                    continue
+                idle = 0
+                cursor = events[-1][0]
+                frames = self._frames(events, names)
+                if frames:
+                    yield frames
+        finally:
+            with self._cond:
+                self._waiters.discard(waiter)
@@ -0,0 +1,333 @@
+import atexit
+import gc
+import json
+import logging
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the journal directory is then unlocked
+    fcntl = None
+
+from json_cache import dumps
+from records import pack, unpack
+
+logger = logging.getLogger(__name__)
+
+FRAME = struct.Struct('<II')  # payload length, crc32
+SNAPSHOT_MAGIC = b'CRMSNAP2'
+# Readable by every Python version the backend runs on, unlike marshal's format
+SNAPSHOT_PROTOCOL = 5
+SNAPSHOT_MIN_BYTES = 16 * 1024 * 1024
+
+
+def parse_fsync(value):
+    """CRM_JOURNAL_FSYNC: 'always', 'off', or seconds between fsyncs"""
+    if value in (None, ''):
+        return 0.1
+    if value in ('always', 'off'):
+        return value
+    return float(value)
+
+
+class JournalError(Exception):
+    """Raised by Journal.restore when the journal can't be used safely"""
+
+
+class Journal:
+    """Durability for the in-memory stores: an append-only journal plus snapshots.
+
+    Every write to the stores is appended to the current journal segment
+    as a length and CRC prefixed frame holding the collection, the action
+    and the new record (or the deleted id). fsync is 'always' (each write
+    is synced before the store call returns), 'off' (left to the OS), or a
+    number of seconds: a background thread flushes and syncs that often,
+    so a crash loses at most that much.
+
+    Once a segment outgrows snapshot_ratio times the last snapshot (and at
+    least snapshot_min_bytes), the stores are snapshotted: the record lists
+    are copied under the writer lock, which is cheap since records are
+    never mutated, a new segment is started, and a background thread packs
+    the records with pickle into snapshot-<n>.snap, written to a temporary
+    file and renamed into place. Segments and snapshots older than it are
+    then removed, so the disk holds at most about two snapshots' worth of
+    data and each write is rewritten about 1/snapshot_ratio times.
+
+    restore() loads the newest snapshot and replays the segments after it,
+    stopping at the first torn or corrupt frame of the last one, which is
+    truncated away before appending resumes. A snapshot that can't be read
+    stops the restore, since the segments before it are gone. The
+    directory is locked while the journal is open, so only one process
+    appends to it.
+    """
+
+    def __init__(self, directory, stores, fsync=0.1, snapshot_ratio=1.0, snapshot_min_bytes=SNAPSHOT_MIN_BYTES):
+        self.directory = directory
+        self.stores = stores
+        self.fsync = fsync
+        self.snapshot_ratio = snapshot_ratio
+        self.snapshot_min_bytes = snapshot_min_bytes
+        self.generation = 1
+        self._file = None
+        self._file_lock = threading.Lock()
+        self._segment_bytes = 0
+        self._snapshot_bytes = 0
+        self._snapshotting = None
+        self._closed = threading.Event()
+        self._lock_file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, kind, generation):
+        suffix = 'log' if kind == 'journal' else 'snap'
+        return os.path.join(self.directory, f"{kind}-{generation:06d}.{suffix}")
+
+    def _generations(self, kind):
+        suffix = '.log' if kind == 'journal' else '.snap'
+        found = []
+        for name in os.listdir(self.directory):
+            if name.startswith(kind + '-') and name.endswith(suffix):
+                try:
+                    found.append(int(name[len(kind) + 1:-len(suffix)]))
+                except ValueError:
+                    continue
+        return sorted(found)
+
+    # Restoring
+
+    def restore(self):
+        """Load the stores from disk, then start journaling their writes.
+
+        Call before anything else subscribes to the stores, so derived
+        views are built once from the restored records. Returns a summary;
+        raises JournalError if another process has the directory or the
+        newest snapshot is unreadable.
+        """
+        start = time.perf_counter()
+        self._lock()
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                os.remove(os.path.join(self.directory, name))
+
+        # Loading allocates millions of objects, and each few hundred would
+        # set off a cyclic collection rescanning everything loaded so far.
+        # Records hold no cycles, so collection waits until they are in, and
+        # they are then moved out of its way for good.
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            loaded, base, replayed = self._load()
+        finally:
+            if collecting:
+                gc.enable()
+        if loaded or replayed:
+            gc.freeze()
+
+        self._open_segment()
+        for name, store in self.stores.items():
+            store.subscribe(lambda action, old, new, name=name: self._write(name, action, old, new))
+        if self.fsync not in ('always', 'off'):
+            threading.Thread(target=self._sync_loop, name='journal-fsync', daemon=True).start()
+        atexit.register(self.close)
+        return {'snapshot': base or None, 'snapshot_records': loaded, 'replayed': replayed,
+                'seconds': time.perf_counter() - start}
+
+    def _lock(self):
+        if fcntl is None or self._lock_file is not None:
+            return
+        self._lock_file = open(os.path.join(self.directory, 'lock'), 'a')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise JournalError(f"journal {self.directory} is in use by another process") from None
+
+    def _load(self):
+        """Load the newest snapshot and replay the journal after it"""
+        loaded, base = 0, 0
+        snapshots = self._generations('snapshot')
+        if snapshots:
+            base = snapshots[-1]
+            path = self._path('snapshot', base)
+            try:
+                loaded = self._load_snapshot(base)
+            except (OSError, ValueError, EOFError, TypeError, pickle.UnpicklingError) as e:
+                # Older segments were removed once it was written, so going
+                # on without it would silently drop those records
+                raise JournalError(f"snapshot {path} is unreadable ({e}); restore it from a backup"
+                                   " before starting") from e
+            self._snapshot_bytes = os.path.getsize(path)
+
+        replayed = 0
+        segments = [g for g in self._generations('journal') if g >= base]
+        for generation in self._generations('journal'):
+            if generation < base:
+                os.remove(self._path('journal', generation))
+        for generation in segments:
+            count, good_bytes = self._replay(generation)
+            replayed += count
+            if generation == segments[-1]:
+                with open(self._path('journal', generation), 'r+b') as f:
+                    f.truncate(good_bytes)
+                self._segment_bytes = good_bytes
+        self.generation = segments[-1] if segments else max(base, 1)
+        return loaded, base, replayed
+
+    def _load_snapshot(self, generation):
+        with open(self._path('snapshot', generation), 'rb') as f:
+            data = f.read()
+        if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError('not a snapshot in this format')
+        (crc,) = struct.unpack_from('<I', data, len(SNAPSHOT_MAGIC))
+        body = memoryview(data)[len(SNAPSHOT_MAGIC) + 4:]
+        if zlib.crc32(body) != crc:
+            raise ValueError('checksum mismatch')
+        collections = pickle.loads(body)
+        count = 0
+        for name, (layouts, rows) in collections.items():
+            store = self.stores[name]
+            with store.transaction():
+                for record in unpack(layouts, rows):
+                    store.add(record)
+                    count += 1
+        return count
+
+    def _replay(self, generation):
+        """Apply one segment's frames; returns (frames applied, bytes up to the last good frame)"""
+        with open(self._path('journal', generation), 'rb') as f:
+            data = f.read()
+        offset, count = 0, 0
+        while offset + FRAME.size <= len(data):
+            length, crc = FRAME.unpack_from(data, offset)
+            payload = data[offset + FRAME.size:offset + FRAME.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                logger.warning('Journal %s is torn at byte %s; ignoring the rest', generation, offset)
+                break
+            name, action, value = json.loads(payload)
+            store = self.stores[name]
+            if action == 'delete':
+                store.delete(value)
+            else:
+                store.add(value)
+            offset += FRAME.size + length
+            count += 1
+        return count, offset
+
+    # Writing
+
+    def _open_segment(self):
+        self._file = open(self._path('journal', self.generation), 'ab', buffering=1 << 16)
+
+    def _write(self, name, action, old, new):
+        # Called with the stores' writer lock held
+        payload = dumps([name, action, new if new is not None else old['id']])
+        frame = FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._file_lock:
+            if self._file is None:
+                return
+            self._file.write(frame)
+            if self.fsync == 'always':
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        self._segment_bytes += len(frame)
+        if (self._snapshotting is None
+                and self._segment_bytes >= max(self.snapshot_min_bytes, self._snapshot_bytes * self.snapshot_ratio)):
+            self.snapshot()
+
+    def _sync_loop(self):
+        while not self._closed.wait(self.fsync):
+            self.sync()
+
+    def sync(self):
+        """Flush buffered frames and fsync the current segment"""
+        with self._file_lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            fileno = os.dup(self._file.fileno())
+        # fsync outside the lock so writers aren't held up by the disk
+        try:
+            os.fsync(fileno)
+        finally:
+            os.close(fileno)
+
+    def snapshot(self, wait=False):
+        """Start a snapshot of the stores in the background (or wait for it).
+
+        The stores must share one writer lock, as crm_backend's do, for the
+        copied record lists to be consistent with each other.
+        """
+        lock = next(iter(self.stores.values())).lock
+        with lock:
+            if self._snapshotting is not None:
+                thread = self._snapshotting
+            else:
+                records = {name: store.all() for name, store in self.stores.items()}
+                self.sync()
+                with self._file_lock:
+                    self._file.close()
+                    self.generation += 1
+                    self._open_segment()
+                self._segment_bytes = 0
+                thread = self._snapshotting = threading.Thread(
+                    target=self._write_snapshot, args=(self.generation, records), name='journal-snapshot', daemon=True)
+                thread.start()
+        if wait:
+            thread.join()
+
+    def _write_snapshot(self, generation, records):
+        try:
+            start = time.perf_counter()
+            body = pickle.dumps({name: pack(collection) for name, collection in records.items()},
+                                protocol=SNAPSHOT_PROTOCOL)
+            path = self._path('snapshot', generation)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(SNAPSHOT_MAGIC + struct.pack('<I', zlib.crc32(body)))
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+            self._sync_directory()
+            self._snapshot_bytes = len(body)
+            for old in self._generations('snapshot'):
+                if old < generation:
+                    os.remove(self._path('snapshot', old))
+            for old in self._generations('journal'):
+                if old < generation:
+                    os.remove(self._path('journal', old))
+            logger.info('Snapshot %s: %s bytes in %.1fs', generation, len(body), time.perf_counter() - start)
+        except OSError:
+            logger.exception('Snapshot %s failed; the journal still has every write', generation)
+        finally:
+            self._snapshotting = None
+
+    def _sync_directory(self):
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return  # not supported on this platform
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """Flush and sync the journal; further writes are not recorded"""
+        self._closed.set()
+        thread = self._snapshotting
+        if thread is not None:
+            thread.join()
+        if self._file is not None and self.fsync != 'off':
+            self.sync()
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from flask.json.provider import DefaultJSONProvider
+
+from records import CompactRecord, plain
+
+try:
+    import orjson
+except ImportError:  # optional: json from the standard library is the fallback
+    orjson = None
+
+# Encoded records kept per collection for reuse across responses
+RECORD_CACHE_SIZE = int(os.getenv('RECORD_CACHE_SIZE', '10000'))
+
+
+def dumps(obj, default=plain):
+    """Encode obj as compact JSON bytes, with orjson when it is installed"""
+    if type(obj) is CompactRecord:
+        obj = obj.to_dict()
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=default, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def _default(obj):
+    if type(obj) is CompactRecord:
+        return obj.to_dict()
+    return DefaultJSONProvider.default(obj)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider encoding responses through dumps().
+
+    Keys keep their insertion order rather than being sorted, and output
+    is always compact. Store records are encoded as the dicts they stand for.
+    """
+
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, default=self.default).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, default=self.default), mimetype=self.mimetype)
+
+
+class RecordCache:
+    """The JSON of recently read records, encoded once and reused.
+
+    Records are encoded on demand the first time a response needs them, and
+    the bytes kept for up to max_records of them, the least recently used
+    making way for new ones, so memory stays bounded however large the
+    store is. Listeners drop a record's bytes when it is written. A
+    fragment is only used for a record equal to the one it was encoded from
+    (for the in-memory store, usually the very same dict); anything else is
+    encoded on the spot.
+    """
+
+    def __init__(self, store, max_records=RECORD_CACHE_SIZE):
+        self.max_records = max_records
+        self._lock = threading.Lock()     # guards the LRU order; lookups take no lock
+        self._entries = OrderedDict()     # id -> (record, bytes), least recently used first
+        store.subscribe(self._on_write)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def rebuild(self):
+        """Forget every cached record"""
+        with self._lock:
+            self._entries.clear()
+
+    def _on_write(self, action, old, new):
+        with self._lock:
+            self._entries.pop((old or new)['id'], None)
+
+    def _remember(self, hits, misses):
+        """Mark hits as recently used and add misses, evicting the oldest beyond max_records"""
+        if not self.max_records:
+            return
+        entries = self._entries
+        with self._lock:
+            # Recency only matters once something has to be evicted
+            if len(entries) + len(misses) > self.max_records:
+                for record_id in hits:
+                    if record_id in entries:
+                        entries.move_to_end(record_id)
+            for record, encoded in misses[-self.max_records:]:
+                entries[record['id']] = (record, encoded)
+                entries.move_to_end(record['id'])
+            while len(entries) > self.max_records:
+                entries.popitem(last=False)
+
+    def encode(self, record):
+        entry = self._entries.get(record['id'])
+        if entry is not None and (entry[0] is record or entry[0] == record):
+            if len(self._entries) >= self.max_records:
+                self._remember([record['id']], ())
+            return entry[1]
+        encoded = dumps(record)
+        self._remember((), [(record, encoded)])
+        return encoded
+
+    def encode_list(self, records):
+        # encode() inlined, with one pass under the lock for the whole list
+        entries, fragments, hits, misses = self._entries, [], [], []
+        for record in records:
+            entry = entries.get(record['id'])
+            if entry is not None and (entry[0] is record or entry[0] == record):
+                fragments.append(entry[1])
+                hits.append(record['id'])
+            else:
+                encoded = dumps(record)
+                fragments.append(encoded)
+                misses.append((record, encoded))
+        self._remember(hits, misses)
+        return b'[' + b','.join(fragments) + b']'
@@ -0,0 +1,167 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Request and store metrics for one process, in Prometheus text format.
+
+    Series are keyed by their label values, so routes are recorded by URL
+    rule (/customers/<customer_id>), not by path, to keep their number
+    bounded. Updates take one short lock; rendering copies under it.
+    Setting enabled to False turns updates into no-ops.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}    # (name, labels) -> value
+        self._gauges = {}      # (name, labels) -> value
+        self._help = {}        # name -> (type, help)
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def add(self, name, amount, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def observe_request(self, method, route, status, seconds, size=None):
+        self.observe('crm_request_duration_seconds', seconds, method=method, route=route)
+        self.inc('crm_requests_total', method=method, route=route, status=str(status))
+        if size is not None:
+            self.observe('crm_response_bytes', size, BYTES_BUCKETS, method=method, route=route)
+
+    def render(self):
+        """Return every series in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = [(key, list(h.buckets), list(h.counts), h.sum, h.count)
+                          for key, h in self._histograms.items()]
+            counters = list(self._counters.items())
+            gauges = list(self._gauges.items())
+
+        families = {}
+        for (name, labels), buckets, counts, total, count in histograms:
+            lines = families.setdefault((name, 'histogram'), [])
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for kind, series in (('counter', counters), ('gauge', gauges)):
+            for (name, labels), value in series:
+                families.setdefault((name, kind), []).append(f"{name}{_labels(labels)} {_number(value)}")
+
+        out = []
+        for (name, kind), lines in sorted(families.items()):
+            kind, text = self._help.get(name, (kind, ''))
+            if text:
+                out.append(f"# HELP {name} {text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return '\n'.join(out) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def instrument(app, metrics):
+    """Record latency, status, response size and in-flight count for a Flask app's requests"""
+    from flask import g, request
+
+    metrics.describe('crm_request_duration_seconds', 'histogram', 'Request latency by route')
+    metrics.describe('crm_requests_total', 'counter', 'Requests by route and status code')
+    metrics.describe('crm_response_bytes', 'histogram', 'Response body size by route')
+    metrics.describe('crm_requests_in_flight', 'gauge', 'Requests being handled')
+    metrics.set('crm_requests_in_flight', 0)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        metrics.add('crm_requests_in_flight', 1)
+
+    @app.after_request
+    def record_request(response):
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        # Streamed bodies (exports, events) have no length up front
+        size = None if response.is_streamed else response.calculate_content_length()
+        metrics.observe_request(request.method, route, response.status_code,
+                                time.perf_counter() - g.request_start, size)
+        g.request_recorded = True
+        return response
+
+    @app.teardown_request
+    def end_request(exc):
+        if 'request_start' not in g:
+            return
+        # Errors that propagate (debug mode) skip after_request
+        if not g.get('request_recorded'):
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.observe_request(request.method, route, 500, time.perf_counter() - g.request_start)
+        metrics.add('crm_requests_in_flight', -1)
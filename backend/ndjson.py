@@ -0,0 +1,80 @@
+import json
+
+from records import invalid_fields, plain, valid_id
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+def export_lines(store, chunk_size=CHUNK_SIZE):
+    """Yield a store's records as NDJSON, one chunk of lines at a time.
+
+    Records are read page by page through the keyset cursor, so memory use
+    stays at one chunk however large the collection is.
+    """
+    after = None
+    while True:
+        records, after = store.page(after, chunk_size)
+        if records:
+            yield ''.join(json.dumps(r, default=plain) + '\n' for r in records)
+        if after is None:
+            return
+
+
+def import_lines(store, build, lines, chunk_size=CHUNK_SIZE, conflicts=None, allow_conflicts=False):
+    """Insert NDJSON records from an iterable of lines, a chunk at a time.
+
+    Lines carrying an id are stored as they are (replacing any record with
+    that id), which is what export_lines produces; lines without one are
+    built like a POST. Each chunk is written in one store transaction.
+    conflicts, if given, is called as conflicts(record, pending) just before
+    each record is written, pending holding the chunk's records written so
+    far, and returns the ids of records it clashes with; such
+    lines fail unless allow_conflicts is set. Returns a summary with the
+    number imported and the first bad lines.
+    """
+    summary = {'imported': 0, 'failed': 0, 'errors': []}
+    chunk = []
+
+    def fail(number, error):
+        summary['failed'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'line': number, 'error': error})
+
+    def flush():
+        # Checked as each record is written, so earlier lines count even
+        # before the store's listeners hear of them on commit
+        pending = {}
+        with store.transaction():
+            for number, record in chunk:
+                clashes = conflicts(record, pending) if conflicts else []
+                if clashes and not allow_conflicts:
+                    fail(number, f"conflicts with {', '.join(map(str, clashes))}")
+                    continue
+                pending[record['id']] = store.add(record)
+                summary['imported'] += 1
+        chunk.clear()
+
+    for number, line in enumerate(lines, 1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError('each line must be a JSON object')
+            fields = invalid_fields(record)
+            if fields:
+                raise ValueError(f"{', '.join(fields)} must be a string, number or boolean")
+            if 'id' in record and not valid_id(record['id']):
+                raise ValueError('id must be a non-empty string')
+        except ValueError as e:
+            fail(number, str(e))
+            continue
+        chunk.append((number, record if 'id' in record else build(record)))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return summary
@@ -0,0 +1,152 @@
+import os
+
+# Saw blade width, and the chipped factory edge cut off each side of a board (mm)
+KERF = float(os.getenv("NESTING_KERF", "4"))
+EDGE_TRIM = float(os.getenv("NESTING_EDGE_TRIM", "10"))
+# Board stock by material: length x width (mm), and whether parts have to keep
+# the grain (along their height) running along the board's length
+BOARDS = {
+    '18mm MFC': {'length': 2440, 'width': 1220, 'grain': True},
+    '6mm MDF': {'length': 2440, 'width': 1220, 'grain': False},
+}
+
+# Orders to try placing the parts in; the one needing fewest boards wins
+ORDERS = (
+    lambda part: (-part['height'] * part['width'], -max(part['height'], part['width'])),
+    lambda part: (-max(part['height'], part['width']), -min(part['height'], part['width'])),
+    lambda part: (-part['height'], -part['width']),
+    lambda part: (-part['width'], -part['height']),
+)
+
+
+class Sheet:
+    """One board being cut up by guillotine cuts.
+
+    Keeps the free rectangles left after each part is cut, so every part
+    comes off with cuts right across what remains, as a panel saw makes
+    them. Sizes include the kerf.
+    """
+
+    def __init__(self, length, width, min_side):
+        self.free = [(0, 0, length, width)]
+        self.parts = []
+        self.min_side = min_side   # of any part still to place; narrower offcuts are dropped
+
+    def best_fit(self, dx, dy, rotatable):
+        """(waste, free rectangle index, rotated) for the offcut the part fills most of, or None"""
+        best = None
+        for i, (_, _, w, h) in enumerate(self.free):
+            if dx <= w and dy <= h:
+                fit = (w * h - dx * dy, min(w - dx, h - dy)), i, False
+                if best is None or fit < best:
+                    best = fit
+            if rotatable and dy <= w and dx <= h:
+                fit = (w * h - dx * dy, min(w - dy, h - dx)), i, True
+                if best is None or fit < best:
+                    best = fit
+        return best
+
+    def cut(self, i, dx, dy):
+        """Place a dx x dy part at the corner of free rectangle i; returns where"""
+        x, y, w, h = self.free[i]
+        self.free[i] = self.free[-1]
+        self.free.pop()
+        # Cut along the shorter leftover first, leaving the larger offcut whole
+        if w - dx < h - dy:
+            offcuts = (x + dx, y, w - dx, dy), (x, y + dy, w, h - dy)
+        else:
+            offcuts = (x + dx, y, w - dx, h), (x, y + dy, dx, h - dy)
+        self.free += [r for r in offcuts if r[2] >= self.min_side and r[3] >= self.min_side]
+        return x, y
+
+
+def _pieces(components):
+    """Every piece to cut, one per unit of quantity, by material"""
+    pieces = {}
+    for items in components.values():
+        for item in items:
+            for copy in range(item['quantity']):
+                pieces.setdefault(item['material_type'], []).append({
+                    'part_id': item['part_id'],
+                    'copy': copy + 1,
+                    'height': item['height'],
+                    'width': item['width'],
+                })
+    return pieces
+
+
+def _nest_material(pieces, board, kerf, trim, order):
+    """Place pieces on as few boards as they go on in this order; returns (sheets, oversize pieces)"""
+    # Parts are sized with one kerf each, and the board one kerf larger, so the last cut needs none
+    length, width = board['length'] - 2 * trim + kerf, board['width'] - 2 * trim + kerf
+    rotatable = not board['grain']
+    sheets, oversize = [], []
+    remaining = sorted(pieces, key=order)
+    min_side = min(min(p['height'], p['width']) for p in remaining) + kerf if remaining else 0
+    for piece in remaining:
+        dx, dy = piece['height'] + kerf, piece['width'] + kerf
+        if not (dx <= length and dy <= width) and not (rotatable and dy <= length and dx <= width):
+            oversize.append(piece)
+            continue
+        for sheet in sheets:
+            fit = sheet.best_fit(dx, dy, rotatable)
+            if fit:
+                break
+        else:
+            sheet = Sheet(length, width, min_side)
+            sheets.append(sheet)
+            fit = sheet.best_fit(dx, dy, rotatable)
+        _, i, rotated = fit
+        x, y = sheet.cut(i, *((dy, dx) if rotated else (dx, dy)))
+        sheet.parts.append({
+            'part_id': piece['part_id'],
+            'copy': piece['copy'],
+            'x': round(trim + x, 1),
+            'y': round(trim + y, 1),
+            'length': piece['width'] if rotated else piece['height'],   # along the board's length
+            'width': piece['height'] if rotated else piece['width'],
+            'rotated': rotated,
+        })
+    return sheets, oversize
+
+
+def nest(components, boards=BOARDS, kerf=KERF, trim=EDGE_TRIM):
+    """Nest a cutting list's parts onto boards of their material.
+
+    components is DrawingAnalyzer.components. Returns {'materials':
+    {material: {'board', 'sheet_count', 'yield', 'sheets': [{'parts',
+    'yield'}]}}, 'unplaced': [...]}, parts placed by their corner on the
+    board (x along its length), yield being the share of the boards'
+    area that ends up in parts. Parts of a material with no board, or too
+    big for one, are listed as unplaced.
+    """
+    layout = {'materials': {}, 'unplaced': []}
+    for material, pieces in _pieces(components).items():
+        board = boards.get(material)
+        if board is None:
+            layout['unplaced'] += [dict(p, material=material, reason='no board for this material') for p in pieces]
+            continue
+        # Greedy placement depends on the order; a few orders are cheap to try
+        sheets, oversize = min((_nest_material(pieces, board, kerf, trim, order) for order in ORDERS),
+                               key=lambda result: (len(result[0]), _area(result[0][-1].parts) if result[0] else 0))
+        layout['unplaced'] += [dict(p, material=material, reason='larger than the board') for p in oversize]
+        if not sheets:
+            continue
+        board_area = board['length'] * board['width']
+        layout['materials'][material] = {
+            'board': board,
+            'sheet_count': len(sheets),
+            'yield': round(sum(_area(s.parts) for s in sheets) / (board_area * len(sheets)), 4),
+            'sheets': [{'parts': s.parts, 'yield': round(_area(s.parts) / board_area, 4)} for s in sheets],
+        }
+    return layout
+
+
+def _area(parts):
+    return sum(p['length'] * p['width'] for p in parts)
+
+
+def summarize(layout):
+    """Boards needed and yield per material, from nest()"""
+    return {material: {'sheets': nested['sheet_count'], 'yield': nested['yield']}
+            for material, nested in layout['materials'].items()}
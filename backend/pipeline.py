@@ -0,0 +1,98 @@
+class PipelineView:
+    """Materialized /pipeline items, kept current from customer and job writes.
+
+    Customers without jobs appear as 'customer' items; every job whose
+    customer exists appears as a 'job' item carrying both records. Each
+    write touches only the items of the affected customer, so serving the
+    view never joins the two collections. Updates arrive with the customer
+    store's writer lock held, and items() copies the view under the same
+    lock, so a reader never sees a write half applied.
+    """
+
+    def __init__(self, customers, jobs):
+        self._customers = customers
+        self._jobs = jobs
+        self._lock = customers.lock
+        self.rebuild()
+        customers.subscribe(self._on_customer)
+        jobs.subscribe(self._on_job)
+
+    def rebuild(self):
+        """Recompute every item from the stores"""
+        with self._lock:
+            self._customer_items = {}   # customer id -> item
+            self._job_items = {}        # job id -> item
+            self._jobs_by_customer = {}  # customer id -> {job id: job}
+            for job in self._jobs.all():
+                self._on_job('create', None, job)
+            for customer in self._customers.all():
+                self._on_customer('create', None, customer)
+
+    def items(self, stages=None):
+        """Return pipeline items, optionally only those in the given stages"""
+        with self._lock:
+            items = list(self._customer_items.values()) + list(self._job_items.values())
+        if stages:
+            items = [i for i in items if self.item_stage(i) in stages]
+        return items
+
+    @staticmethod
+    def item_stage(item):
+        record = item['job'] if item['type'] == 'job' else item['customer']
+        return record.get('stage')
+
+    def _on_customer(self, action, old, new):
+        customer_id = (new or old)['id']
+        customer_jobs = self._jobs_by_customer.get(customer_id, {})
+
+        if new is None:
+            self._customer_items.pop(customer_id, None)
+            for job_id in customer_jobs:
+                self._job_items.pop(job_id, None)
+            return
+
+        if customer_jobs:
+            self._customer_items.pop(customer_id, None)
+            for job in customer_jobs.values():
+                self._set_job_item(job, new)
+        else:
+            self._customer_items[customer_id] = {
+                'id': f"customer-{customer_id}",
+                'type': 'customer',
+                'customer': new
+            }
+
+    def _on_job(self, action, old, new):
+        # Assigning over existing keys keeps an updated item in its place
+        if old is not None and (new is None or old.get('customer_id') != new.get('customer_id')):
+            self._detach_job(old)
+        if new is None:
+            return
+
+        customer_id = new.get('customer_id')
+        self._jobs_by_customer.setdefault(customer_id, {})[new['id']] = new
+        customer = self._customers.get(customer_id)
+        if customer:
+            self._customer_items.pop(customer_id, None)
+            self._set_job_item(new, customer)
+
+    def _detach_job(self, job):
+        customer_id = job.get('customer_id')
+        self._job_items.pop(job['id'], None)
+        customer_jobs = self._jobs_by_customer.get(customer_id)
+        if customer_jobs is None:
+            return
+        customer_jobs.pop(job['id'], None)
+        if not customer_jobs:
+            del self._jobs_by_customer[customer_id]
+            customer = self._customers.get(customer_id)
+            if customer:
+                self._on_customer('update', customer, customer)
+
+    def _set_job_item(self, job, customer):
+        self._job_items[job['id']] = {
+            'id': f"job-{job['id']}",
+            'type': 'job',
+            'customer': customer,
+            'job': job
+        }
@@ -0,0 +1,102 @@
+import logging
+import os
+from io import BytesIO
+
+try:
+    from PIL import Image, ImageFilter, ImageOps
+except ImportError:  # optional: without Pillow drawings are sent as uploaded
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Longest side sent to the APIs. GPT-4o scales 'high' detail images to fit
+# 2048x2048 (then 768 on the short side) anyway, and dimension figures on
+# an A4/A3 drawing stay well above the size Vision reads reliably.
+MAX_SIDE = int(os.getenv("ANALYSIS_IMAGE_MAX_SIDE", "2048"))
+JPEG_QUALITY = int(os.getenv("ANALYSIS_IMAGE_QUALITY", "85"))
+# Smaller uploads go as they are: re-encoding would cost more than it saves
+MIN_BYTES = 256 * 1024
+# How far from the paper's shade a pixel can be and still count as paper
+PAPER_TOLERANCE = 48
+CROP_PADDING = 0.02
+ORIENTATION = 0x0112  # EXIF tag
+
+
+def content_box(gray):
+    """The box around the drawing in a grayscale photo or scan, padded a little, or None.
+
+    The sheet is the part of the image close to the paper's shade, which
+    leaves out a desk or scanner lid around it; the drawing is whatever is
+    darker than the paper within the sheet.
+    """
+    histogram = gray.histogram()
+    bright = histogram[128:]
+    if not any(bright):
+        return None
+    # The paper is the most common light shade, whatever the lighting made of it
+    paper = 128 + bright.index(max(bright))
+    # Eroding the mask drops specks of background that happen to be paper-coloured
+    sheet = gray.point(lambda value: 255 if abs(value - paper) <= PAPER_TOLERANCE else 0) \
+        .filter(ImageFilter.MinFilter(5)).getbbox()
+    if sheet is None:
+        return None
+    ink = gray.crop(sheet).point(lambda value: 255 if value < paper - PAPER_TOLERANCE else 0).getbbox()
+    if ink is None:
+        return None
+    left, top, right, bottom = (sheet[0] + ink[0], sheet[1] + ink[1], sheet[0] + ink[2], sheet[1] + ink[3])
+    pad_x, pad_y = int(gray.width * CROP_PADDING), int(gray.height * CROP_PADDING)
+    return (max(0, left - pad_x), max(0, top - pad_y),
+            min(gray.width, right + pad_x), min(gray.height, bottom + pad_y))
+
+
+def prepare_drawing(image_bytes, max_side=MAX_SIDE, quality=JPEG_QUALITY):
+    """Return (bytes, mime type) of a drawing ready to upload to the OCR and LLM APIs.
+
+    The image is turned upright from its EXIF orientation, made grayscale,
+    cropped to the drawing where the margins are plain paper, scaled down
+    to max_side on its longest side and encoded once, as JPEG, or as PNG
+    for line art where that is smaller. Anything Pillow can't read, or an
+    upright image that doesn't get any smaller, is passed on unchanged.
+    """
+    if Image is None:
+        return image_bytes, 'image/jpeg'
+    try:
+        image = Image.open(BytesIO(image_bytes))
+        original_format = image.format
+        rotated = image.getexif().get(ORIENTATION, 1) != 1
+        if len(image_bytes) < MIN_BYTES and not rotated:
+            return image_bytes, Image.MIME.get(original_format, 'image/jpeg')
+        # JPEG can decode straight to a fraction of full size, saving most of the work
+        if max_side and original_format == 'JPEG':
+            scale = max_side / max(image.size)
+            image.draft('L', (int(image.width * scale), int(image.height * scale)))
+        image = ImageOps.exif_transpose(image)
+        gray = image.convert('L')
+
+        # Find the margins on a reduced copy; it's only a bounding box
+        factor = max(1, max(gray.size) // 1024)
+        box = content_box(gray.reduce(factor))
+        if box is not None:
+            box = tuple(min(edge * factor, limit) for edge, limit in zip(box, gray.size * 2))
+            if (box[2] - box[0]) * (box[3] - box[1]) < 0.95 * gray.width * gray.height:
+                gray = gray.crop(box)
+
+        if max_side and max(gray.size) > max_side:
+            gray.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        encoded = BytesIO()
+        gray.save(encoded, 'JPEG', quality=quality, optimize=True)
+        prepared, mime_type = encoded.getvalue(), 'image/jpeg'
+        if original_format != 'JPEG':
+            # Scans and exported drawings are mostly flat paper and lines, which PNG keeps smaller and sharper
+            encoded = BytesIO()
+            gray.save(encoded, 'PNG')
+            if len(encoded.getvalue()) < len(prepared):
+                prepared, mime_type = encoded.getvalue(), 'image/png'
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not preprocess drawing, sending it as uploaded: {str(e)}")
+        return image_bytes, 'image/jpeg'
+
+    if len(prepared) >= len(image_bytes) and not rotated:
+        return image_bytes, Image.MIME.get(original_format, 'image/jpeg')
+    return prepared, mime_type
@@ -0,0 +1,264 @@
+import sys
+import uuid
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+# Fields with a handful of distinct values, shared between records rather than copied
+ENUM_FIELDS = frozenset({'stage', 'status', 'priority', 'type', 'job_type', 'contact_made'})
+TIMESTAMP_FIELDS = frozenset({'created_at', 'updated_at'})
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def invalid_fields(data):
+    """Names of ENUM_FIELDS in data holding something other than a string,
+    number, boolean or null, which the views can't count or filter on"""
+    return sorted(f for f in ENUM_FIELDS.intersection(data)
+                  if data[f] is not None and not isinstance(data[f], (str, int, float, bool)))
+
+
+def valid_id(value):
+    """True for something usable as a record id: a non-empty string"""
+    return isinstance(value, str) and value != ''
+
+
+def new_customer(data):
+    """Build a customer record from POSTed data, filling in defaults"""
+    return {
+        'id': str(uuid.uuid4()),
+        'created_at': datetime.now().isoformat(),
+        'updated_at': datetime.now().isoformat(),
+        'stage': data.get('stage', 'Lead'),
+        'contact_made': data.get('contact_made', 'Unknown'),
+        'marketing_opt_in': data.get('marketing_opt_in', False),
+        'status': data.get('status', 'active'),
+        **data
+    }
+
+
+def new_job(data):
+    """Build a job record from POSTed data, filling in defaults"""
+    return {
+        'id': str(uuid.uuid4()),
+        'created_at': datetime.now().isoformat(),
+        'updated_at': datetime.now().isoformat(),
+        'stage': data.get('stage', 'Lead'),
+        'job_type': data.get('job_type', 'Kitchen'),
+        **data
+    }
+
+
+def new_assignment(data):
+    """Build an assignment record from POSTed data, filling in defaults"""
+    return {
+        'id': str(uuid.uuid4()),
+        'created_at': datetime.now().isoformat(),
+        'updated_at': datetime.now().isoformat(),
+        'type': data.get('type', 'job'),
+        'staff_id': data.get('staff_id'),
+        'date': data.get('date'),
+        'start_time': data.get('start_time'),
+        'end_time': data.get('end_time'),
+        'estimated_hours': data.get('estimated_hours', 0),
+        'priority': data.get('priority', 'Medium'),
+        'status': data.get('status', 'Scheduled'),
+        'title': data.get('title', ''),
+        'notes': data.get('notes', ''),
+        'job_id': data.get('job_id'),
+        'customer_id': data.get('customer_id'),
+        **data
+    }
+
+
+BUILDERS = {
+    'customers': new_customer,
+    'jobs': new_job,
+    'assignments': new_assignment,
+}
+
+
+class Timestamp(int):
+    """A naive ISO timestamp held as microseconds since 1970 instead of a string"""
+
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, value):
+        """A Timestamp for value, or None unless it converts back to exactly the same string"""
+        if type(value) is not str:
+            return None
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        if moment.tzinfo is not None or moment.isoformat() != value:
+            return None
+        return cls((moment - EPOCH) // MICROSECOND)
+
+    def isoformat(self):
+        return (EPOCH + timedelta(microseconds=int(self))).isoformat()
+
+
+class Layout:
+    """The keys of a record, in order, shared by the records with the same keys (see MAX_LAYOUTS)"""
+
+    __slots__ = ('keys', 'index', 'timestamps')
+
+    def __init__(self, keys):
+        self.keys = tuple(sys.intern(k) if type(k) is str else k for k in keys)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.timestamps = [(i, key) for i, key in enumerate(self.keys) if key in TIMESTAMP_FIELDS]
+
+
+_layouts = {}  # keys -> Layout
+# Clients can send any fields, so past this many distinct key sets a new
+# one gets a Layout of its own instead of growing _layouts without bound
+MAX_LAYOUTS = 1024
+
+
+class CompactRecord(Mapping):
+    """A read-only record stored as a shared Layout and a tuple of values.
+
+    A dict per record repeats its hash table and key pointers for every
+    customer, job and assignment; here those live once in the Layout and
+    each record is two slots and a tuple. Stage-like values are interned,
+    and created_at/updated_at are kept as integers and turned back into
+    the same ISO strings when read. It behaves as a Mapping, so code that
+    calls get() or indexes records works unchanged; JSON encoders convert
+    it with to_dict() (see plain()).
+    """
+
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, layout, values):
+        self._layout = layout
+        self._values = values
+
+    def __getitem__(self, key):
+        value = self._values[self._layout.index[key]]
+        return value.isoformat() if type(value) is Timestamp else value
+
+    def get(self, key, default=None):
+        i = self._layout.index.get(key)
+        if i is None:
+            return default
+        value = self._values[i]
+        return value.isoformat() if type(value) is Timestamp else value
+
+    def __contains__(self, key):
+        return key in self._layout.index
+
+    def __iter__(self):
+        return iter(self._layout.keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        if type(other) is CompactRecord:
+            return ((self._layout is other._layout or self._layout.keys == other._layout.keys)
+                    and self._values == other._values)
+        if isinstance(other, dict):
+            return len(other) == len(self._values) and self.to_dict() == other
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"CompactRecord({self.to_dict()!r})"
+
+    def merged(self, changes):
+        """compact({**self, **changes}), without turning self back into a dict"""
+        layout, values = self._layout, list(self._values)
+        added = tuple(key for key in changes if key not in layout.index)
+        if added:
+            layout = _layout(layout.keys + added)
+            values.extend([None] * len(added))
+        index = layout.index
+        for key, value in changes.items():
+            values[index[key]] = _value(key, value)
+        return CompactRecord(layout, tuple(values))
+
+    def to_dict(self):
+        """The record as the plain dict it was built from"""
+        values = self._values
+        record = dict(zip(self._layout.keys, values))
+        for i, key in self._layout.timestamps:
+            if type(values[i]) is Timestamp:
+                record[key] = values[i].isoformat()
+        return record
+
+
+def _layout(keys):
+    layout = _layouts.get(keys)
+    if layout is None:
+        layout = Layout(keys)
+        if len(_layouts) < MAX_LAYOUTS:
+            layout = _layouts.setdefault(keys, layout)
+    return layout
+
+
+def _value(key, value):
+    """How a field's value is held in a CompactRecord"""
+    if key in ENUM_FIELDS:
+        if type(value) is str:
+            return sys.intern(value)
+    elif key in TIMESTAMP_FIELDS:
+        stamp = Timestamp.parse(value)
+        if stamp is not None:
+            return stamp
+    return value
+
+
+def compact(record):
+    """Return record as a CompactRecord"""
+    if type(record) is CompactRecord:
+        return record
+    return CompactRecord(_layout(tuple(record)), tuple(_value(key, value) for key, value in record.items()))
+
+
+def pack(records):
+    """Return (layouts, rows) for a list of records, using only builtin types.
+
+    layouts are key tuples and each row is (layout index, values), with
+    timestamps as plain ints and anything else found in a timestamp field
+    wrapped in a 1-tuple, so unpack() can tell them apart.
+    """
+    numbers, layouts, rows = {}, [], []
+    for record in records:
+        record = compact(record)
+        layout = record._layout
+        number = numbers.get(layout)
+        if number is None:
+            number = numbers[layout] = len(layouts)
+            layouts.append(layout.keys)
+        values = record._values
+        if layout.timestamps:
+            values = list(values)
+            for i, _ in layout.timestamps:
+                value = values[i]
+                values[i] = int(value) if type(value) is Timestamp else (value,)
+            values = tuple(values)
+        rows.append((number, values))
+    return layouts, rows
+
+
+def unpack(layouts, rows):
+    """Yield the CompactRecords pack() was given"""
+    layouts = [_layout(tuple(keys)) for keys in layouts]
+    for number, values in rows:
+        layout = layouts[number]
+        if layout.timestamps:
+            values = list(values)
+            for i, _ in layout.timestamps:
+                value = values[i]
+                values[i] = Timestamp(value) if type(value) is int else value[0]
+            values = tuple(values)
+        yield CompactRecord(layout, values)
+
+
+def plain(obj):
+    """json `default` hook encoding a CompactRecord as its dict"""
+    if type(obj) is CompactRecord:
+        return obj.to_dict()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
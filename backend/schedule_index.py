@@ -0,0 +1,186 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, timedelta
+
+WORK_DAY_START = '08:00'
+WORK_DAY_END = '17:00'
+# Assignments in these statuses keep their place in the calendar but no
+# longer hold their time slot
+FREE_STATUSES = {'Cancelled'}
+
+
+def to_minutes(value):
+    """Minutes since midnight for 'HH:MM' or 'HH:MM:SS', else None"""
+    try:
+        hours, minutes = str(value).split(':')[:2]
+        return int(hours) * 60 + int(minutes)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_time(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def date_range(date_from, date_to):
+    """Yield ISO dates from date_from to date_to inclusive"""
+    day, last = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    while day <= last:
+        yield day.isoformat()
+        if day == last:     # the day after date.max doesn't exist
+            return
+        day += timedelta(days=1)
+
+
+class StaffScheduleIndex:
+    """Assignments indexed by staff member and date.
+
+    For each staff member the index keeps a sorted list of the dates they
+    have assignments on, and for each (staff, date) the assignment ids plus
+    the timed, uncancelled ones as (start, end, id) intervals sorted by
+    start. Range
+    queries bisect into the date list, and conflict checks go straight to
+    one day and bisect its intervals, so neither walks the whole
+    assignments collection. Staff ids are compared as strings, since the
+    frontend sends them as either. Updates arrive with the assignment
+    store's writer lock held, and queries walk the index under it too.
+    """
+
+    def __init__(self, assignments):
+        self._assignments = assignments
+        self._lock = assignments.lock
+        self.rebuild()
+        assignments.subscribe(self._on_assignment)
+
+    def rebuild(self):
+        """Re-index every assignment in the store"""
+        with self._lock:
+            self._dates = {}      # staff -> sorted [date]
+            self._days = {}       # (staff, date) -> {id: None}, in insertion order
+            self._intervals = {}  # (staff, date) -> sorted [(start, end, id)]
+            for assignment in self._assignments.all():
+                self._add(assignment)
+
+    @staticmethod
+    def _key(assignment):
+        staff_id, day = assignment.get('staff_id'), assignment.get('date')
+        if staff_id is None or not day:
+            return None
+        return str(staff_id), str(day)
+
+    @staticmethod
+    def _interval(assignment):
+        if assignment.get('status') in FREE_STATUSES:
+            return None
+        start, end = to_minutes(assignment.get('start_time')), to_minutes(assignment.get('end_time'))
+        if start is None or end is None or end <= start:
+            return None
+        return start, end, assignment['id']
+
+    def _on_assignment(self, action, old, new):
+        if old is not None:
+            self._remove(old)
+        if new is not None:
+            self._add(new)
+
+    def _add(self, assignment):
+        key = self._key(assignment)
+        if key is None:
+            return
+        day_ids = self._days.get(key)
+        if day_ids is None:
+            day_ids = self._days[key] = {}
+            insort(self._dates.setdefault(key[0], []), key[1])
+        day_ids[assignment['id']] = None
+        interval = self._interval(assignment)
+        if interval:
+            insort(self._intervals.setdefault(key, []), interval)
+
+    def _remove(self, assignment):
+        key = self._key(assignment)
+        day_ids = self._days.get(key) if key else None
+        if day_ids is None:
+            return
+        day_ids.pop(assignment['id'], None)
+        interval = self._interval(assignment)
+        intervals = self._intervals.get(key)
+        if interval and intervals:
+            i = bisect_left(intervals, interval)
+            if i < len(intervals) and intervals[i] == interval:
+                del intervals[i]
+            if not intervals:
+                del self._intervals[key]
+        if not day_ids:
+            del self._days[key]
+            dates = self._dates[key[0]]
+            del dates[bisect_left(dates, key[1])]
+            if not dates:
+                del self._dates[key[0]]
+
+    def find(self, staff_id, date_from=None, date_to=None):
+        """Return a staff member's assignments between two dates (inclusive)
+
+        Dates compare as ISO strings, in date then insertion order.
+        """
+        with self._lock:
+            dates = self._dates.get(str(staff_id), [])
+            lo = bisect_left(dates, date_from) if date_from else 0
+            hi = bisect_right(dates, date_to) if date_to else len(dates)
+            ids = [assignment_id for day in dates[lo:hi] for assignment_id in self._days[(str(staff_id), day)]]
+        records = []
+        for assignment_id in ids:
+            record = self._assignments.get(assignment_id)
+            if record:
+                records.append(record)
+        return records
+
+    def conflicts(self, assignment, ignore_id=None, pending=None):
+        """Return ids of other assignments overlapping this one's time slot
+
+        pending maps ids of assignments about to be written in the same
+        batch to their new version (None for a delete); those count instead
+        of what the index holds for them.
+        """
+        key, interval = self._key(assignment), self._interval(assignment)
+        if key is None or interval is None:
+            return []
+        start, end, _ = interval
+        with self._lock:
+            intervals = self._intervals.get(key, [])
+            # Everything from hi on starts at or after our end; earlier
+            # entries overlap if they end after our start.
+            hi = bisect_left(intervals, (end,))
+            ids = [other_id for other_start, other_end, other_id in intervals[:hi]
+                   if other_end > start and other_id != ignore_id]
+        if not pending:
+            return ids
+        ids = [other_id for other_id in ids if other_id not in pending]
+        for other_id, other in pending.items():
+            if other is None or other_id == ignore_id or self._key(other) != key:
+                continue
+            other_interval = self._interval(other)
+            if other_interval and other_interval[0] < end and other_interval[1] > start:
+                ids.append(other_id)
+        return ids
+
+    def busy(self, staff_id, day):
+        """Return the (start, end, id) intervals booked for a staff member on a day"""
+        with self._lock:
+            return list(self._intervals.get((str(staff_id), day), []))
+
+    def availability(self, staff_id, day, day_start=WORK_DAY_START, day_end=WORK_DAY_END):
+        """Return the booked and free slots for a staff member within a working day"""
+        busy = self.busy(staff_id, day)
+        free, cursor, close = [], to_minutes(day_start), to_minutes(day_end)
+        for start, end, _ in busy:
+            if start > cursor:
+                free.append((cursor, min(start, close)))
+            cursor = max(cursor, end)
+            if cursor >= close:
+                break
+        if cursor < close:
+            free.append((cursor, close))
+        return {
+            'date': day,
+            'busy': [{'id': i, 'start_time': to_time(s), 'end_time': to_time(e)} for s, e, i in busy],
+            'free': [{'start_time': to_time(s), 'end_time': to_time(e)} for s, e in free if e > s],
+        }
@@ -0,0 +1,275 @@
+from schedule_index import WORK_DAY_END, WORK_DAY_START, to_minutes, to_time
+
+PRIORITY_WEIGHTS = {'Urgent': 8, 'High': 4, 'Medium': 2, 'Low': 1}
+
+# Who does the next visit for a job at each schedulable stage; a job can
+# override this with its own required_role.
+STAGE_ROLES = {
+    'Quoted': 'Measuring',
+    'Accepted': 'Measuring',
+    'Production': 'Delivery',
+    'ready': 'Installer',
+}
+DEFAULT_HOURS = {'Measuring': 2, 'Delivery': 2, 'Installer': 8}
+
+
+class Planner:
+    """Free time per staff member and day over a planning horizon.
+
+    Free intervals are built lazily from the existing bookings returned by
+    busy(staff_id, day), and a per-staff pointer skips days that are
+    already full, so placing a job only looks at days that could take it.
+    """
+
+    def __init__(self, days, busy, daily_hours, day_start=WORK_DAY_START, day_end=WORK_DAY_END):
+        self.days = days
+        self.busy = busy
+        self.day_start = to_minutes(day_start)
+        self.day_end = to_minutes(day_end)
+        self.daily_minutes = int(daily_hours * 60)
+        self._free = {}       # (staff, day index) -> [[start, end], ...]
+        self._capacity = {}   # (staff, day index) -> bookable minutes left
+        self._first_open = {}  # staff -> first day index with capacity left
+        self.load = {}        # staff -> minutes planned
+
+    def _init_day(self, staff_id, d):
+        free, cursor, booked = [], self.day_start, 0
+        for start, end, _ in self.busy(staff_id, self.days[d]):
+            booked += end - start
+            if start > cursor:
+                free.append([cursor, min(start, self.day_end)])
+            cursor = max(cursor, end)
+        if cursor < self.day_end:
+            free.append([cursor, self.day_end])
+        self._free[(staff_id, d)] = [f for f in free if f[1] > f[0]]
+        self._capacity[(staff_id, d)] = max(0, self.daily_minutes - booked)
+
+    def capacity(self, staff_id, d):
+        if (staff_id, d) not in self._capacity:
+            self._init_day(staff_id, d)
+        return self._capacity[(staff_id, d)]
+
+    def fits(self, staff_id, d, length):
+        """Earliest start on day d with length free minutes, or None"""
+        if self.capacity(staff_id, d) < length:
+            return None
+        for start, end in self._free[(staff_id, d)]:
+            if end - start >= length:
+                return start
+        return None
+
+    def reserve(self, staff_id, d, start, length):
+        end, free = start + length, self._free[(staff_id, d)]
+        for i, (s, e) in enumerate(free):
+            if s <= start and end <= e:
+                free[i:i + 1] = [iv for iv in ([s, start], [end, e]) if iv[1] > iv[0]]
+                break
+        self._capacity[(staff_id, d)] -= length
+        self.load[staff_id] = self.load.get(staff_id, 0) + length
+        first = self._first_open.get(staff_id, 0)
+        while first < len(self.days) and not self._open(staff_id, first):
+            first += 1
+        self._first_open[staff_id] = first
+
+    def release(self, staff_id, d, start, length):
+        free = self._free[(staff_id, d)]
+        free.append([start, start + length])
+        free.sort()
+        merged = [free[0]]
+        for s, e in free[1:]:
+            if s <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        self._free[(staff_id, d)] = merged
+        self._capacity[(staff_id, d)] += length
+        self.load[staff_id] -= length
+        self._first_open[staff_id] = min(self._first_open.get(staff_id, 0), d)
+
+    def _open(self, staff_id, d):
+        return self.capacity(staff_id, d) > 0 and bool(self._free[(staff_id, d)])
+
+    def place(self, staff_id, chunks, from_day=0, to_day=None):
+        """Earliest run of consecutive days taking one chunk each.
+
+        Returns [(day index, start), ...] or None if nothing fits.
+        """
+        last = min(to_day if to_day is not None else len(self.days), len(self.days)) - len(chunks)
+        for d in range(max(from_day, self._first_open.get(staff_id, 0)), last + 1):
+            placement = []
+            for i, length in enumerate(chunks):
+                start = self.fits(staff_id, d + i, length)
+                if start is None:
+                    break
+                placement.append((d + i, start))
+            else:
+                return placement
+        return None
+
+
+def job_role(job):
+    return job.get('required_role') or STAGE_ROLES.get(job.get('stage'))
+
+
+def job_minutes(job, role):
+    try:
+        hours = float(job.get('estimated_hours') or DEFAULT_HOURS.get(role, 4))
+    except (TypeError, ValueError):
+        hours = DEFAULT_HOURS.get(role, 4)
+    return max(15, int(round(hours * 60)))
+
+
+def plan_jobs(jobs, staff, days, busy, daily_hours=8, max_moves=20000):
+    """Assign jobs to staff over the given days.
+
+    jobs are placed greedily in priority order (then oldest first), each at
+    the earliest slot any staff member with the right role has free, ties
+    going to the least loaded person. Jobs longer than a day are split into
+    daily chunks on consecutive days for the same person. A repair pass then
+    tries to fit what is left over by moving planned jobs aside (see
+    _repair), bounded by max_moves attempts.
+
+    busy(staff_id, day) returns the existing (start, end, id) bookings.
+    Returns (plans, unscheduled): plans are dicts with job, staff, date and
+    times; unscheduled are (job, reason) pairs.
+    """
+    planner = Planner(days, busy, daily_hours)
+    staff_by_role = {}
+    for member in staff:
+        staff_by_role.setdefault(member.get('role'), []).append(str(member['id']))
+
+    def order(job):
+        return (-_weight(job), str(job.get('created_at', '')))
+
+    plans, unscheduled, no_room = [], [], {}
+    for job in sorted(jobs, key=order):
+        role = job_role(job)
+        candidates = staff_by_role.get(role)
+        if not candidates:
+            unscheduled.append((job, f"no staff with role {role}" if role else 'no role for this stage'))
+            continue
+        minutes = job_minutes(job, role)
+        chunk = min(planner.daily_minutes, planner.day_end - planner.day_start)
+        chunks = [chunk] * (minutes // chunk) + ([minutes % chunk] if minutes % chunk else [])
+
+        # Free time only shrinks, so once a length found no room for a role,
+        # nothing at least that long will either
+        if min(chunks) >= no_room.get(role, float('inf')):
+            unscheduled.append((job, 'no free slot in the horizon'))
+            continue
+        best = None
+        for staff_id in candidates:
+            placement = planner.place(staff_id, chunks)
+            if placement is None:
+                continue
+            key = (placement[0][0], planner.load.get(staff_id, 0))
+            if best is None or key < best[0]:
+                best = (key, staff_id, placement)
+        if best is None:
+            if len(chunks) == 1:
+                no_room[role] = min(chunks[0], no_room.get(role, chunks[0]))
+            unscheduled.append((job, 'no free slot in the horizon'))
+            continue
+        _, staff_id, placement = best
+        for (d, start), length in zip(placement, chunks):
+            planner.reserve(staff_id, d, start, length)
+        plans.append({'job': job, 'role': role, 'staff_id': staff_id,
+                      'slots': [[d, start, length] for (d, start), length in zip(placement, chunks)]})
+
+    unscheduled = _repair(planner, plans, unscheduled, staff_by_role, max_moves)
+
+    return [{
+        'job': plan['job'],
+        'staff_id': plan['staff_id'],
+        'date': days[d],
+        'start_time': to_time(start),
+        'end_time': to_time(start + length),
+        'hours': round(length / 60, 2),
+    } for plan in plans for d, start, length in plan['slots']], unscheduled
+
+
+def _weight(job):
+    return PRIORITY_WEIGHTS.get(job.get('priority'), 2)
+
+
+def _repair(planner, plans, unscheduled, staff_by_role, max_moves):
+    """Local improvement: fit unscheduled jobs by moving a planned job aside.
+
+    Greedy placement fragments days, so a job needing a long block can find
+    no room while short jobs sit in the middle of otherwise free days. For
+    each single-day job left over, try evicting one planned single-day job
+    of no higher priority from a day, placing the leftover job in the gap,
+    and re-placing the evicted job at its earliest fit elsewhere. Moves that
+    can't re-place the evicted job are rolled back, and once a job of some
+    length can't be re-placed for a role, no job that long is evicted again
+    (free time only shrinks as the pass goes on).
+    """
+    by_day = {}  # (staff, day index) -> single-day plans
+    shortest = {}  # role -> shortest single-day plan
+    for plan in plans:
+        if len(plan['slots']) == 1:
+            by_day.setdefault((plan['staff_id'], plan['slots'][0][0]), []).append(plan)
+            shortest[plan['role']] = min(plan['slots'][0][2], shortest.get(plan['role'], plan['slots'][0][2]))
+
+    budget = {'moves': max_moves}
+    stuck = {}  # role -> shortest length that found no room when evicted
+    remaining = []
+    for job, reason in unscheduled:
+        role = job_role(job)
+        length = job_minutes(job, role)
+        if (budget['moves'] <= 0 or role not in staff_by_role or length > planner.daily_minutes
+                or stuck.get(role, float('inf')) <= shortest.get(role, 0)):
+            remaining.append((job, reason))
+            continue
+        move = _find_eviction(planner, job, role, length, by_day, staff_by_role, stuck, budget)
+        if move is None:
+            remaining.append((job, reason))
+            continue
+        placed, other, old_key = move
+        by_day[old_key].remove(other)
+        by_day.setdefault(old_key, []).append(placed)
+        by_day.setdefault((other['staff_id'], other['slots'][0][0]), []).append(other)
+        plans.append(placed)
+    return remaining
+
+
+def _find_eviction(planner, job, role, length, by_day, staff_by_role, stuck, budget):
+    """Try evictions for one job; returns (new plan, moved plan, its old key) or None"""
+    for staff_id in staff_by_role[role]:
+        for d in range(len(planner.days)):
+            for other in by_day.get((staff_id, d), []):
+                other_length = other['slots'][0][2]
+                if (_weight(other['job']) > _weight(job)
+                        or other_length >= stuck.get(other['role'], float('inf'))
+                        or other_length + planner.capacity(staff_id, d) < length):
+                    continue
+                if budget['moves'] <= 0:
+                    return None
+                budget['moves'] -= 1
+                placed = _evict(planner, job, role, length, other, staff_by_role, stuck)
+                if placed:
+                    return placed, other, (staff_id, d)
+    return None
+
+
+def _evict(planner, job, role, length, other, staff_by_role, stuck):
+    """Put job where other is and move other to its earliest other fit, or undo"""
+    staff_id, (d, other_start, other_length) = other['staff_id'], other['slots'][0]
+    planner.release(staff_id, d, other_start, other_length)
+    start = planner.fits(staff_id, d, length)
+    if start is not None:
+        planner.reserve(staff_id, d, start, length)
+        best = None
+        for candidate in staff_by_role[other['role']]:
+            placement = planner.place(candidate, [other_length])
+            if placement and (best is None or placement[0][0] < best[1][0][0]):
+                best = (candidate, placement)
+        if best is not None:
+            candidate, [(new_day, new_start)] = best
+            planner.reserve(candidate, new_day, new_start, other_length)
+            other['staff_id'], other['slots'] = candidate, [[new_day, new_start, other_length]]
+            return {'job': job, 'role': role, 'staff_id': staff_id, 'slots': [[d, start, length]]}
+        stuck[other['role']] = min(other_length, stuck.get(other['role'], other_length))
+        planner.release(staff_id, d, start, length)
+    planner.reserve(staff_id, d, other_start, other_length)
+    return None
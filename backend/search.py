@@ -0,0 +1,280 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+
+# How much a match in each customer field counts towards the ranking
+FIELD_WEIGHTS = {'name': 3.0, 'email': 2.0, 'phone': 2.0, 'postcode': 2.0, 'address': 1.0}
+EXACT, PREFIX, FUZZY = 1.0, 0.6, 0.4
+# A one-letter prefix can expand to much of the vocabulary; stop after this many terms
+MAX_EXPANSIONS = 200
+# Words shorter than this are only matched exactly or by prefix
+FUZZY_MIN_LENGTH = 4
+
+WORD = re.compile(r'[a-z0-9]+')
+PHONE = re.compile(r'^\+?[\d\s().-]{5,}$')
+
+
+def field_tokens(field, value):
+    """Index terms for one field of a customer"""
+    text = str(value).lower()
+    if field == 'phone':
+        digits = re.sub(r'\D', '', text)
+        tokens = {digits} if digits else set()
+        if digits.startswith('44'):
+            # +44 7700 900123 should be found by 07700...
+            tokens.add('0' + digits[2:])
+        return tokens
+    tokens = set(WORD.findall(text))
+    if field == 'postcode' and len(tokens) > 1:
+        tokens.add(''.join(WORD.findall(text)))
+    if field == 'email' and text:
+        tokens.add(text)
+    return tokens
+
+
+def query_terms(query):
+    """Split a search string into terms; phone numbers stay whole"""
+    query = query.strip().lower()
+    if PHONE.match(query):
+        return [re.sub(r'\D', '', query)]
+    terms = WORD.findall(query)
+    if '@' in query:
+        terms.append(query)
+    return terms
+
+
+def deletes(term):
+    """The term with each single character removed"""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def within_one_edit(a, b):
+    """True if a and b differ by at most one insert, delete, substitution or transposition"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i + 1:] or (
+        i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:])
+
+
+class SortedTerms:
+    """A sorted collection of strings kept as a list of bounded sorted chunks.
+
+    Inserting into one flat sorted list moves every later element, which
+    adds up to seconds when hundreds of thousands of terms arrive one by
+    one; here an insert only shifts within its chunk.
+    """
+
+    CHUNK = 1000
+
+    def __init__(self, terms=()):
+        terms = sorted(terms)
+        self._chunks = [terms[i:i + self.CHUNK] for i in range(0, len(terms), self.CHUNK)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+
+    def add(self, term):
+        if not self._chunks:
+            self._chunks.append([term])
+            self._maxes.append(term)
+            return
+        i = min(bisect_left(self._maxes, term), len(self._chunks) - 1)
+        chunk = self._chunks[i]
+        insort(chunk, term)
+        self._maxes[i] = chunk[-1]
+        if len(chunk) > 2 * self.CHUNK:
+            self._chunks[i:i + 1] = [chunk[:self.CHUNK], chunk[self.CHUNK:]]
+            self._maxes[i:i + 1] = [chunk[self.CHUNK - 1], chunk[-1]]
+
+    def remove(self, term):
+        i = bisect_left(self._maxes, term)
+        chunk = self._chunks[i]
+        del chunk[bisect_left(chunk, term)]
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i], self._maxes[i]
+
+    def starting_with(self, prefix, limit):
+        """Yield up to limit terms that start with prefix, in order"""
+        i = bisect_left(self._maxes, prefix)
+        while i < len(self._chunks) and limit > 0:
+            chunk = self._chunks[i]
+            for term in chunk[bisect_left(chunk, prefix):]:
+                if not term.startswith(prefix) or limit <= 0:
+                    return
+                yield term
+                limit -= 1
+            i += 1
+
+
+class CustomerSearchIndex:
+    """Inverted index over customer names, emails, phones, postcodes and addresses.
+
+    Each term maps to the customers containing it, with the weight of the
+    best field it appears in. A sorted vocabulary answers prefix lookups by
+    bisecting, and alphabetic terms are also filed under each of their
+    one-character deletions, so a misspelt query term finds terms within
+    one edit by looking up its own deletions rather than comparing against
+    the whole vocabulary. Every query term has to match; a customer's score
+    sums each term's best match, exact above prefix above fuzzy. Like the
+    other views it is kept current from store writes, which arrive with the
+    writer lock held, and searches run under the same lock.
+    """
+
+    def __init__(self, customers, fields=FIELD_WEIGHTS):
+        self._customers = customers
+        self._fields = fields
+        self._lock = customers.lock
+        self.rebuild()
+        customers.subscribe(self._on_customer)
+
+    def rebuild(self):
+        """Re-index every customer in the store"""
+        with self._lock:
+            self._postings = {}   # term -> {customer id: weight}
+            self._terms = {}      # customer id -> {term: weight}
+            self._vocabulary = None
+            self._fuzzy = {}      # term or one of its deletions -> {term}
+            for customer in self._customers.all():
+                self._add(customer)
+            self._vocabulary = SortedTerms(self._postings)
+
+    def _on_customer(self, action, old, new):
+        if old is not None:
+            self._remove(old)
+        if new is not None:
+            self._add(new)
+
+    def _index_terms(self, customer):
+        terms = {}
+        for field, weight in self._fields.items():
+            value = customer.get(field)
+            if value in (None, ''):
+                continue
+            for term in field_tokens(field, value):
+                if weight > terms.get(term, 0):
+                    terms[term] = weight
+        return terms
+
+    def _add(self, customer):
+        terms = self._index_terms(customer)
+        if not terms:
+            return
+        customer_id = customer['id']
+        self._terms[customer_id] = terms
+        for term, weight in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._add_term(term)
+            postings[customer_id] = weight
+
+    def _remove(self, customer):
+        terms = self._terms.pop(customer['id'], None)
+        for term in terms or ():
+            postings = self._postings[term]
+            postings.pop(customer['id'], None)
+            if not postings:
+                del self._postings[term]
+                self._remove_term(term)
+
+    @staticmethod
+    def _fuzzy_keys(term):
+        if len(term) < FUZZY_MIN_LENGTH or not term.isalpha():
+            return ()
+        return {term} | deletes(term)
+
+    def _add_term(self, term):
+        if self._vocabulary is not None:
+            self._vocabulary.add(term)
+        for key in self._fuzzy_keys(term):
+            self._fuzzy.setdefault(key, set()).add(term)
+
+    def _remove_term(self, term):
+        self._vocabulary.remove(term)
+        for key in self._fuzzy_keys(term):
+            similar = self._fuzzy[key]
+            similar.discard(term)
+            if not similar:
+                del self._fuzzy[key]
+
+    def _expand(self, term):
+        """Return {index term: match quality} for a query term"""
+        matches = {}
+        for candidate in self._vocabulary.starting_with(term, MAX_EXPANSIONS):
+            matches[candidate] = EXACT if candidate == term else PREFIX
+        for key in self._fuzzy_keys(term):
+            for candidate in self._fuzzy.get(key, ()):
+                if candidate not in matches and within_one_edit(term, candidate):
+                    matches[candidate] = FUZZY
+        return matches
+
+    @staticmethod
+    def _term_scores(matches, within=None):
+        """{customer id: best weighted match} over one query term's matching index terms.
+
+        Given within, only those customers are looked up.
+        """
+        if within is None and len(matches) == 1 and matches[0][1] == EXACT:
+            return matches[0][0]
+        term_scores = {}
+        for postings, quality in sorted(matches, key=lambda match: match[1], reverse=True):
+            if within is not None:
+                postings = {customer_id: postings[customer_id] for customer_id in within if customer_id in postings}
+            if not term_scores:
+                term_scores = {customer_id: weight * quality for customer_id, weight in postings.items()}
+                continue
+            for customer_id, weight in postings.items():
+                score = weight * quality
+                if score > term_scores.get(customer_id, 0):
+                    term_scores[customer_id] = score
+        return term_scores
+
+    def search(self, query, limit=20, accept=None):
+        """Return up to limit customers matching query, best first.
+
+        accept, if given, is called with each matching record and decides
+        whether it is kept, so filters apply before the limit.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            # Start from the rarest term; later terms only have to check the
+            # customers still in the running
+            expansions = sorted(
+                ([(self._postings[t], quality) for t, quality in self._expand(term).items()] for term in terms),
+                key=lambda matches: sum(len(postings) for postings, _ in matches))
+            scores = None
+            for matches in expansions:
+                if scores is None or sum(len(p) for p, _ in matches) <= len(scores) * len(matches):
+                    term_scores = self._term_scores(matches)
+                else:
+                    term_scores = self._term_scores(matches, within=scores)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {customer_id: score + term_scores[customer_id]
+                              for customer_id, score in scores.items() if customer_id in term_scores}
+                if not scores:
+                    return []
+            if accept is None:
+                ranked = heapq.nlargest(limit, scores, key=scores.__getitem__)
+            else:
+                ranked = sorted(scores, key=scores.__getitem__, reverse=True)
+        results = []
+        for customer_id in ranked:
+            record = self._customers.get(customer_id)
+            if record and (accept is None or accept(record)):
+                results.append(record)
+                if len(results) >= limit:
+                    break
+        return results
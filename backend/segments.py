@@ -0,0 +1,153 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import islice
+
+# Widths of single units in a run (mm), and of whole runs they can add up to
+SEGMENT_RANGE = (150, 1200)
+RUN_RANGE = (300, 7200)
+MAX_SEGMENTS = 6
+# OCR and rounding on the drawing can leave a chain a millimetre or two off its total
+SUM_TOLERANCE = 2
+# Combinations looked at per total and in all, and suggestions returned
+MAX_PER_TARGET = 5
+MAX_COMBINATIONS = 1000
+MAX_RESULTS = 10
+
+
+def in_range(sorted_numbers, low, high):
+    """The numbers between low and high inclusive, from an ascending list"""
+    return sorted_numbers[bisect_left(sorted_numbers, low):bisect_right(sorted_numbers, high)]
+
+
+def _window(low, high):
+    """Bitset of the sums from low to high"""
+    low = max(low, 0)
+    if high < low:
+        return 0
+    return ((1 << (high - low + 1)) - 1) << low
+
+
+class SegmentSums:
+    """Which totals k segments can add up to, for a multiset of segment widths.
+
+    reach[i][k] is a bitset (a Python int) with bit s set when k of the
+    widths from the i-th distinct value on sum to s, each value used at
+    most as often as it was read. That is a bounded subset-sum table
+    built with shifts and ors on whole bitsets rather than sum by sum, so
+    checking a total is one AND, and combinations are read back by walking
+    only the branches the table says can still reach it.
+    """
+
+    def __init__(self, widths, max_parts=MAX_SEGMENTS, limit=RUN_RANGE[1] + SUM_TOLERANCE):
+        self.values = sorted(Counter(widths).items())
+        self.widths = [value for value, _ in self.values]
+        self.max_parts = max_parts
+        mask = (1 << (limit + 1)) - 1
+        empty = [1] + [0] * max_parts
+        self.reach = [None] * len(self.values) + [empty]
+        for i in range(len(self.values) - 1, -1, -1):
+            value, count = self.values[i]
+            after = self.reach[i + 1]
+            row = list(after)
+            for k in range(1, max_parts + 1):
+                for c in range(1, min(count, k) + 1):
+                    row[k] |= (after[k - c] << (c * value)) & mask
+            self.reach[i] = row
+
+    def reachable(self, k, low, high):
+        return bool(self.reach[0][k] & _window(low, high))
+
+    def combinations(self, k, low, high, i=0):
+        """Yield k widths (ascending) summing to between low and high, most repeated values first"""
+        widths = self.widths
+        # This width is the smallest of the k, and the rest are at most the widest
+        first = max(i, bisect_left(widths, low - (k - 1) * widths[-1]))
+        last = bisect_right(widths, high // k)
+        if k == 1:
+            for j in range(first, last):
+                yield [widths[j]]
+            return
+        for j in range(first, last):
+            if not self.reach[j][k] & _window(low, high):
+                return      # reach[j + 1:] only cover fewer values
+            value, count = self.values[j]
+            for c in range(min(count, k), 0, -1):
+                rest_low, rest_high = low - c * value, high - c * value
+                if c == k:
+                    if rest_low <= 0 <= rest_high:
+                        yield [value] * c
+                elif self.reach[j + 1][k - c] & _window(rest_low, rest_high):
+                    for rest in self.combinations(k - c, rest_low, rest_high, j + 1):
+                        yield [value] * c + rest
+
+
+def segmented_widths(numbers, tolerance=SUM_TOLERANCE, max_parts=MAX_SEGMENTS, limit=MAX_RESULTS):
+    """Rank ways 2 to max_parts unit widths read off a drawing add up to a run width also read off it.
+
+    numbers are in the order OCR read them. A chain of widths printed one
+    after another with its total beside it counts for most, then a chain
+    alone, then how alike the units are (kitchens repeat standard widths),
+    then how exactly they hit the total.
+    """
+    ints = [int(round(n)) for n in numbers]
+    ordered = sorted(ints)
+    widths = in_range(ordered, *SEGMENT_RANGE)
+    if len(widths) < 2:
+        return []
+    targets = sorted(set(in_range(ordered, *RUN_RANGE)))
+
+    # Chains of segment-sized numbers printed one after another that add up
+    # to a total; there are few, so they're all checked directly
+    found = {}   # (target, segments) -> 0 apart, 1 a chain, 2 a chain with its total beside it
+    for start in range(len(ints)):
+        run = []
+        for end in range(start, min(start + max_parts, len(ints))):
+            if not SEGMENT_RANGE[0] <= ints[end] <= SEGMENT_RANGE[1]:
+                break
+            run.append(ints[end])
+            if len(run) < 2:
+                continue
+            total, chain = sum(run), tuple(sorted(run))
+            beside = [ints[i] for i in (start - 1, end + 1) if 0 <= i < len(ints)]
+            for target in in_range(targets, total - tolerance, total + tolerance):
+                found[target, chain] = max(found.get((target, chain), 0), 1 + (target in beside))
+
+    # Then any other combinations, fewest segments first, within a budget
+    sums = SegmentSums(widths, max_parts)
+    budget = MAX_COMBINATIONS
+    for target in reversed(targets):
+        low, high = target - tolerance, target + tolerance
+        wanted = min(MAX_PER_TARGET, budget)
+        for k in range(2, max_parts + 1):
+            if wanted <= 0:
+                break
+            if not sums.reachable(k, low, high):
+                continue
+            for segments in islice(sums.combinations(k, low, high), wanted):
+                found.setdefault((target, tuple(segments)), 0)
+                wanted -= 1
+                budget -= 1
+        if budget <= 0:
+            break
+
+    def score(item):
+        (target, segments), adjacency = item
+        uniformity = segments[0] / segments[-1]
+        return 2 * adjacency + uniformity - 0.5 * abs(sum(segments) - target) / (tolerance + 1)
+
+    results = []
+    for item in heapq.nlargest(limit, found.items(), key=score):
+        (target, segments), adjacency = item
+        segments = list(segments)
+        total = sum(segments)
+        results.append({
+            'segments': segments,
+            'total': total,
+            'target': target,
+            'consecutive': adjacency > 0,
+            'labelled': adjacency > 1,
+            'score': round(score(item), 3),
+            'description': f"{'+'.join(map(str, segments))}={total}",
+        })
+    return results
@@ -0,0 +1,368 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from records import plain
+from store import BaseStore, Range, filter_records
+
+# Record fields copied into their own indexed columns so they can be filtered
+# in SQL; the full record is kept as JSON in `data`.
+INDEXED_FIELDS = {
+    'customers': ['stage', 'status'],
+    'jobs': ['customer_id', 'stage'],
+    'assignments': ['customer_id', 'job_id', 'staff_id', 'status', 'date'],
+}
+
+# Changes other processes may not have replayed yet are kept for this many
+# writes; a process further behind rebuilds its views from the tables
+CHANGE_RETENTION = int(os.getenv('CRM_CHANGE_RETENTION', '10000'))
+
+
+class Database:
+    """A SQLite file shared by the CRM stores.
+
+    Each thread gets its own connection, opened on first use and reused for
+    the life of the thread. Connections run in WAL mode so readers never
+    block the writer, and keep a statement cache so the fixed SQL strings
+    used by the stores are compiled once per connection.
+
+    Several processes can share the file. Every write is also appended to
+    a changes table, with the record before and after, under an increasing
+    seq; each process remembers the last seq it has applied, and replay()
+    passes newer changes to the attached stores' listeners, so derived
+    views stay current without being rebuilt. Write transactions replay
+    first, so local writes always land on an up-to-date view. A process
+    that falls more than CHANGE_RETENTION writes behind calls the
+    on_reset() listeners to rebuild instead.
+
+    The stores' own writes reach their listeners through notify(), which
+    holds them until the outermost transaction is about to commit, so a
+    batch that rolls back never shows in the views; a listener that fails
+    then rolls the whole transaction back.
+    """
+
+    def __init__(self, path, retention=CHANGE_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._stores = {}
+        self._reset_listeners = []
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                     'collection TEXT NOT NULL, action TEXT NOT NULL, old TEXT, new TEXT)')
+        for table, fields in INDEXED_FIELDS.items():
+            self._create_table(conn, table, fields)
+        self.seq = self._last_seq(conn)   # last change applied in this process
+        conn.execute('COMMIT')
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def attach(self, table, store):
+        """Route replayed changes to table through store's listeners"""
+        self._stores[table] = store
+
+    def on_reset(self, listener):
+        """Call listener() to rebuild from the tables when changes were missed"""
+        self._reset_listeners.append(listener)
+
+    @contextmanager
+    def _read(self, conn):
+        """Read transaction: every statement in it sees the same snapshot"""
+        conn.execute('BEGIN')
+        try:
+            yield
+        finally:
+            conn.execute('COMMIT')
+
+    @contextmanager
+    def snapshot(self):
+        """Read the tables as of one moment, e.g. to build views from,
+        counting every change until then as applied"""
+        conn = self.connection()
+        with self._read(conn):
+            self.seq = self._last_seq(conn)
+            yield conn
+
+    @contextmanager
+    def transaction(self):
+        """Run a block in one write transaction on this thread's connection.
+
+        Call it holding the attached stores' writer lock.
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            # Already inside an outer transaction; let it commit
+            yield conn
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.last_change = None
+        self._local.notifications = queued = []
+        notified = []
+        try:
+            self._replay(conn)
+            yield conn
+            for notification in queued:
+                store, action, old, new = notification
+                store._notify(action, old, new)
+                notified.append(notification)
+            conn.execute('COMMIT')
+        except BaseException:
+            # Take back what the views were told of a write that won't stick
+            for store, action, old, new in reversed(notified):
+                store._undo(store._listeners, action, old, new)
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            self._local.notifications = None
+        if self._local.last_change is not None:
+            # Writers are serialized and this one replayed first, so its
+            # changes are the latest
+            self.seq = self._local.last_change
+
+    def notify(self, store, action, old, new):
+        """Pass a write in the current transaction to store's listeners once it is about to commit"""
+        self._local.notifications.append((store, action, old, new))
+
+    def record_change(self, conn, table, action, old, new):
+        """Append a write (old and new as JSON text) to the changes table"""
+        seq = conn.execute('INSERT INTO changes (collection, action, old, new) VALUES (?, ?, ?, ?)',
+                           (table, action, old, new)).lastrowid
+        self._local.last_change = seq
+        if seq % 1000 == 0:
+            conn.execute('DELETE FROM changes WHERE seq <= ?', (seq - self.retention,))
+
+    @staticmethod
+    def _last_seq(conn):
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return row[0] if row else 0
+
+    def changed_elsewhere(self):
+        """True if another process has written since this one last replayed.
+
+        Takes no lock, so requests can check cheaply before taking one.
+        """
+        return self._last_seq(self.connection()) != self.seq
+
+    def replay(self):
+        """Apply other processes' changes since the last replay.
+
+        Call it holding the attached stores' writer lock.
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            self._replay(conn)
+            return
+        with self._read(conn):
+            self._replay(conn)
+
+    def _replay(self, conn):
+        rows = conn.execute('SELECT seq, collection, action, old, new FROM changes WHERE seq > ? ORDER BY seq',
+                            (self.seq,))
+        first = rows.fetchone()
+        if first is None:
+            return
+        if first[0] != self.seq + 1:
+            # Changes were pruned before this process saw them
+            self.seq = self._last_seq(conn)
+            for listener in self._reset_listeners:
+                listener()
+            return
+        for seq, table, action, old, new in itertools.chain([first], rows):
+            store = self._stores.get(table)
+            if store is not None:
+                store._notify(action, old and json.loads(old), new and json.loads(new))
+            self.seq = seq
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    @staticmethod
+    def _create_table(conn, table, fields):
+        columns = ''.join(f', {f} TEXT' for f in fields)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ('
+                     f'seq INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE{columns}, data TEXT NOT NULL)')
+        for field in fields:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{field} ON {table} ({field})')
+
+
+class SQLiteStore(BaseStore):
+    """Records of one collection kept in a SQLite table.
+
+    Same interface as store.RecordStore. Listing follows insertion order
+    (the seq column); re-adding an existing id replaces it in place. Each
+    write holds the writer lock and one SQLite transaction, and is logged to
+    the database's changes table for other processes to replay; reads go
+    straight to this thread's connection and see the last committed state.
+    Listeners hear of a write when its outermost transaction commits.
+    """
+
+    def __init__(self, db, table, lock=None):
+        super().__init__(lock)
+        self.db = db
+        self.table = table
+        self.fields = INDEXED_FIELDS[table]
+        columns = ', '.join(['id'] + self.fields + ['data'])
+        params = ', '.join('?' * (len(self.fields) + 2))
+        updates = ', '.join(f'{c} = excluded.{c}' for c in self.fields + ['data'])
+        self._sql_get = f'SELECT data FROM {table} WHERE id = ?'
+        self._sql_all = f'SELECT data FROM {table} ORDER BY seq'
+        self._sql_count = f'SELECT COUNT(*) FROM {table}'
+        self._sql_upsert = (f'INSERT INTO {table} ({columns}) VALUES ({params}) '
+                            f'ON CONFLICT(id) DO UPDATE SET {updates}')
+        self._sql_delete = f'DELETE FROM {table} WHERE id = ?'
+        db.attach(table, self)
+
+    def __len__(self):
+        return self.db.connection().execute(self._sql_count).fetchone()[0]
+
+    def __contains__(self, record_id):
+        return self.get(record_id) is not None
+
+    @contextmanager
+    def transaction(self):
+        with self.lock, self.db.transaction() as conn:
+            yield conn
+
+    def _row(self, record, data):
+        return [record['id']] + [self._column(record.get(f)) for f in self.fields] + [data]
+
+    def _get_data(self, record_id):
+        row = self.db.connection().execute(self._sql_get, (record_id,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _column(value):
+        return None if value is None else str(value)
+
+    def all(self):
+        """Return all records in insertion order"""
+        rows = self.db.connection().execute(self._sql_all)
+        return [json.loads(data) for (data,) in rows]
+
+    def _where(self, criteria):
+        """SQL clauses and params for the indexed fields in criteria"""
+        clauses, params = [], []
+        for field, expected in criteria.items():
+            if field not in self.fields:
+                continue
+            if isinstance(expected, (list, tuple, set, frozenset)):
+                clauses.append(f"{field} IN ({', '.join('?' * len(expected))})")
+                params.extend(self._column(v) for v in expected)
+            elif isinstance(expected, Range):
+                if expected.low is not None:
+                    clauses.append(f'{field} >= ?')
+                    params.append(expected.low)
+                if expected.high is not None:
+                    clauses.append(f'substr({field}, 1, {len(expected.high)}) <= ?')
+                    params.append(expected.high)
+            elif expected is None:
+                clauses.append(f'{field} IS NULL')
+            else:
+                clauses.append(f'{field} = ?')
+                params.append(self._column(expected))
+        return clauses, params
+
+    def find(self, **criteria):
+        """Return records whose fields match criteria, in insertion order
+
+        Indexed fields are filtered in SQL, any others in Python.
+        """
+        clauses, params = self._where(criteria)
+        sql = f'SELECT data FROM {self.table}'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        rows = self.db.connection().execute(sql + ' ORDER BY seq', params)
+        records = [json.loads(data) for (data,) in rows]
+        # Indexed columns hold text, so re-check values like integer staff ids
+        return filter_records(records, criteria)
+
+    def page(self, after=None, limit=None, **criteria):
+        """Return (records, cursor) for matching records after a cursor.
+
+        The cursor is the seq of the last record returned, or None when
+        there is nothing after this page.
+        """
+        clauses, params = self._where(criteria)
+        clauses.insert(0, 'seq > ?')
+        params.insert(0, after or 0)
+        rows = self.db.connection().execute(
+            f"SELECT seq, data FROM {self.table} WHERE {' AND '.join(clauses)} ORDER BY seq", params)
+        page, seqs = [], []
+        while True:
+            chunk = rows.fetchmany(max(limit or 0, 100) + 1)
+            if not chunk:
+                return page, None
+            for seq, data in chunk:
+                record = json.loads(data)
+                if criteria and not filter_records([record], criteria):
+                    continue
+                if limit is not None and len(page) == limit:
+                    return page, seqs[-1]
+                page.append(record)
+                seqs.append(seq)
+
+    def get(self, record_id):
+        data = self._get_data(record_id)
+        return json.loads(data) if data else None
+
+    def add(self, record):
+        data = json.dumps(record, default=plain)
+        with self.lock:
+            with self.db.transaction() as conn:
+                old_data = self._get_data(record['id'])
+                action = 'update' if old_data else 'create'
+                conn.execute(self._sql_upsert, self._row(record, data))
+                self.db.record_change(conn, self.table, action, old_data, data)
+                self.db.notify(self, action, old_data and json.loads(old_data), record)
+        return record
+
+    def update(self, record_id, data):
+        """Merge data into a record and touch updated_at; None if missing"""
+        with self.lock:
+            with self.db.transaction() as conn:
+                old_data = self._get_data(record_id)
+                if old_data is None:
+                    return None
+                old = json.loads(old_data)
+                record = self._merge(old, data)
+                new_data = json.dumps(record, default=plain)
+                conn.execute(self._sql_upsert, self._row(record, new_data))
+                self.db.record_change(conn, self.table, 'update', old_data, new_data)
+                self.db.notify(self, 'update', old, record)
+        return record
+
+    def delete(self, record_id):
+        """Remove a record; returns it, or None if it did not exist"""
+        with self.lock:
+            with self.db.transaction() as conn:
+                old_data = self._get_data(record_id)
+                if old_data is not None:
+                    conn.execute(self._sql_delete, (record_id,))
+                    self.db.record_change(conn, self.table, 'delete', old_data, None)
+                old = old_data and json.loads(old_data)
+                if old is not None:
+                    self.db.notify(self, 'delete', old, None)
+        return old
+
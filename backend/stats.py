@@ -0,0 +1,166 @@
+from collections import Counter
+from datetime import date
+
+from schedule_index import date_range
+
+
+def to_hours(value):
+    """estimated_hours as a number; the frontend sends numbers or strings"""
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def iso_week(day):
+    """'2030-W02' for an ISO date string, or None if it isn't one"""
+    try:
+        year, week, _ = date.fromisoformat(str(day)).isocalendar()
+    except ValueError:
+        return None
+    return f"{year}-W{week:02d}"
+
+
+def _count(counter, key, sign):
+    if key is None:
+        return
+    try:
+        counter[key] += sign
+    except TypeError:
+        # Bodies are validated, but records stored before that may hold lists
+        return
+    if not counter[key]:
+        del counter[key]
+
+
+class StatsView:
+    """Dashboard aggregates, kept current from customer, job and assignment writes.
+
+    Each write moves the counters of the record it replaces out and the new
+    record's in, so serving /stats reads counters whose size depends on the
+    number of distinct stages, staff and days rather than on the number of
+    records. Hours follow the scheduler's overbooking rule and count only
+    'job' assignments. Updates arrive with the stores' shared writer lock
+    held, and snapshots are taken under it.
+    """
+
+    def __init__(self, customers, jobs, assignments):
+        self._stores = {'customers': customers, 'jobs': jobs, 'assignments': assignments}
+        self._lock = customers.lock
+        self.rebuild()
+        customers.subscribe(self._on_customer)
+        jobs.subscribe(self._on_job)
+        assignments.subscribe(self._on_assignment)
+
+    def rebuild(self):
+        """Recount every record in the stores"""
+        with self._lock:
+            self._totals = Counter()
+            self._customer_stages = Counter()
+            self._customer_statuses = Counter()
+            self._job_stages = Counter()
+            self._job_types = Counter()
+            self._job_type_stages = Counter()  # (job_type, stage) -> count
+            self._assignment_statuses = Counter()
+            self._assignment_types = Counter()
+            self._day_hours = {}           # staff -> {date: hours}
+            self._week_hours = {}          # staff -> {week: hours}
+            for name, handler in (('customers', self._on_customer), ('jobs', self._on_job),
+                                  ('assignments', self._on_assignment)):
+                for record in self._stores[name].all():
+                    handler('create', None, record)
+
+    def _on_customer(self, action, old, new):
+        for record, sign in ((old, -1), (new, 1)):
+            if record is not None:
+                self._totals['customers'] += sign
+                _count(self._customer_stages, record.get('stage'), sign)
+                _count(self._customer_statuses, record.get('status'), sign)
+
+    def _on_job(self, action, old, new):
+        for record, sign in ((old, -1), (new, 1)):
+            if record is None:
+                continue
+            self._totals['jobs'] += sign
+            _count(self._job_stages, record.get('stage'), sign)
+            job_type = record.get('job_type')
+            if job_type is not None:
+                _count(self._job_types, job_type, sign)
+                _count(self._job_type_stages, (job_type, record.get('stage')), sign)
+
+    def _on_assignment(self, action, old, new):
+        for record, sign in ((old, -1), (new, 1)):
+            if record is None:
+                continue
+            self._totals['assignments'] += sign
+            _count(self._assignment_statuses, record.get('status'), sign)
+            _count(self._assignment_types, record.get('type'), sign)
+            self._add_hours(record, sign)
+
+    def _add_hours(self, assignment, sign):
+        staff_id, day = assignment.get('staff_id'), assignment.get('date')
+        hours = to_hours(assignment.get('estimated_hours'))
+        if assignment.get('type') != 'job' or staff_id is None or not day or not hours:
+            return
+        staff_id = str(staff_id)
+        for totals, key in ((self._day_hours, str(day)), (self._week_hours, iso_week(day))):
+            if key is None:
+                continue
+            staff_totals = totals.setdefault(staff_id, {})
+            total = staff_totals.get(key, 0) + sign * hours
+            # Adding and removing floats can leave dust behind
+            if abs(total) < 1e-9:
+                staff_totals.pop(key, None)
+                if not staff_totals:
+                    del totals[staff_id]
+            else:
+                staff_totals[key] = total
+
+    def snapshot(self, date_from=None, date_to=None):
+        """Return the aggregates, with hours limited to days and weeks between two ISO dates"""
+        if date_from and date_to:
+            # Look up just the days and weeks asked for instead of sorting every staff member's history
+            days = list(date_range(date_from, date_to))
+            weeks = sorted({iso_week(day) for day in days})
+        else:
+            days = weeks = None
+
+        def hours(totals, keys, lo, hi):
+            result = {}
+            for staff_id, staff_totals in totals.items():
+                if keys is not None:
+                    in_range = {key: round(staff_totals[key], 2) for key in keys if key in staff_totals}
+                else:
+                    in_range = {key: round(value, 2) for key, value in sorted(staff_totals.items())
+                                if (lo is None or key >= lo) and (hi is None or key <= hi)}
+                if in_range:
+                    result[staff_id] = in_range
+            return result
+
+        with self._lock:
+            job_types = {job_type: {'total': count, 'stage': {}} for job_type, count in self._job_types.items()}
+            for (job_type, stage), count in self._job_type_stages.items():
+                if stage is not None:
+                    job_types[job_type]['stage'][stage] = count
+            return {
+                'customers': {
+                    'total': self._totals['customers'],
+                    'stage': dict(self._customer_stages),
+                    'status': dict(self._customer_statuses),
+                },
+                'jobs': {
+                    'total': self._totals['jobs'],
+                    'stage': dict(self._job_stages),
+                    'job_type': job_types,
+                },
+                'assignments': {
+                    'total': self._totals['assignments'],
+                    'status': dict(self._assignment_statuses),
+                    'type': dict(self._assignment_types),
+                },
+                'hours': {
+                    'by_day': hours(self._day_hours, days, date_from, date_to),
+                    'by_week': hours(self._week_hours, weeks, date_from and iso_week(date_from),
+                                     date_to and iso_week(date_to)),
+                },
+            }
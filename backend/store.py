@@ -0,0 +1,238 @@
+import threading
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+
+from records import compact
+
+
+class Range:
+    """Criteria value matching low <= value <= high; either end may be open.
+
+    Values are compared as strings, and high only against the same-length
+    prefix, so a date like '2024-05-01' includes any timestamp on that day.
+    """
+
+    def __init__(self, low=None, high=None):
+        self.low = low
+        self.high = high
+
+    def __contains__(self, value):
+        if value is None:
+            return False
+        value = str(value)
+        if self.low is not None and value < self.low:
+            return False
+        if self.high is not None and value[:len(self.high)] > self.high:
+            return False
+        return True
+
+
+def filter_records(records, criteria):
+    """Return the records whose fields match criteria.
+
+    A list, tuple or set value matches any of its members, a Range matches
+    values inside it, and anything else must be equal.
+    """
+    for field, expected in criteria.items():
+        if isinstance(expected, (list, tuple, set, frozenset)):
+            expected = set(expected)
+            records = [r for r in records if r.get(field) in expected]
+        elif isinstance(expected, Range):
+            records = [r for r in records if r.get(field) in expected]
+        else:
+            records = [r for r in records if r.get(field) == expected]
+    return list(records)
+
+
+class BaseStore:
+    """Locking and listener plumbing shared by the record stores.
+
+    Writes hold self.lock, a re-entrant writer lock that stores feeding the
+    same derived views should share, so each write and the listener updates
+    it triggers happen as one step. Reads take no lock: records are never
+    mutated once stored (updates store a new record), so a reader holding a
+    record or a list of them sees a consistent snapshot.
+
+    Listeners registered with subscribe() are called after every write, with
+    the lock held, as listener(action, old, new), where action is 'create',
+    'update' or 'delete' and old/new are the record before and after (None
+    when absent). If a listener raises, the listeners already called are
+    given the reverse change and the store undoes the write, so views never
+    keep half of one.
+    """
+
+    def __init__(self, lock=None):
+        self.lock = lock or threading.RLock()
+        self._listeners = []
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, action, old, new):
+        """Call the listeners; if one raises, reverse the change in those already called and re-raise"""
+        called = 0
+        try:
+            for listener in self._listeners:
+                listener(action, old, new)
+                called += 1
+        except BaseException:
+            self._undo(self._listeners[:called], action, old, new)
+            raise
+
+    @staticmethod
+    def _undo(listeners, action, old, new):
+        undo = {'create': 'delete', 'update': 'update', 'delete': 'create'}[action]
+        for listener in reversed(listeners):
+            listener(undo, new, old)
+
+    @contextmanager
+    def transaction(self):
+        """Group several writes under the writer lock"""
+        with self.lock:
+            yield
+
+    def filter(self, predicate):
+        """Return records matching predicate, in insertion order"""
+        return [r for r in self.all() if predicate(r)]
+
+    @staticmethod
+    def _changes(data):
+        # The id is the storage key, so it can't be changed through an update
+        changes = {k: v for k, v in data.items() if k != 'id'}
+        changes['updated_at'] = datetime.now().isoformat()
+        return changes
+
+    def _merge(self, old, data):
+        return {**old, **self._changes(data)}
+
+
+class RecordStore(BaseStore):
+    """In-memory records keyed by id, kept in insertion order.
+
+    Lookups, updates and deletes are O(1) dict operations; listing walks the
+    dict, which preserves insertion order. Records are held as read-only
+    records.CompactRecord objects, and updates replace the stored record
+    rather than mutating it, so listeners can keep references to records
+    they have seen.
+
+    Every record also gets an increasing sequence number, used as the
+    keyset cursor by page(). The order is kept as two parallel columns, an
+    array of sequence numbers and a list of ids, rather than a tuple per
+    record. Deleted entries are left in them and skipped until enough of
+    them pile up to be worth compacting.
+    """
+
+    def __init__(self, records=None, lock=None):
+        super().__init__(lock)
+        self._records = {}
+        self._seqs = {}        # id -> seq
+        self._order = (array('q'), [])  # (seqs ascending, ids)
+        self._next_seq = 1
+        for record in records or []:
+            self.add(record)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, record_id):
+        return record_id in self._records
+
+    def all(self):
+        """Return all records in insertion order"""
+        return list(self._records.values())
+
+    def find(self, **criteria):
+        """Return records whose fields match criteria, in insertion order"""
+        return filter_records(list(self._records.values()), criteria)
+
+    def page(self, after=None, limit=None, **criteria):
+        """Return (records, cursor) for matching records after a cursor.
+
+        The cursor is the sequence number of the last record returned, or
+        None when there is nothing after this page.
+        """
+        # Writers append the id before its seq, or swap in compacted
+        # columns, so a reader keeps walking the columns it started with
+        # and never reads past the seqs it has seen
+        seqs, ids = self._order
+        start = bisect_left(seqs, after + 1) if after is not None else 0
+        page, cursors = [], []
+        for i in range(start, len(seqs)):
+            seq, record_id = seqs[i], ids[i]
+            record = self._records.get(record_id)
+            if record is None or self._seqs.get(record_id) != seq:
+                continue
+            if criteria and not filter_records([record], criteria):
+                continue
+            if limit is not None and len(page) == limit:
+                return page, cursors[-1]
+            page.append(record)
+            cursors.append(seq)
+        return page, None
+
+    def get(self, record_id):
+        return self._records.get(record_id)
+
+    def add(self, record):
+        record = compact(record)
+        record_id = record['id']
+        with self.lock:
+            old = self._records.get(record_id)
+            if old is None:
+                self._seqs[record_id] = self._next_seq
+                seqs, ids = self._order
+                ids.append(record_id)
+                seqs.append(self._next_seq)
+                self._next_seq += 1
+            self._records[record_id] = record
+            try:
+                self._notify('update' if old else 'create', old, record)
+            except BaseException:
+                if old is None:
+                    del self._records[record_id]
+                    del self._seqs[record_id]   # page() skips the orphaned order entry
+                else:
+                    self._records[record_id] = old
+                raise
+        return record
+
+    def update(self, record_id, data):
+        """Merge data into a record and touch updated_at; None if missing"""
+        with self.lock:
+            old = self._records.get(record_id)
+            if old is None:
+                return None
+            record = old.merged(self._changes(data))
+            self._records[record_id] = record
+            try:
+                self._notify('update', old, record)
+            except BaseException:
+                self._records[record_id] = old
+                raise
+        return record
+
+    def delete(self, record_id):
+        """Remove a record; returns it, or None if it did not exist"""
+        with self.lock:
+            old = self._records.pop(record_id, None)
+            if old is not None:
+                seq = self._seqs.pop(record_id)
+                try:
+                    self._notify('delete', old, None)
+                except BaseException:
+                    # Back in place for lookups and paging; all() lists it last
+                    self._records[record_id] = old
+                    self._seqs[record_id] = seq
+                    raise
+                if len(self._order[0]) > 2 * len(self._seqs) + 64:
+                    self._compact()
+        return old
+
+    def _compact(self):
+        live = [(seq, record_id) for seq, record_id in zip(*self._order) if self._seqs.get(record_id) == seq]
+        self._order = (array('q', [seq for seq, _ in live]), [record_id for _, record_id in live])
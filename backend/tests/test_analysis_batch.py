@@ -0,0 +1,123 @@
+import asyncio
+import base64
+import gc
+import os
+import weakref
+
+import pytest
+
+from benchmarks.stand_ins import StandIn
+from analysis_batch import BatchQueue, QueueFull
+
+
+def drawings(count):
+    # Random, so the module-wide result caches never answer for the stand-ins
+    return [(f"cabinet-{i}.jpg", os.urandom(4096)) for i in range(count)]
+
+
+async def finished(batch, timeout=10):
+    async def poll():
+        while not batch.finished:
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+    return batch.to_dict()
+
+
+def test_each_stage_stays_within_its_concurrency_limit():
+    upstream = StandIn(ocr_delay=0.02, llm_delay=0.05)
+
+    async def main():
+        async with upstream.client() as http:
+            queue = BatchQueue(http, ocr_concurrency=3, llm_concurrency=2)
+            first, second = queue.submit(drawings(8), {}), queue.submit(drawings(4), {})
+            return await finished(first), await finished(second)
+
+    for status in asyncio.run(main()):
+        assert status['status'] == 'done'
+        assert status['progress'] == {'done': status['total']}
+    assert upstream.calls == {'vision': 12, 'openai': 12}
+    # Limits are shared by every batch, and both stages are kept busy
+    assert upstream.peak == {'vision': 3, 'openai': 2}
+
+
+def test_batches_beyond_the_active_limit_are_refused():
+    upstream = StandIn(ocr_delay=0.02, llm_delay=0.02)
+
+    async def main():
+        async with upstream.client() as http:
+            queue = BatchQueue(http, max_active=2)
+            running = [queue.submit(drawings(2), {}) for _ in range(2)]
+            assert queue.full()
+            with pytest.raises(QueueFull):
+                queue.submit(drawings(1), {})
+            await finished(running[0])
+            assert not queue.full()
+            later = queue.submit(drawings(1), {})
+            for batch in running[1:] + [later]:
+                await finished(batch)
+            assert queue.get(later.id) is later
+
+    asyncio.run(main())
+
+
+def test_progress_and_partial_results_when_a_drawing_fails():
+    broken = b'unreadable drawing' * 100
+    upstream = StandIn(ocr_delay=0.01, llm_delay=0.1,
+                       fail=lambda service, request: base64.b64encode(broken) in request.content)
+
+    async def main():
+        async with upstream.client() as http:
+            queue = BatchQueue(http)
+            batch = queue.submit(drawings(2) + [('broken.jpg', broken)], {'back_width_offset': 40})
+            while not batch.to_dict()['completed']:
+                await asyncio.sleep(0.01)
+            return batch.to_dict(), await finished(batch)
+
+    partial, status = asyncio.run(main())
+    assert partial['status'] == 'running'
+    assert partial['completed'] == 1
+    assert partial['items'][2]['status'] == 'failed'
+    assert partial['items'][2]['error']
+
+    assert status['progress'] == {'done': 2, 'failed': 1}
+    assert status['configuration'] == {'back_width_offset': 40}
+    done, failed = status['items'][:2], status['items'][2]
+    assert all(item['results'] and item['sheets'] and item['summary'] for item in done)
+    assert 'dxf_content' not in done[0]
+    assert failed == {'index': 2, 'filename': 'broken.jpg', 'status': 'failed', 'error': failed['error']}
+
+
+def test_finished_drawings_release_their_analyzer():
+    upstream = StandIn(ocr_delay=0.01, llm_delay=0.01)
+
+    async def main():
+        async with upstream.client() as http:
+            queue = BatchQueue(http)
+            batch = queue.submit(drawings(3), {})
+            analyzers = [weakref.ref(item.analyzer) for item in batch.items]
+            await finished(batch)
+            return batch, analyzers
+
+    batch, analyzers = asyncio.run(main())
+    gc.collect()
+    assert all(item.analyzer is None for item in batch.items)
+    assert all(analyzer() is None for analyzer in analyzers)
+    # What the status needs was kept on the items
+    assert all(item['status'] == 'done' and item['results'] for item in batch.to_dict()['items'])
+
+
+def test_close_cancels_running_analyses():
+    upstream = StandIn(ocr_delay=10)
+
+    async def main():
+        async with upstream.client() as http:
+            queue = BatchQueue(http)
+            batch = queue.submit(drawings(2), {})
+            await asyncio.sleep(0.01)
+            await queue.close()
+            return batch.to_dict()
+
+    status = asyncio.run(main())
+    assert status['status'] == 'done'
+    assert status['progress'] == {'failed': 2}
+    assert all(item['error'] == 'analysis cancelled' for item in status['items'])
@@ -0,0 +1,143 @@
+import asyncio
+import os
+
+import pytest
+
+from benchmarks.stand_ins import StandIn
+from analysis_cache import ResultCache
+from analyzer import DrawingAnalyzer
+
+
+class Computation:
+    """compute() for get_or_compute, counting its calls"""
+
+    def __init__(self, value='result', delay=0, error=None):
+        self.value, self.delay, self.error = value, delay, error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.value
+
+
+def test_concurrent_identical_uploads_call_the_apis_once():
+    upstream = StandIn(ocr_delay=0.05, llm_delay=0.05)
+    caches = {'ocr_cache': ResultCache('ocr'), 'llm_cache': ResultCache('llm')}
+    image = os.urandom(4096)
+
+    async def main():
+        async with upstream.client() as http:
+            analyzers = [DrawingAnalyzer(http, **caches) for _ in range(10)]
+            return await asyncio.gather(*(a.analyze_technical_drawing(image) for a in analyzers))
+
+    results = asyncio.run(main())
+    assert upstream.calls == {'vision': 1, 'openai': 1}
+    assert all(result == results[0] for result in results)
+    assert caches['ocr_cache'].coalesced == caches['llm_cache'].coalesced == 9
+
+
+def test_waiters_share_one_computation():
+    cache = ResultCache('test')
+    compute = Computation(delay=0.05)
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute('key', compute) for _ in range(5)))
+
+    assert asyncio.run(main()) == ['result'] * 5
+    assert compute.calls == 1
+    assert (cache.misses, cache.coalesced) == (1, 4)
+
+
+def test_errors_are_not_cached():
+    cache = ResultCache('test')
+    failing = Computation(delay=0.05, error=RuntimeError('upstream down'))
+
+    async def main():
+        results = await asyncio.gather(*(cache.get_or_compute('key', failing) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert failing.calls == 1
+        return await cache.get_or_compute('key', Computation('recovered'))
+
+    assert asyncio.run(main()) == 'recovered'
+    assert cache.misses == 2
+
+
+def test_failed_upstream_call_is_retried_by_the_next_upload():
+    broken = {'vision': True}
+    upstream = StandIn(fail=lambda service, request: broken.get(service))
+    caches = {'ocr_cache': ResultCache('ocr'), 'llm_cache': ResultCache('llm')}
+    image = os.urandom(4096)
+
+    async def main():
+        async with upstream.client() as http:
+            first = DrawingAnalyzer(http, **caches)
+            await first.extract_numbers_with_google_vision(image)
+            broken.clear()
+            second = DrawingAnalyzer(http, **caches)
+            return await second.extract_numbers_with_google_vision(image)
+
+    text, _ = asyncio.run(main())
+    assert text == '600 600 1200 870 560'
+    assert upstream.calls['vision'] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache('test', max_entries=2)
+    computations = {key: Computation(key) for key in 'abc'}
+
+    async def main():
+        for key in 'abac':
+            await cache.get_or_compute(key, computations[key])
+        # b was used least recently, so only it has to be computed again
+        for key in 'acb':
+            await cache.get_or_compute(key, computations[key])
+
+    asyncio.run(main())
+    assert {key: c.calls for key, c in computations.items()} == {'a': 1, 'b': 2, 'c': 1}
+    assert list(cache._entries) == ['c', 'b']
+
+
+def test_results_are_read_from_disk_after_a_restart(tmp_path):
+    directory = str(tmp_path / 'ocr')
+
+    async def main():
+        await ResultCache('ocr', directory).get_or_compute('key', Computation({'text': '600'}))
+        restarted = ResultCache('ocr', directory)
+        value = await restarted.get_or_compute('key', Computation(error=AssertionError('not cached')))
+        again = await restarted.get_or_compute('key', Computation(error=AssertionError('not cached')))
+        return restarted, value, again
+
+    restarted, value, again = asyncio.run(main())
+    assert value == again == {'text': '600'}
+    assert (restarted.disk_hits, restarted.hits, restarted.misses) == (1, 1, 0)
+
+
+def test_unreadable_disk_entry_is_computed_again(tmp_path):
+    cache = ResultCache('ocr', str(tmp_path))
+    os.makedirs(os.path.dirname(cache._path('key')))
+    with open(cache._path('key'), 'w') as f:
+        f.write('{"value": ')
+
+    assert asyncio.run(cache.get_or_compute('key', Computation('fresh'))) == 'fresh'
+    assert ResultCache('ocr', str(tmp_path))._read('key') == {'value': 'fresh'}
+
+
+def test_caller_going_away_does_not_cancel_the_computation():
+    cache = ResultCache('test')
+    compute = Computation(delay=0.05)
+
+    async def main():
+        leaving = asyncio.ensure_future(cache.get_or_compute('key', compute))
+        staying = asyncio.ensure_future(cache.get_or_compute('key', compute))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        return await staying
+
+    assert asyncio.run(main()) == 'result'
+    assert compute.calls == 1
@@ -0,0 +1,48 @@
+from bulk import apply_operations
+from records import new_customer
+from store import RecordStore
+
+
+def statuses(results):
+    return [result['status'] for result in results]
+
+
+def test_create_cannot_take_an_existing_id():
+    store = RecordStore()
+    store.add(new_customer({'id': 'c1', 'name': 'Original'}))
+    results, applied = apply_operations(store, new_customer, [
+        {'op': 'create', 'data': {'id': 'c1', 'name': 'Overwritten'}},
+        {'op': 'create', 'data': {'id': 'c2', 'name': 'New'}},
+        {'op': 'create', 'data': {'id': 'c2', 'name': 'Twice'}},
+    ])
+    assert applied and statuses(results) == [409, 201, 409]
+    assert store.get('c1')['name'] == 'Original'
+    assert store.get('c2')['name'] == 'New'
+
+
+def test_atomic_create_sees_earlier_operations():
+    store = RecordStore()
+    store.add(new_customer({'id': 'c1', 'name': 'Original'}))
+    results, applied = apply_operations(store, new_customer, [
+        {'op': 'delete', 'id': 'c1'},
+        {'op': 'create', 'data': {'id': 'c1', 'name': 'Replacement'}},
+    ], atomic=True)
+    assert applied and statuses(results) == [204, 201]
+    results, applied = apply_operations(store, new_customer, [
+        {'op': 'create', 'data': {'id': 'c2'}},
+        {'op': 'create', 'data': {'id': 'c2'}},
+    ], atomic=True)
+    assert not applied and statuses(results) == [424, 409]
+    assert 'c2' not in store
+
+
+def test_ids_must_be_non_empty_strings():
+    store = RecordStore()
+    results, applied = apply_operations(store, new_customer, [
+        {'op': 'create', 'data': {'id': ['c1']}},
+        {'op': 'create', 'data': {'id': None}},
+        {'op': 'update', 'id': {'c': 1}, 'data': {}},
+        {'op': 'delete', 'id': ''},
+    ])
+    assert statuses(results) == [422] * 4
+    assert len(store) == 0
@@ -0,0 +1,50 @@
+import pytest
+
+from changes import ChangeLog, StaleSequence
+from store import RecordStore
+
+
+def tracked(**options):
+    log, store = ChangeLog(**options), RecordStore()
+    log.track('customers', store)
+    return log, store
+
+
+def test_since_lists_changes_and_deletes_after_a_sequence():
+    log, store = tracked()
+    store.add({'id': 'a'})
+    store.add({'id': 'b'})
+    seq = log.seq
+    store.update('a', {'name': 'Ann'})
+    store.delete('b')
+    store.add({'id': 'c'})
+    assert log.since('customers', seq) == (['a', 'c'], ['b'])
+    assert log.since('customers', log.seq) == ([], [])
+
+
+def test_oldest_tombstones_are_pruned():
+    log, store = tracked(max_tombstones=2)
+    start = log.seq
+    for record_id in 'abcd':
+        store.add({'id': record_id})
+    before_deletes = log.seq
+    for record_id in 'abc':
+        store.delete(record_id)
+    assert log.since('customers', log.seq - 2) == ([], ['b', 'c'])
+    # The client might have missed the delete of a, so it has to resync
+    with pytest.raises(StaleSequence):
+        log.since('customers', before_deletes)
+    with pytest.raises(StaleSequence):
+        log.since('customers', start)
+
+
+def test_recreated_ids_keep_their_tombstone_slot():
+    log, store = tracked(max_tombstones=1)
+    store.add({'id': 'a'})
+    seq = log.seq
+    store.delete('a')
+    store.add({'id': 'a'})
+    store.add({'id': 'b'})
+    store.delete('b')
+    # a's tombstone was already superseded, so dropping it loses nothing
+    assert log.since('customers', seq) == (['a'], ['b'])
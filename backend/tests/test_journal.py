@@ -0,0 +1,82 @@
+import os
+import threading
+
+import pytest
+
+from journal import Journal, JournalError
+from records import plain
+from store import RecordStore
+
+
+def open_journal(path, **options):
+    stores = {'customers': RecordStore(lock=threading.RLock())}
+    journal = Journal(str(path), stores, fsync='off', **options)
+    summary = journal.restore()
+    return stores['customers'], journal, summary
+
+
+def records(store):
+    return sorted((plain(record) for record in store.all()), key=lambda record: record['id'])
+
+
+def customer(i):
+    return {'id': f'c{i}', 'name': f'Customer {i}', 'stage': 'Lead', 'tags': ['kitchen'],
+            'created_at': '2030-01-07T09:30:00', 'notes': None}
+
+
+def test_snapshot_and_journal_tail_are_restored(tmp_path):
+    store, journal, _ = open_journal(tmp_path)
+    for i in range(20):
+        store.add(customer(i))
+    journal.snapshot(wait=True)
+    store.update('c3', {'stage': 'Quoted'})
+    store.delete('c4')
+    store.add(customer(20))
+    expected = records(store)
+    journal.close()
+
+    restored, journal, summary = open_journal(tmp_path)
+    journal.close()
+    assert records(restored) == expected
+    assert (summary['snapshot_records'], summary['replayed']) == (20, 3)
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    store, journal, _ = open_journal(tmp_path)
+    store.add(customer(1))
+    store.add(customer(2))
+    journal.close()
+    segment = os.path.join(tmp_path, 'journal-000001.log')
+    with open(segment, 'r+b') as f:
+        f.truncate(os.path.getsize(segment) - 5)
+
+    restored, journal, summary = open_journal(tmp_path)
+    restored.add(customer(3))
+    journal.close()
+    assert summary['replayed'] == 1
+    restored, journal, _ = open_journal(tmp_path)
+    journal.close()
+    assert [record['id'] for record in records(restored)] == ['c1', 'c3']
+
+
+def test_unreadable_snapshot_stops_the_restore(tmp_path):
+    store, journal, _ = open_journal(tmp_path)
+    store.add(customer(1))
+    journal.snapshot(wait=True)
+    journal.close()
+    snapshot = os.path.join(tmp_path, 'snapshot-000002.snap')
+    with open(snapshot, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b'\0')
+
+    with pytest.raises(JournalError, match='unreadable'):
+        open_journal(tmp_path)
+
+
+def test_one_process_at_a_time(tmp_path):
+    _, journal, _ = open_journal(tmp_path)
+    with pytest.raises(JournalError, match='in use'):
+        open_journal(tmp_path)
+    journal.close()
+    _, journal, _ = open_journal(tmp_path)
+    journal.close()
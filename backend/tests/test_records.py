@@ -0,0 +1,24 @@
+import records
+from records import compact, pack, plain, unpack
+
+
+def test_compact_records_read_back_as_the_original():
+    record = {'id': 'c1', 'name': 'Ann', 'stage': 'Lead', 'created_at': '2030-01-07T09:30:00.123456',
+              'updated_at': 'not a timestamp', 'tags': ['kitchen']}
+    stored = compact(record)
+    assert stored == record and plain(stored) == record
+    assert stored.merged({'stage': 'Quoted', 'phone': '123'}) == {**record, 'stage': 'Quoted', 'phone': '123'}
+    assert list(unpack(*pack([stored]))) == [stored]
+
+
+def test_layouts_stop_being_shared_past_the_limit(monkeypatch):
+    monkeypatch.setattr(records, '_layouts', {})
+    monkeypatch.setattr(records, 'MAX_LAYOUTS', 2)
+    first, second = compact({'id': 'a', 'x1': 1}), compact({'id': 'b', 'x1': 1})
+    assert first._layout is second._layout
+    compact({'id': 'c', 'x2': 1})
+    uncached = [compact({'id': 'd', 'x3': 1}), compact({'id': 'd', 'x3': 1})]
+    assert len(records._layouts) == 2
+    assert uncached[0]._layout is not uncached[1]._layout
+    assert uncached[0] == uncached[1] == {'id': 'd', 'x3': 1}
+    assert list(unpack(*pack(uncached))) == uncached
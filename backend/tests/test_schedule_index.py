@@ -0,0 +1,46 @@
+from schedule_index import StaffScheduleIndex
+from store import RecordStore
+
+
+def assignment(assignment_id, start, end, status='Scheduled', staff_id=1, day='2030-01-07'):
+    return {'id': assignment_id, 'staff_id': staff_id, 'date': day,
+            'start_time': start, 'end_time': end, 'status': status}
+
+
+def test_overlapping_slots_conflict():
+    store = RecordStore()
+    schedule = StaffScheduleIndex(store)
+    store.add(assignment('a', '09:00', '11:00'))
+    assert schedule.conflicts(assignment('b', '10:00', '12:00')) == ['a']
+    assert schedule.conflicts(assignment('b', '11:00', '12:00')) == []
+    assert schedule.conflicts(assignment('b', '10:00', '12:00', staff_id='2')) == []
+
+
+def test_cancelled_assignments_free_their_slot():
+    store = RecordStore()
+    schedule = StaffScheduleIndex(store)
+    store.add(assignment('a', '09:00', '11:00'))
+    store.update('a', {'status': 'Cancelled'})
+    assert schedule.conflicts(assignment('b', '09:00', '11:00')) == []
+    assert schedule.busy(1, '2030-01-07') == []
+    assert [a['id'] for a in schedule.find(1)] == ['a']
+
+    store.add(assignment('b', '09:00', '11:00'))
+    store.update('a', {'status': 'Scheduled'})
+    assert schedule.busy(1, '2030-01-07') == [(540, 660, 'a'), (540, 660, 'b')]
+
+
+def test_cancelled_assignments_free_their_slot_after_rebuild():
+    store = RecordStore()
+    store.add(assignment('a', '09:00', '11:00', status='Cancelled'))
+    schedule = StaffScheduleIndex(store)
+    assert schedule.conflicts(assignment('b', '10:00', '12:00')) == []
+    assert schedule.availability(1, '2030-01-07')['free'] == [{'start_time': '08:00', 'end_time': '17:00'}]
+
+
+def test_pending_cancellations_count_in_batches():
+    store = RecordStore()
+    schedule = StaffScheduleIndex(store)
+    store.add(assignment('a', '09:00', '11:00'))
+    pending = {'a': assignment('a', '09:00', '11:00', status='Cancelled')}
+    assert schedule.conflicts(assignment('b', '09:00', '11:00'), pending=pending) == []
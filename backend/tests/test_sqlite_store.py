@@ -0,0 +1,72 @@
+import pytest
+
+from bulk import apply_operations
+from records import new_assignment
+from schedule_index import StaffScheduleIndex
+from sqlite_store import Database, SQLiteStore
+
+
+@pytest.fixture
+def assignments(tmp_path):
+    db = Database(str(tmp_path / 'crm.db'))
+    yield SQLiteStore(db, 'assignments')
+    db.close()
+
+
+def assignment(assignment_id, start, end):
+    return new_assignment({'id': assignment_id, 'staff_id': 1, 'date': '2030-01-07',
+                           'start_time': start, 'end_time': end})
+
+
+class Recorder:
+    def __init__(self, fail_on=None):
+        self.seen, self.fail_on = [], fail_on
+
+    def __call__(self, action, old, new):
+        record = new if new is not None else old
+        if record['id'] == self.fail_on:
+            raise RuntimeError('listener failed')
+        self.seen.append((action, record['id']))
+
+
+def test_listeners_hear_of_writes_when_the_transaction_commits(assignments):
+    listener = Recorder()
+    assignments.subscribe(listener)
+    with assignments.transaction():
+        assignments.add(assignment('a', '09:00', '10:00'))
+        assignments.update('a', {'notes': 'gate code 1234'})
+        assert listener.seen == []
+    assert listener.seen == [('create', 'a'), ('update', 'a')]
+
+
+def test_rolled_back_transaction_never_reaches_the_listeners(assignments):
+    listener = Recorder()
+    assignments.subscribe(listener)
+    with pytest.raises(ValueError):
+        with assignments.transaction():
+            assignments.add(assignment('a', '09:00', '10:00'))
+            raise ValueError('batch abandoned')
+    assert listener.seen == []
+    assert 'a' not in assignments
+
+
+def test_failing_listener_rolls_back_the_whole_transaction(assignments):
+    listener = Recorder(fail_on='b')
+    assignments.subscribe(listener)
+    with pytest.raises(RuntimeError):
+        with assignments.transaction():
+            assignments.add(assignment('a', '09:00', '10:00'))
+            assignments.add(assignment('b', '10:00', '11:00'))
+    # a was passed on before b failed, then taken back
+    assert listener.seen == [('create', 'a'), ('delete', 'a')]
+    assert len(assignments) == 0
+
+
+def test_bulk_checks_conflicts_against_earlier_writes_in_the_batch(assignments):
+    schedule = StaffScheduleIndex(assignments)
+    results, _ = apply_operations(assignments, new_assignment, [
+        {'op': 'create', 'data': assignment('a', '09:00', '11:00')},
+        {'op': 'create', 'data': assignment('b', '10:00', '12:00')},
+    ], conflicts=lambda record, pending: schedule.conflicts(record, record['id'], pending))
+    assert [result['status'] for result in results] == [201, 409]
+    assert [interval[2] for interval in schedule.busy(1, '2030-01-07')] == ['a']